@@ -12,10 +12,18 @@ from __future__ import annotations
 import json
 import os
 import re
+import threading
+import time
 import requests
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from typing import Any, Dict, Tuple
+try:
+    import orjson as _orjson  # optional, much faster JSON decoding
+except ImportError:
+    _orjson = None
 
 # --- Public API
 __all__ = ["fetch_streamhub"]
@@ -26,27 +34,120 @@ RECORDER_MAP = {0: "disabled", 1: "off", 2: "on", 3: "error", 4: "running"}
 INTERCOM_MAP = {0: "disabled", 1: "off", 2: "on", 3: "error"}
 INTERCOM_PROFILE_MAP = {0: "low", 1: "medium", 2: "high"}
 VIDEO_IFB_PRESET_MAP = {0: "off", 1: "on"}
+OUTPUT_STATUS_MAP = {1: "idle", 2: "on", 3: "error"}
 
-# --- Shared HTTP session (connection pooling + light retries)
-_HTTP = requests.Session()
-_HTTP.headers.update({"User-Agent": "StreamPilot/1.0"})
-_POOL = int(os.getenv("SP_HTTP_POOL", "50"))  # total sockets per scheme
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+# --- Shared pool for the per-probe GETs: they are independent, so one probe costs
+# about two round trips (top-level endpoints, then per-input stats) instead of 4+3K
+_FETCH_WORKERS = _env_int("SP_SH_FETCH_WORKERS", 16)
+_FETCH_POOL = ThreadPoolExecutor(max_workers=_FETCH_WORKERS, thread_name_prefix="sh-fetch")
+
+# --- HTTP sessions, one per StreamHub (connection pooling + light retries).
+# A host's sockets are used by the fetch workers plus CherryPy threads reading /logs
+# (SP_THREAD_POOL, at most 100 when sized automatically), so the pool is sized to hold
+# them all. It does not block when exhausted (requests has no pool wait timeout, so a
+# hung StreamHub would stall every caller for that host): an overflow GET opens a
+# throwaway connection instead. Sockets are only opened on demand.
+_POOL = max(_env_int("SP_HTTP_POOL", 50), _env_int("SP_THREAD_POOL", 100) + _FETCH_WORKERS)
 _RETRY = Retry(
     total=2, backoff_factor=0.2,
     status_forcelist=(429, 500, 502, 503, 504),
     allowed_methods=False  # retry on all idempotent-ish by our usage (GETs)
 )
-_ADAPTER = HTTPAdapter(pool_connections=_POOL, pool_maxsize=_POOL, max_retries=_RETRY)
-_HTTP.mount("http://", _ADAPTER)
-_HTTP.mount("https://", _ADAPTER)
+_SESSIONS: Dict[str, requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+# --- SST preview (thumbnail) throttling: a still image refreshed every SP_PREVIEW_MIN_INTERVAL
+# seconds is plenty, while streamStats/linkStats stay per-poll. 0 fetches it every time.
+_PREVIEW_MIN_INTERVAL = _env_int("SP_PREVIEW_MIN_INTERVAL", 10)
+# (base, input idx) -> (monotonic fetch time, identifier, thumbnail, audio levels)
+_PREVIEW_CACHE: Dict[Tuple[str, int], Tuple[float, Any, Any, Any]] = {}
+
+# --- /config (encoder and streaming-output setup) only changes on operator action; it is
+# reused for SP_CFG_TTL seconds (0 fetches it every poll). /outputs is not cached: it
+# carries live output status and connection counts.
+_CFG_TTL = _env_int("SP_CFG_TTL", 30)
+_CFG_CACHE: Dict[str, Tuple[float, Any]] = {}  # base -> (monotonic fetch time, /config JSON)
+
+
+def _session_for(base_url: str) -> requests.Session:
+    # HTTP/1.1 keep-alive: every in-flight GET holds its own pooled socket (no
+    # head-of-line blocking between the concurrent per-input requests) and the
+    # sockets are reused LIFO across 2 s polls, so a probe costs no new handshakes.
+    key = base_url.rstrip("/")
+    with _SESSIONS_LOCK:
+        s = _SESSIONS.get(key)
+        if s is None:
+            s = requests.Session()
+            s.headers.update({"User-Agent": "StreamPilot/1.0"})
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=_POOL, pool_block=False, max_retries=_RETRY)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _SESSIONS[key] = s
+        return s
+
+
+# --- The per-StreamHub state (session, /config, log path, previews) is dropped once its
+# base has not been polled for SP_SH_STATE_TTL seconds: the device was deleted or its
+# host/port changed. Checked at most once a minute, from fetch_streamhub.
+_STATE_TTL = _env_int("SP_SH_STATE_TTL", 900)
+_LAST_POLLED: Dict[str, float] = {}
+_PRUNE_LOCK = threading.Lock()
+_next_prune = 0.0
+
+
+def _touch(base: str) -> None:
+    global _next_prune
+    now = time.monotonic()
+    _LAST_POLLED[base] = now
+    if now < _next_prune or not _PRUNE_LOCK.acquire(blocking=False):
+        return
+    try:
+        _next_prune = now + 60
+        for b, seen in list(_LAST_POLLED.items()):
+            if now - seen <= _STATE_TTL:
+                continue
+            _LAST_POLLED.pop(b, None)
+            _CFG_CACHE.pop(b, None)
+            _LOG_PATHS.pop(b, None)
+            for k in [k for k in list(_PREVIEW_CACHE) if k[0] == b]:
+                _PREVIEW_CACHE.pop(k, None)
+            with _SESSIONS_LOCK:
+                sess = _SESSIONS.pop(b, None)
+            if sess is not None:
+                sess.close()
+    finally:
+        _PRUNE_LOCK.release()
 
 
 # ===== Helpers
 
+def _loads(data):
+    """Parse JSON from bytes or str; orjson when installed (UTF-8 only), stdlib json otherwise."""
+    if _orjson is not None:
+        try:
+            return _orjson.loads(data)
+        except ValueError:
+            pass
+    return json.loads(data)
+
+
+@lru_cache(maxsize=256)
+def _url_parts(base_url: str, token: str) -> Tuple[str, str]:
+    """(base without trailing '/', '?api_key=<token>'): the same pair every poll of a
+    device, so it is built once; callers append literal paths starting with '/'."""
+    return base_url.rstrip("/"), f"?api_key={token}"
+
+
 def _full_url(base: str, path: str, token: str) -> str:
-    base = base.rstrip("/")
-    path = path.lstrip("/")
-    return f"{base}/{path}?api_key={token}"
+    root, key = _url_parts(base, token)
+    return root + "/" + path.lstrip("/") + key
 
 
 def _get_json_or_text(session: requests.Session, url: str, timeout: int = 5) -> Tuple[bool, Any, Dict[str, Any]]:
@@ -69,7 +170,7 @@ def _get_json_or_text(session: requests.Session, url: str, timeout: int = 5) ->
     # Proper JSON
     if "application/json" in ctype:
         try:
-            return True, r.json(), meta
+            return True, _loads(r.content), meta
         except Exception as e:
             return False, f"JSON_PARSE_ERROR: {type(e).__name__}: {e}", meta
 
@@ -81,7 +182,7 @@ def _get_json_or_text(session: requests.Session, url: str, timeout: int = 5) ->
     probe = body.lstrip() if body else ""
     if probe.startswith("{") or probe.startswith("["):
         try:
-            return True, json.loads(probe), meta
+            return True, _loads(probe), meta
         except Exception:
             pass
 
@@ -91,69 +192,106 @@ def _get_json_or_text(session: requests.Session, url: str, timeout: int = 5) ->
 
 
 # --- Logs helpers (for start/stop detection via StreamHub logs)
+# base -> (log path that answered, or None when none did; monotonic time it was recorded)
+_LOG_PATHS: Dict[str, Tuple[Any, float]] = {}
+_LOG_REDISCOVER_SEC = _env_int("SP_SH_LOG_REDISCOVER_SEC", 300)
+# Read once at import like the other SP_SH_* settings: SP_SH_LOG_LIMIT lines per poll,
+# SP_SH_LOG_PATH tried before the common guesses
+_LOG_LIMIT = _env_int("SP_SH_LOG_LIMIT", 200)
+_LOG_CANDIDATES = tuple(dict.fromkeys(
+    (["/" + os.getenv("SP_SH_LOG_PATH").lstrip("/")] if os.getenv("SP_SH_LOG_PATH") else [])
+    + ["/logs", "/systemLogs", "/systemLog", "/log"]
+))
+
+def _log_messages(data) -> list:
+    """Log endpoint JSON (list, or dict wrapping one) -> list[str] of messages."""
+    if isinstance(data, dict):
+        src_list = []
+        for key in ("logs", "entries", "data", "items", "list"):
+            arr = data.get(key)
+            if isinstance(arr, list):
+                src_list = arr
+                break
+    elif isinstance(data, list):
+        src_list = data
+    else:
+        src_list = []
+    msgs = []
+    for it in src_list:
+        if isinstance(it, str):
+            msgs.append(it)
+        elif isinstance(it, dict):
+            m = it.get("message") or it.get("msg") or it.get("text") or it.get("log") or it.get("content")
+            if m is not None:
+                msgs.append(str(m))
+    return msgs
+
+
 def _fetch_logs(session: requests.Session, base_url: str, token: str, timeout: int = 5, limit: int = 200):
-    """Try multiple likely endpoints to get recent logs; normalize to list[str]."""
-    paths = []
-    envp = os.getenv("SP_SH_LOG_PATH")
-    if envp:
-        paths.append(envp)
-    # common guesses if env not set
-    paths += ["/logs", "/systemLogs", "/systemLog", "/log"]
-    seen = set()
-    for p in paths:
-        if p in seen:
+    """Try multiple likely endpoints to get recent logs; normalize to list[str].
+    The endpoint that answered is remembered per StreamHub; when none does, discovery
+    is retried only every _LOG_REDISCOVER_SEC instead of costing 4 GETs per poll.
+    """
+    base, key = _url_parts(base_url, token)
+    suffix = f"{key}&limit={int(limit)}"
+    tried = None
+    known = _LOG_PATHS.get(base)
+    if known is not None:
+        path, found_at = known
+        if path is None:
+            if time.monotonic() - found_at < _LOG_REDISCOVER_SEC:
+                return False, []
+        else:
+            tried = path
+            ok, data, _ = _get_json_or_text(session, base + path + suffix, timeout=timeout)
+            if ok:
+                msgs = _log_messages(data)
+                return bool(msgs), msgs
+    for p in _LOG_CANDIDATES:
+        if p == tried:
             continue
-        seen.add(p)
-        url = _full_url(base_url, f"{p}?limit={int(limit)}", token)
-        ok, data, _ = _get_json_or_text(session, url, timeout=timeout)
+        ok, data, _ = _get_json_or_text(session, base + p + suffix, timeout=timeout)
         if not ok:
             continue
-        msgs = []
-        if isinstance(data, dict):
-            src_list = None
-            for key in ("logs", "entries", "data", "items", "list"):
-                arr = data.get(key)
-                if isinstance(arr, list):
-                    src_list = arr
-                    break
-            if src_list is None:
-                src_list = []
-        elif isinstance(data, list):
-            src_list = data
-        else:
-            src_list = []
-        for it in src_list:
-            if isinstance(it, str):
-                msgs.append(it)
-            elif isinstance(it, dict):
-                m = it.get("message") or it.get("msg") or it.get("text") or it.get("log") or it.get("content")
-                if m is not None:
-                    msgs.append(str(m))
+        msgs = _log_messages(data)
         if msgs:
+            _LOG_PATHS[base] = (p, time.monotonic())
             return True, msgs
+    _LOG_PATHS[base] = (None, time.monotonic())
     return False, []
 
-# patterns
-_PAT_START = re.compile(r"is\s+starting\s+a\s+live", re.IGNORECASE)
-_PAT_STOP1 = re.compile(r"Live\s+is\s+stopped", re.IGNORECASE)
-_PAT_STOP2 = re.compile(r"Disconnection\s+of", re.IGNORECASE)
-_PAT_AVI = re.compile(r"product's\s+name", re.IGNORECASE)
+# patterns: one alternation for the four phrases, so a line is scanned once
+# groups: 1 = start, 2 = product's name (AVI), 3 / 4 = stop
+_PAT_EVENT = re.compile(
+    r"(is\s+starting\s+a\s+live)|(product's\s+name)|(Live\s+is\s+stopped)|(Disconnection\s+of)",
+    re.IGNORECASE,
+)
 
-def _detect_live_event_for_input(log_lines, source_index: int, identifier: str | None = None):
-    """Return 'start' / 'stop' / None based on recent log lines.
+def _live_event_lines(log_lines):
+    """Most recent first, (event, line) for each of the last 500 lines that reports a
+    live 'start' (start phrase + product's name) or 'stop'. Built once per snapshot."""
+    out = []
+    for line in reversed((log_lines or [])[-500:]):
+        if not isinstance(line, str):
+            continue
+        hit = set()
+        for m in _PAT_EVENT.finditer(line):
+            hit.add(m.lastindex)
+        if 1 in hit and 2 in hit:
+            out.append(("start", line))
+        elif 3 in hit or 4 in hit:
+            out.append(("stop", line))
+    return out
+
+
+def _detect_live_event_for_input(event_lines, source_index: int, identifier: str | None = None):
+    """Return 'start' / 'stop' / None from _live_event_lines() output.
     We match either "Source #<N>" or the input identifier when present.
     """
-    if not log_lines:
-        return None
     probe_tag = f"Source #{source_index}:"
-    for line in reversed(log_lines[-500:]):  # scan most recent first
-        if not isinstance(line, str):
-            continue
+    for ev, line in event_lines:
         if probe_tag in line or (identifier and identifier in line):
-            if _PAT_START.search(line) and _PAT_AVI.search(line):
-                return "start"
-            if _PAT_STOP1.search(line) or _PAT_STOP2.search(line):
-                return "stop"
+            return ev
     return None
 
 
@@ -176,6 +314,77 @@ def _norm_status_code(item: Dict[str, Any]) -> int:
         return 0
 
 
+def _safe_map(m: Dict[int, str], v: Any, default: Any = None) -> Any:
+    """Map a numeric code through m: ints directly, floats (2.0) and padded or decimal
+    strings (" 2", "2.0") normalised to int first; anything else gives default."""
+    if isinstance(v, int):
+        return m.get(v, default)
+    if v is None:
+        return default
+    try:
+        return m.get(int(float(str(v).strip())), default)
+    except (ValueError, OverflowError):
+        return default
+
+
+# --- Per-input payload skeleton. The flat part is copied in C (dict.copy keeps the key
+# order); the nested containers are mutated later, so _new_input() gives each input its own.
+# copy.deepcopy / pickle round trips were measured slower than the plain literal.
+_INPUT_TEMPLATE: Dict[str, Any] = {
+    "live_departure_time": None,
+    "live_duration": None,
+    "data_consumed": None,
+    "source_identifier": None,
+    "source_name": None,
+    "dropped_packets_total_live": None,
+    "message_for_notification": None,
+    "zero": None,
+    "notifications": None,
+    "status_change": None,
+    "name": None,
+    "identifier": None,
+    "status": None,
+    "version": None,
+    "intercom_status": None,
+    "intercom_profile": None,
+    "recorder_status": None,
+    "message": None,
+    "thumbnail": None,
+    "audio_levels": None,
+    "info": None,
+    "protocol": None,
+    "family_name": None,
+    "links": None,
+    "total_data": 0,
+    "low_rx_bitrate": False,
+    "low_tx_bitrate": False,
+    "dropped": None,
+    "sdi_outputs": None,
+    "ndi_outputs": None,
+    "ip_outputs": None,
+    "video_ifb": None,
+    "encoders": None,
+    "locationStatus": None,
+    "latitude": None,
+    "longitude": None,
+}
+
+
+def _new_input() -> Dict[str, Any]:
+    d = _INPUT_TEMPLATE.copy()
+    d["zero"] = {"dropped_packets": None, "data": None}
+    d["notifications"] = {"dropped": {"video": None, "audio": None, "ts": None}}
+    d["audio_levels"] = {}
+    d["links"] = {}
+    d["dropped"] = {}
+    d["sdi_outputs"] = {}
+    d["ndi_outputs"] = {}
+    d["ip_outputs"] = {}
+    d["video_ifb"] = {"video_ifb_preset_status": None, "video_ifb_decoding_source": None, "video_ifb_decoder": None}
+    d["encoders"] = {}
+    return d
+
+
 # ===== Main collector
 
 def fetch_streamhub(base_url: str, token: str | None = None, timeout: int = 5) -> Tuple[bool, Any]:
@@ -186,10 +395,27 @@ def fetch_streamhub(base_url: str, token: str | None = None, timeout: int = 5) -
     if not token:
         return False, "missing api_key token"
 
-    session = _HTTP
+    session = _session_for(base_url)
+
+    # 1) + 2) Characteristics, Config / Outputs / Inputs and the logs, fetched together
+    # base and api_key suffix cached per device; every path below is a literal starting with "/"
+    base, key = _url_parts(base_url, token)
+    _touch(base)
+
+    def _get(path):
+        return _FETCH_POOL.submit(_get_json_or_text, session, base + path + key, timeout)
+
+    # /config comes from the per-device cache while it is younger than SP_CFG_TTL
+    cfg_cached = _CFG_CACHE.get(base)
+    if cfg_cached and time.monotonic() - cfg_cached[0] < _CFG_TTL:
+        f_cfg = None
+    else:
+        f_cfg = _get("/config")
+    f_char, f_out, f_in = _get("/"), _get("/outputs"), _get("/inputs")
+    f_logs = _FETCH_POOL.submit(_fetch_logs, session, base_url, token, timeout, _LOG_LIMIT)
 
     # 1) Characteristics (nbChannel)
-    ok0, data0, meta0 = _get_json_or_text(session, _full_url(base_url, "/", token), timeout=timeout)
+    ok0, data0, meta0 = f_char.result()
     if not ok0:
         return False, f"[{meta0['url']}] status={meta0['status']} ctype={meta0['ctype']} -> {data0}"
     sh_char = data0 if isinstance(data0, dict) else {}
@@ -199,68 +425,32 @@ def fetch_streamhub(base_url: str, token: str | None = None, timeout: int = 5) -
         nb = 0
 
     # 2) Config / Outputs / Inputs
-    ok_cfg, sh_cfg, meta_cfg = _get_json_or_text(session, _full_url(base_url, "/config", token), timeout=timeout)
-    if not ok_cfg:
-        return False, f"[{meta_cfg['url']}] status={meta_cfg['status']} ctype={meta_cfg['ctype']} -> {sh_cfg}"
+    if f_cfg is None:
+        sh_cfg = cfg_cached[1]
+    else:
+        ok_cfg, sh_cfg, meta_cfg = f_cfg.result()
+        if not ok_cfg:
+            return False, f"[{meta_cfg['url']}] status={meta_cfg['status']} ctype={meta_cfg['ctype']} -> {sh_cfg}"
+        _CFG_CACHE[base] = (time.monotonic(), sh_cfg)
 
-    ok_out, sh_outputs, meta_out = _get_json_or_text(session, _full_url(base_url, "/outputs", token), timeout=timeout)
+    ok_out, sh_outputs, meta_out = f_out.result()
     if not ok_out:
         return False, f"[{meta_out['url']}] status={meta_out['status']} ctype={meta_out['ctype']} -> {sh_outputs}"
 
-    ok_in, sh_inputs, meta_in = _get_json_or_text(session, _full_url(base_url, "/inputs", token), timeout=timeout)
+    ok_in, sh_inputs, meta_in = f_in.result()
     if not ok_in:
         return False, f"[{meta_in['url']}] status={meta_in['status']} ctype={meta_in['ctype']} -> {sh_inputs}"
 
-    # 2b) Optional: recent logs to help detect start/stop events
-    try:
-        _log_limit = int(os.getenv("SP_SH_LOG_LIMIT", "200"))
-    except Exception:
-        _log_limit = 200
-    logs_ok, log_lines = _fetch_logs(session, base_url, token, timeout=timeout, limit=_log_limit)
+    # 2b) Logs
+    logs_ok, log_lines = f_logs.result()
+    event_lines = _live_event_lines(log_lines) if logs_ok else []
 
     # 3) Build payload
     payload: Dict[str, Any] = {"characteristics": sh_char, "configuration": sh_cfg, "inputs": {"channels": nb}}
 
-    # Pre-allocate inputs
-    for idx in range(nb):
-        payload["inputs"][str(idx)] = {
-            "live_departure_time": None,
-            "live_duration": None,
-            "data_consumed": None,
-            "source_identifier": None,
-            "source_name": None,
-            "dropped_packets_total_live": None,
-            "message_for_notification": None,
-            "zero": {"dropped_packets": None, "data": None},
-            "notifications": {"dropped": {"video": None, "audio": None, "ts": None}},
-            "status_change": None,
-            "name": None,
-            "identifier": None,
-            "status": None,
-            "version": None,
-            "intercom_status": None,
-            "intercom_profile": None,
-            "recorder_status": None,
-            "message": None,
-            "thumbnail": None,
-            "audio_levels": {},
-            "info": None,
-            "protocol": None,
-            "family_name": None,
-            "links": {},
-            "total_data": 0,
-            "low_rx_bitrate": False,
-            "low_tx_bitrate": False,
-            "dropped": {},
-            "sdi_outputs": {},
-            "ndi_outputs": {},
-            "ip_outputs": {},
-            "video_ifb": {"video_ifb_preset_status": None, "video_ifb_decoding_source": None, "video_ifb_decoder": None},
-            "encoders": {},
-            "locationStatus": None,
-            "latitude": None,
-            "longitude": None,
-        }
+    # Pre-allocate inputs; input_dicts gives the loop below positional access, no key lookups
+    input_dicts = [_new_input() for _ in range(nb)]
+    payload["inputs"].update(zip(map(str, range(nb)), input_dicts))
 
     # Inputs normalisation (list or dict)
     raw_inputs = (sh_inputs or {}).get("inputs", sh_inputs or [])
@@ -277,32 +467,63 @@ def fetch_streamhub(base_url: str, token: str | None = None, timeout: int = 5) -
 
     counters = {"on": 0, "idle": 0, "off": 0, "error": 0}
 
+    # Inverted indexes, built once: enabled encoders by input index, enabled streaming
+    # outputs by encoder index, enabled SDI/IP/NDI outputs by input name
+    enc_cfg = (sh_cfg or {}).get("enc", {})
+    so_cfg = (sh_cfg or {}).get("streamingOutput", {})
+    encoders_by_input: Dict[Any, list] = {}
+    for eidx in range(len(enc_cfg)):
+        ename = str(eidx + 1)
+        enc = enc_cfg.get(ename) or {}
+        if enc.get("enable") is True:
+            encoders_by_input.setdefault(enc.get("inputIndex"), []).append(ename)
+    so_by_encoder: Dict[Any, list] = {}
+    for soidx in range(len(so_cfg)):
+        soname = str(soidx + 1)
+        so = so_cfg.get(soname) or {}
+        if so.get("enable") is True:
+            so_by_encoder.setdefault(so.get("encoderIndex"), []).append((soname, so))
+
+    def _by_input(outs):
+        idx_map: Dict[Any, list] = {}
+        for j in range(len(outs)):
+            out = outs[j] or {}
+            if out.get("enable"):
+                idx_map.setdefault(out.get("input"), []).append((j, out))
+        return idx_map
+    sdi_by_input, ip_by_input, ndi_by_input = _by_input(outs_sdi), _by_input(outs_ip), _by_input(outs_ndi)
+
+    # preview / streamStats / linkStats for every ON SST input, all requested at once;
+    # preview is skipped while the cached one for the same source is recent enough
+    sst_stats = {}
+    now = time.monotonic()
+    for idx in range(min(nb, len(inputs_list))):
+        i = inputs_list[idx] or {}
+        if STATUS_MAP.get(_norm_status_code(i), "off") == "on" and "SAFESTREAMS" in (i.get("channelType") or ""):
+            n = "/inputs/" + str(idx + 1)
+            cached = _PREVIEW_CACHE.get((base, idx))
+            if cached and cached[1] == i.get("identifier") and now - cached[0] < _PREVIEW_MIN_INTERVAL:
+                f_prev = None
+            else:
+                f_prev, cached = _get(n + "/preview"), None
+            sst_stats[idx] = (f_prev, cached, _get(n + "/streamStats"), _get(n + "/linkStats"))
+
     # Iterate inputs
     for idx in range(min(nb, len(inputs_list))):
         i = inputs_list[idx] or {}
-        k = str(idx)
-        d = payload["inputs"][k]
+        d = input_dicts[idx]
 
         # status
         code = _norm_status_code(i)
         status = STATUS_MAP.get(code, "off")
         d["status"] = status
-        if status == "on":
-            counters["on"] += 1
-        elif status == "idle":
-            counters["idle"] += 1
-        elif status == "off":
-            counters["off"] += 1
-        else:
-            counters["error"] += 1
+        # STATUS_MAP only yields off/idle/on/error, the counter keys themselves
+        counters[status] += 1
 
         # basics
         d["name"] = i.get("name")
         d["identifier"] = i.get("identifier")
-        try:
-            d["recorder_status"] = RECORDER_MAP.get(int(i.get("recorderStatus", 1)), "off")
-        except Exception:
-            d["recorder_status"] = "off"
+        d["recorder_status"] = _safe_map(RECORDER_MAP, i.get("recorderStatus", 1), "off")
 
         # geo
         if i.get("locationStatus") is not None:
@@ -311,24 +532,16 @@ def fetch_streamhub(base_url: str, token: str | None = None, timeout: int = 5) -
             d["longitude"] = i.get("longitude")
 
         # encoders linkage (from configuration)
-        enc_cfg = (sh_cfg or {}).get("enc", {})
-        so_cfg = (sh_cfg or {}).get("streamingOutput", {})
-        for eidx in range(len(enc_cfg)):
-            ename = str(eidx + 1)
-            enc = enc_cfg.get(ename) or {}
-            if enc.get("enable") is True and enc.get("inputIndex") == idx:
-                e = d["encoders"].setdefault(ename, {"streaming_outputs": {}})
-                e["enable"] = True
-                e["input_index_linked"] = idx
-                # link streaming outputs for this encoder
-                for soidx in range(len(so_cfg)):
-                    soname = str(soidx + 1)
-                    so = so_cfg.get(soname) or {}
-                    if so.get("enable") is True and so.get("encoderIndex") == (int(ename) - 1):
-                        e["streaming_outputs"].setdefault(soname, {})
-                        e["streaming_outputs"][soname]["linked_streaming_output"] = True
-                        e["streaming_outputs"][soname]["linked_streaming_output_name"] = so.get("name")
-                        e["streaming_outputs"][soname]["linked_streaming_output_mode"] = so.get("mode")
+        for ename in encoders_by_input.get(idx, ()):
+            e = d["encoders"].setdefault(ename, {"streaming_outputs": {}})
+            e["enable"] = True
+            e["input_index_linked"] = idx
+            # link streaming outputs for this encoder
+            for soname, so in so_by_encoder.get(int(ename) - 1, ()):
+                e["streaming_outputs"].setdefault(soname, {})
+                e["streaming_outputs"][soname]["linked_streaming_output"] = True
+                e["streaming_outputs"][soname]["linked_streaming_output_name"] = so.get("name")
+                e["streaming_outputs"][soname]["linked_streaming_output_mode"] = so.get("mode")
 
         channel_type = i.get("channelType") or ""
 
@@ -338,9 +551,9 @@ def fetch_streamhub(base_url: str, token: str | None = None, timeout: int = 5) -
             d["family_name"] = i.get("familyName")
             d["message"] = i.get("message")
             d["version"] = i.get("version")
-            d["intercom_status"] = INTERCOM_MAP.get(int(i.get("intercomStatus", 1)))
-            d["intercom_profile"] = INTERCOM_PROFILE_MAP.get(int(i.get("intercomProfile", 1)))
-            d["video_ifb"]["video_ifb_preset_status"] = VIDEO_IFB_PRESET_MAP.get(int(i.get("videoReturnProfile", 0)))
+            d["intercom_status"] = _safe_map(INTERCOM_MAP, i.get("intercomStatus", 1))
+            d["intercom_profile"] = _safe_map(INTERCOM_PROFILE_MAP, i.get("intercomProfile", 1))
+            d["video_ifb"]["video_ifb_preset_status"] = _safe_map(VIDEO_IFB_PRESET_MAP, i.get("videoReturnProfile", 0))
             if d["video_ifb"]["video_ifb_preset_status"] == "off":
                 src_idx = i.get("videoReturnSrcIdx", -1)
                 if isinstance(src_idx, int) and 0 <= src_idx < len(inputs_list):
@@ -364,19 +577,26 @@ def fetch_streamhub(base_url: str, token: str | None = None, timeout: int = 5) -
                 d["family_name"] = i.get("familyName")
                 d["message"] = i.get("message")
                 d["version"] = i.get("version")
-                d["intercom_status"] = INTERCOM_MAP.get(int(i.get("intercomStatus", 1)))
-                d["intercom_profile"] = INTERCOM_PROFILE_MAP.get(int(i.get("intercomProfile", 1)))
-                d["video_ifb"]["video_ifb_preset_status"] = VIDEO_IFB_PRESET_MAP.get(int(i.get("videoReturnProfile", 0)))
+                d["intercom_status"] = _safe_map(INTERCOM_MAP, i.get("intercomStatus", 1))
+                d["intercom_profile"] = _safe_map(INTERCOM_PROFILE_MAP, i.get("intercomProfile", 1))
+                d["video_ifb"]["video_ifb_preset_status"] = _safe_map(VIDEO_IFB_PRESET_MAP, i.get("videoReturnProfile", 0))
+
+                f_prev, cached, f_sst, f_lst = sst_stats[idx]
 
                 # preview
-                ok_prev, prev, _ = _get_json_or_text(session, _full_url(base_url, f"/inputs/{idx+1}/preview", token), timeout=timeout)
-                if ok_prev:
-                    d["thumbnail"] = prev.get("thumbnail")
-                    d["audio_levels"] = prev.get("audioLevels")
+                if f_prev is None:
+                    _, _, d["thumbnail"], d["audio_levels"] = cached
+                else:
+                    ok_prev, prev, _ = f_prev.result()
+                    if ok_prev:
+                        d["thumbnail"] = prev.get("thumbnail")
+                        d["audio_levels"] = prev.get("audioLevels")
+                        _PREVIEW_CACHE[(base, idx)] = (time.monotonic(), i.get("identifier"),
+                                                       d["thumbnail"], d["audio_levels"])
 
                 # streamStats / linkStats
-                ok_sst, sstats, _ = _get_json_or_text(session, _full_url(base_url, f"/inputs/{idx+1}/streamStats", token), timeout=timeout)
-                ok_lst, lstats, _ = _get_json_or_text(session, _full_url(base_url, f"/inputs/{idx+1}/linkStats", token), timeout=timeout)
+                ok_sst, sstats, _ = f_sst.result()
+                ok_lst, lstats, _ = f_lst.result()
                 if not ok_sst:
                     sstats = {}
                 if not ok_lst:
@@ -384,21 +604,24 @@ def fetch_streamhub(base_url: str, token: str | None = None, timeout: int = 5) -
 
                 # --- Link stats (per-link + totals)
                 links_stats = (lstats or {}).get("links_stats", [])
-                total_data = sum((ls.get("recv_bytes", 0) + ls.get("send_bytes", 0)) for ls in links_stats)
+                links = d["links"]
+                links["total_links"] = int(i.get("connectedLinks", 0) or 0)
+                # totals and per-link entries in one pass over the links
+                total_data = total_rx = total_tx = 0
+                for j, ls in enumerate(links_stats):
+                    g = ls.get
+                    total_data += g("recv_bytes", 0) + g("send_bytes", 0)
+                    total_rx += int(g("rx_bitrate", 0) or 0)
+                    total_tx += int(g("tx_bitrate", 0) or 0)
+                    # ensure a name is present for the frontend label
+                    if not g("name") and g("itf_name"):
+                        ls["name"] = g("itf_name")
+                    links[str(j)] = ls
                 d["total_data"] = total_data
-
-                d["links"]["total_links"] = int(i.get("connectedLinks", 0) or 0)
-                total_rx = sum(int(ls.get("rx_bitrate", 0) or 0) for ls in links_stats)
-                total_tx = sum(int(ls.get("tx_bitrate", 0) or 0) for ls in links_stats)
-                d["links"]["total_rx_bitrate_from_links"] = total_rx
-                d["links"]["total_tx_bitrate_from_links"] = total_tx
+                links["total_rx_bitrate_from_links"] = total_rx
+                links["total_tx_bitrate_from_links"] = total_tx
                 d["low_rx_bitrate"] = (total_rx < 1500)
                 d["low_tx_bitrate"] = (total_tx < 1000)
-                for j, ls in enumerate(links_stats):
-                    # ensure a name is present for the frontend label
-                    if not ls.get("name") and ls.get("itf_name"):
-                        ls["name"] = ls.get("itf_name")
-                    d["links"][str(j)] = ls
 
                 # --- Dropped packets (rx_lost_packets) for video and mpegts-up
                 def _sum_drop(arr):
@@ -426,39 +649,32 @@ def fetch_streamhub(base_url: str, token: str | None = None, timeout: int = 5) -
                 d["protocol"] = channel_type or None
 
             # SDI outputs
-            for j in range(len(outs_sdi)):
-                out = outs_sdi[j] or {}
-                if out.get("enable") and out.get("input") == i.get("name"):
-                    d["sdi_outputs"][str(j + 1)] = out.get("outputStandard")
+            name = i.get("name")
+            for j, out in sdi_by_input.get(name, ()):
+                d["sdi_outputs"][str(j + 1)] = out.get("outputStandard")
 
             # IP outputs
-            for j in range(len(outs_ip)):
-                out = outs_ip[j] or {}
-                if out.get("enable") and out.get("input") == i.get("name"):
-                    key = str(j)
-                    d["ip_outputs"][key] = {
-                        "mode": out.get("mode"),
-                        "name": out.get("name"),
-                        "connections": out.get("connections"),
-                        "status": {2: "on", 1: "idle", 3: "error"}.get(int(out.get("status", 1)), "idle"),
-                    }
+            for j, out in ip_by_input.get(name, ()):
+                d["ip_outputs"][str(j)] = {
+                    "mode": out.get("mode"),
+                    "name": out.get("name"),
+                    "connections": out.get("connections"),
+                    "status": _safe_map(OUTPUT_STATUS_MAP, out.get("status", 1), "idle"),
+                }
 
             # NDI outputs
-            for j in range(len(outs_ndi)):
-                out = outs_ndi[j] or {}
-                if out.get("enable") and out.get("input") == i.get("name"):
-                    key = str(j)
-                    d["ndi_outputs"][key] = {
-                        "name": out.get("name"),
-                        "ndi_source_name": out.get("ndiSourceName"),
-                        "connections": out.get("nbConnect"),
-                        "status": {2: "on", 1: "idle", 3: "error"}.get(int(out.get("status", 1)), "idle"),
-                    }
+            for j, out in ndi_by_input.get(name, ()):
+                d["ndi_outputs"][str(j)] = {
+                    "name": out.get("name"),
+                    "ndi_source_name": out.get("ndiSourceName"),
+                    "connections": out.get("nbConnect"),
+                    "status": _safe_map(OUTPUT_STATUS_MAP, out.get("status", 1), "idle"),
+                }
 
         # Detect log-driven live events (start/stop) for this input
         try:
             if logs_ok:
-                ev = _detect_live_event_for_input(log_lines, idx + 1, d.get("identifier"))
+                ev = _detect_live_event_for_input(event_lines, idx + 1, d.get("identifier"))
                 d["log_event"] = ev  # 'start' / 'stop' / None
         except Exception:
             d["log_event"] = d.get("log_event")
@@ -509,7 +725,7 @@ def fetch_logs_structured(base_url: str, token: str | None = None,
         return False, []
     url = _full_url(base_url, "/logs", token)
     try:
-        r = _HTTP.get(
+        r = _session_for(base_url).get(
             url,
             headers={"Accept": "text/plain"},
             timeout=(2, timeout),
@@ -1,10 +1,153 @@
 # SPDX-License-Identifier: LGPL-2.1-or-later
 # Copyright (C) 2026 Alexandre Licinio
 import sqlite3, threading, time, datetime, queue
+from contextlib import contextmanager
 from typing import Dict, Tuple, Any
 
+try:
+    import cherrypy
+    _log = cherrypy.log
+except Exception:
+    def _log(*a, **kw):
+        pass
+
 DB_PATH = None  # set at import by server
+_UTC = datetime.timezone.utc
 TICK_SECONDS = 2
+# A tick identical to the session's last written one (same position, drops and link
+# values) is skipped, but rows are still written at least this often so the sample age
+# on /health stays under its 10 s "fresh" threshold
+HEARTBEAT_SEC = 8
+# PASSIVE checkpoint from the ticker this often, so the -wal file is folded back into the
+# database even while readers keep SQLite's automatic checkpoints from completing
+CHECKPOINT_SEC = 300
+# live_tick diagnostics from the ticker (one aggregated log line per tick)
+_DEBUG = False
+
+# Statements run on every session change / tick, built once
+_INSERT_SESSION_SQL = (
+    "INSERT INTO live_session(device_id, device_host, input_key, input_index, input_identifier,"
+    " input_display_name, started_at, title) VALUES (?,?,?,?,?,?,?,?)"
+)
+_UPDATE_SESSION_END_SQL = "UPDATE live_session SET ended_at=? WHERE id=?"
+_INSERT_SAMPLE_SQL = (
+    "INSERT INTO live_sample(session_id, ts, ts_ms,"
+    " latitude, longitude, drops_video, drops_ts,"
+    " link_name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets)"
+    " VALUES (?,?,?,?,?,?,?,?,?,?,?,?)"
+)
+# live_sample year..second: derived from ts by SQLite rather than written with each row
+_TIME_COLS = (('year', '%Y'), ('month', '%m'), ('day', '%d'),
+              ('hour', '%H'), ('minute', '%M'), ('second', '%S'))
+
+# Per-link field aliases, first non-None wins (owdR falls back to rtt as a last resort)
+_OWDR_KEYS = ('owdR', 'owd_r', 'owd', 'oneway', 'rtt')
+_RX_BITRATE_KEYS = ('rx_bitrate', 'rxBitrate', 'rx_kbits')
+_LOSS_PERCENT_KEYS = ('rx_percent_lost', 'rx_percent_loss', 'rx_loss_percent')
+_LOST_PACKETS_KEYS = ('rx_lost_nb_packets', 'rx_lost_packets', 'rx_lost_nb', 'rx_lost')
+
+
+def _first(d, keys):
+    for k in keys:
+        v = d.get(k)
+        if v is not None:
+            return v
+    return None
+
+
+def _to_int(x):
+    """Coerce numbers and numeric strings (decimal comma, units like "123 kb/s") to int."""
+    try:
+        if x is None:
+            return None
+        if isinstance(x, bool):
+            return int(x)
+        if isinstance(x, (int, float)):
+            return int(x)
+        s = str(x).strip().replace(',', '.')
+        # strip units if any (e.g., "123 kb/s")
+        m = ''.join(ch for ch in s if (ch.isdigit() or ch in '.-'))
+        return int(float(m)) if m not in ('', '-', '.') else None
+    except Exception:
+        return None
+
+
+# --- GPS extraction tables (built once; _extract_gps walks them for every session tick)
+_LAT_KEYS = ('latitude','lat','Latitude','Lat','gps_lat','y')
+_LNG_KEYS = ('longitude','lng','lon','long','Longitude','Lng','Lon','Long','gps_lng','gps_lon','x')
+# same order as the former nested lat/lng loops, so the first parsable pair still wins
+_LATLNG_PAIRS = tuple((la, lo) for la in _LAT_KEYS for lo in _LNG_KEYS)
+_GPS_CONTAINERS = (
+    'gps','GPS','location','position','geo','coordinates','geolocation','coord',
+    'metadata','meta','state','extra','status','status_details'
+)
+_GPS_LAST_KNOWN = ('last_gps','lastGps','last_position','lastPosition','last_location','lastLocation')
+# (key, deep) in search order: containers may also hold [lat, lng] arrays or one more
+# dict level (deep), last-known variants only flat lat/lng keys
+_GPS_PATHS = tuple((c, True) for c in _GPS_CONTAINERS) + tuple((c, False) for c in _GPS_LAST_KNOWN)
+
+
+def _to_float(x):
+    try:
+        if x is None:
+            return None
+        if isinstance(x, (int, float)):
+            return float(x)
+        s = str(x).strip()
+        # remove trailing N/E/S/W if present
+        if s and s[-1] in 'NESWnesw':
+            s = s[:-1]
+        # replace comma decimal
+        s = s.replace(',', '.')
+        return float(s)
+    except Exception:
+        return None
+
+
+def _gps_pair(lat_val, lng_val):
+    lat_f, lng_f = _to_float(lat_val), _to_float(lng_val)
+    if lat_f is None or lng_f is None:
+        return None
+    return {'lat': lat_f, 'lng': lng_f}
+
+
+def _latlng_in(d):
+    """First parsable lat/lng key pair of dict d, or None; dicts without any latitude
+    key (the common case) cost one pass over _LAT_KEYS."""
+    if not any(la in d for la in _LAT_KEYS):
+        return None
+    for la, lo in _LATLNG_PAIRS:
+        if la in d and lo in d:
+            p = _gps_pair(d[la], d[lo])
+            if p:
+                return p
+    return None
+
+
+def _gps_in(g, deep):
+    """GPS pair held by the value g of a _GPS_PATHS key, or None."""
+    if isinstance(g, dict):
+        p = _latlng_in(g)
+        if p or not deep:
+            return p
+        for vv in g.values():
+            # arrays [lat,lng]
+            if isinstance(vv, (list, tuple)):
+                if len(vv) >= 2:
+                    p = _gps_pair(vv[0], vv[1])
+                    if p:
+                        return p
+            # nested dict one more level
+            elif isinstance(vv, dict):
+                p = _latlng_in(vv)
+                if p:
+                    return p
+        return None
+    # coordinates provided as list/tuple at container
+    if deep and isinstance(g, (list, tuple)) and len(g) >= 2:
+        return _gps_pair(g[0], g[1])
+    return None
+
 
 class LiveLogger:
     def __init__(self, db_path):
@@ -13,12 +156,27 @@ class LiveLogger:
         self.db_path = str(db_path)
         self.lock = threading.RLock()
         self.last_payloads: Dict[str, dict] = {}
+        self._host_to_device: Dict[str, str] = {}
         self._stop = False
         self.sessions_en_cours: Dict[Tuple[str,str], Dict[str, Any]] = {}
+        # device_id -> (input key set, [(key, str(key))] for the digit keys)
+        self._input_keys: Dict[str, Tuple[frozenset, list]] = {}
+        # called with the session id after its ended_at is written (server: export cache)
+        self.on_session_end = None
+        # One writer connection for the logger's lifetime (PRAGMAs applied once), shared by
+        # observe_payload callers and the ticker under _wlock
+        self._wlock = threading.Lock()
+        self._write_conn = self._conn()
+        self._last_checkpoint = time.time()
         self._thread = threading.Thread(target=self._run_ticker, name="live_logger_ticker", daemon=True)
         self._thread.start()
         self._init_db()
 
+    @contextmanager
+    def _writer(self):
+        with self._wlock:
+            yield self._write_conn
+
     def _conn(self):
         conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=2.0)
         try:
@@ -32,7 +190,7 @@ class LiveLogger:
         return conn
 
     def _init_db(self):
-        with self._conn() as c:
+        with self._writer() as c:
             c.executescript("""
             CREATE TABLE IF NOT EXISTS live_session (
               id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -53,69 +211,94 @@ class LiveLogger:
               id INTEGER PRIMARY KEY AUTOINCREMENT,
               session_id INTEGER NOT NULL,
               ts DATETIME NOT NULL,
-              year INTEGER, month INTEGER, day INTEGER,
-              hour INTEGER, minute INTEGER, second INTEGER,
+              ts_ms INTEGER,
               latitude REAL, longitude REAL,
               drops_video INTEGER, drops_ts INTEGER,
               link_name TEXT, owdR INTEGER, rx_bitrate INTEGER,
               rx_percent_lost INTEGER, rx_lost_nb_packets INTEGER,
               FOREIGN KEY(session_id) REFERENCES live_session(id) ON DELETE CASCADE
             );
+            -- session_id prefix serves per-session deletes/cascades and time-range reads
+            CREATE INDEX IF NOT EXISTS idx_live_sample_sid_ts
+              ON live_sample(session_id, ts);
             """)
             # migration légère si title manquant
             cols_session = {r[1] for r in c.execute("PRAGMA table_info(live_session)").fetchall()}
             if 'title' not in cols_session:
                 c.execute("ALTER TABLE live_session ADD COLUMN title TEXT")
+            # epoch milliseconds alongside ISO ts (age computations without parsing)
+            cols_sample = {r[1] for r in c.execute("PRAGMA table_info(live_sample)").fetchall()}
+            if 'ts_ms' not in cols_sample:
+                c.execute("ALTER TABLE live_sample ADD COLUMN ts_ms INTEGER")
+                c.execute("UPDATE live_sample SET ts_ms = CAST((julianday(ts) - 2440587.5) * 86400000 AS INTEGER) WHERE ts_ms IS NULL")
+            self._migrate_time_columns(c)
 
-    def _now_parts(self):
-        now = datetime.datetime.utcnow()
-        return now, now.year, now.month, now.day, now.hour, now.minute, now.second
+    @staticmethod
+    def _migrate_time_columns(c):
+        """Make live_sample year..second VIRTUAL generated columns over ts (no storage, not
+        bound on insert). Stored columns from older DBs are dropped and re-added as
+        generated. SQLite without DROP COLUMN (< 3.35) keeps stored columns, filled from ts
+        by an insert trigger."""
+        try:
+            hidden = {r[1]: r[6] for r in c.execute("PRAGMA table_xinfo(live_sample)").fetchall()}
+        except sqlite3.Error:
+            hidden = {r[1]: 0 for r in c.execute("PRAGMA table_info(live_sample)").fetchall()}
+        if all(hidden.get(col) == 2 for col, _ in _TIME_COLS):
+            return
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            c.execute("DROP TRIGGER IF EXISTS live_sample_time_cols")
+            for col, fmt in _TIME_COLS:
+                if hidden.get(col) == 2:
+                    continue
+                if col in hidden:
+                    c.execute(f"ALTER TABLE live_sample DROP COLUMN {col}")
+                c.execute(f"ALTER TABLE live_sample ADD COLUMN {col} INTEGER"
+                          f" GENERATED ALWAYS AS (CAST(strftime('{fmt}', ts) AS INTEGER)) VIRTUAL")
+            c.execute("COMMIT")
+            return
+        except sqlite3.OperationalError:
+            c.execute("ROLLBACK")
+        for col, _ in _TIME_COLS:
+            if col not in hidden:
+                c.execute(f"ALTER TABLE live_sample ADD COLUMN {col} INTEGER")
+        sets = ", ".join(f"{col}=CAST(strftime('{fmt}', NEW.ts) AS INTEGER)" for col, fmt in _TIME_COLS)
+        c.execute("CREATE TRIGGER IF NOT EXISTS live_sample_time_cols AFTER INSERT ON live_sample"
+                  f" BEGIN UPDATE live_sample SET {sets} WHERE id=NEW.id; END")
+
+    @staticmethod
+    def _now_parts():
+        """(ts, ts_ms) for now, UTC: the time columns of a live_sample row (one call per
+        tick), ts also used for sessions. ts is the naive ISO form stored so far (aware
+        isoformat minus "+00:00")."""
+        now = datetime.datetime.now(_UTC)
+        return (now.isoformat()[:-6], int(now.timestamp() * 1000))
 
     def _start_session(self, device_id, device_host, input_key, input_index, input_identifier, input_display_name):
-        with self._conn() as c:
-            now, *_ = self._now_parts()
-            c.execute("""
-              INSERT INTO live_session(device_id, device_host, input_key, input_index, input_identifier, input_display_name, started_at, title)
-              VALUES (?,?,?,?,?,?,?,?)
-            """, (device_id, device_host, input_key, input_index, input_identifier, input_display_name, now.isoformat(), None))
-            session_id = c.execute("SELECT last_insert_rowid()").fetchone()[0]
+        with self._writer() as c:
+            cur = c.execute(_INSERT_SESSION_SQL, (device_id, device_host, input_key, input_index,
+                                                  input_identifier, input_display_name, self._now_parts()[0], None))
+            # the new id comes back with the INSERT itself (sqlite3_last_insert_rowid on this
+            # connection), so no RETURNING / follow-up SELECT round trip is needed
+            session_id = cur.lastrowid
         return session_id
 
     def _end_session(self, session_id):
-        with self._conn() as c:
-            now, *_ = self._now_parts()
-            c.execute("UPDATE live_session SET ended_at=? WHERE id=?", (now.isoformat(), session_id))
+        with self._writer() as c:
+            c.execute(_UPDATE_SESSION_END_SQL, (self._now_parts()[0], session_id))
+        if self.on_session_end:
+            self.on_session_end(session_id)
+
+    def is_tracking(self, session_id):
+        """True while session_id is still open here (the ticker may write samples to it)."""
+        with self.lock:
+            return any(info['session_id'] == session_id for info in self.sessions_en_cours.values())
 
     def _insert_samples(self, session_id, gps, drops, link_rows):
-        now, Y, M, D, h, m, s = self._now_parts()
-        lat = (gps or {}).get('lat')
-        lng = (gps or {}).get('lng')
-        dv = (drops or {}).get('video', 0)
-        dt = (drops or {}).get('ts', 0)
-        rows = []
-        if link_rows:
-            for it in link_rows:
-                rows.append((
-                    session_id, now.isoformat(), Y,M,D,h,m,s,
-                    lat, lng, dv, dt,
-                    it.get('name'), it.get('owdR'), it.get('rx_bitrate'),
-                    it.get('rx_percent_lost'), it.get('rx_lost_nb_packets')
-                ))
-        else:
-            rows.append((session_id, now.isoformat(), Y,M,D,h,m,s, lat, lng, dv, dt, None, None, None, None, None))
-        with self._conn() as c:
-            c.executemany(
-              """
-              INSERT INTO live_sample(session_id, ts, year, month, day, hour, minute, second,
-                latitude, longitude, drops_video, drops_ts,
-                link_name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets)
-              VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-              """,
-              rows
-            )
-
-    def _build_rows(self, session_id, gps, drops, link_rows):
-        now, Y, M, D, h, m, s = self._now_parts()
+        self._insert_samples_batch(self._build_rows(session_id, self._now_parts(), gps, drops, link_rows))
+
+    def _build_rows(self, session_id, stamp, gps, drops, link_rows):
+        ts, ts_ms = stamp
         lat = (gps or {}).get('lat')
         lng = (gps or {}).get('lng')
         dv = (drops or {}).get('video', 0)
@@ -124,43 +307,53 @@ class LiveLogger:
         if link_rows:
             for it in link_rows:
                 rows.append((
-                    session_id, now.isoformat(), Y, M, D, h, m, s,
+                    session_id, ts, ts_ms,
                     lat, lng, dv, dt,
                     it.get('name'), it.get('owdR'), it.get('rx_bitrate'),
                     it.get('rx_percent_lost'), it.get('rx_lost_nb_packets')
                 ))
         else:
-            rows.append((session_id, now.isoformat(), Y, M, D, h, m, s, lat, lng, dv, dt, None, None, None, None, None))
+            rows.append((session_id, ts, ts_ms, lat, lng, dv, dt, None, None, None, None, None))
         return rows
 
     def _insert_samples_batch(self, rows):
         if not rows:
             return
-        with self._conn() as c:
-            c.executemany(
-                """
-                INSERT INTO live_sample(session_id, ts, year, month, day, hour, minute, second,
-                  latitude, longitude, drops_video, drops_ts,
-                  link_name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-                """,
-                rows
-            )
+        with self._writer() as c:
+            # The whole tick (every session, every link) commits once
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                c.executemany(_INSERT_SAMPLE_SQL, rows)
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
 
     def observe_payload(self, device_id: str, device_host: str, payload: dict):
+        # Transitions are decided under the lock; the session row writes happen after it is
+        # released so the ticker and other pushes are not held up behind SQLite. An opening
+        # session is registered right away with session_id None (skipped by the ticker) and
+        # gets its id once the row exists.
+        to_open = []
+        to_close = []
         with self.lock:
-            # cache last full payload per device id and host (some installs use one or the other)
+            # cache last full payload per device id; the host resolves to the device id it
+            # was last seen with (some installs use one or the other)
             p = payload or {}
             self.last_payloads[device_id] = p
             if device_host:
-                self.last_payloads[device_host] = p
+                self._host_to_device[device_host] = device_id
             inputs = (payload or {}).get('inputs', {})
+            # digit input keys (skipping channels/on/idle/... counters), re-derived only
+            # when the device's key set changes
+            cached = self._input_keys.get(device_id)
+            if cached is None or inputs.keys() != cached[0]:
+                cached = (frozenset(inputs), [(key, str(key)) for key in inputs if str(key).isdigit()])
+                self._input_keys[device_id] = cached
             # transitions — SST only (exclude RTMP/SRT/HLS/RTSP/NDI/File/...)
-            for key, v in list(inputs.items()):
-                if not str(key).isdigit():
-                    continue
-                v = v or {}
-                k = (device_id, str(key))
+            for key, skey in cached[1]:
+                v = inputs.get(key) or {}
+                k = (device_id, skey)
 
                 # Normalize protocol and status
                 proto_raw = v.get('protocol')
@@ -172,51 +365,93 @@ class LiveLogger:
                 # Enforce SST strictly for opening/keeping sessions
                 is_sst = ('sst' in proto) if proto else False
 
-                # If protocol is explicitly non-SST, close any existing session and skip
-                if proto and not is_sst:
+                # If protocol is explicitly non-SST, close any existing session and skip;
+                # otherwise close if it turns OFF (proto SST or missing but session exists)
+                if (proto and not is_sst) or not is_on:
                     if k in self.sessions_en_cours:
-                        self._end_session(self.sessions_en_cours[k]['session_id'])
-                        del self.sessions_en_cours[k]
+                        self._pop_session(k, to_close)
                     continue
 
                 # Open only if SST and status is ON
-                if is_sst and is_on and k not in self.sessions_en_cours:
-                    input_index = int(key) + 1
+                if is_sst and k not in self.sessions_en_cours:
+                    input_index = int(skey) + 1
                     input_identifier = v.get('identifier') or f'input {input_index}'
                     input_display_name = v.get('familyName') or v.get('family_name') or None
-                    sid = self._start_session(device_id, device_host, str(key), input_index, input_identifier, input_display_name)
-                    self.sessions_en_cours[k] = {'session_id': sid, 'last_tick': 0.0, 'last_gps': None, 'host': device_host}
+                    info = {'session_id': None, 'last_tick': 0.0, 'last_gps': None, 'host': device_host}
+                    self.sessions_en_cours[k] = info
+                    to_open.append((k, info, (device_id, device_host, skey, input_index, input_identifier, input_display_name)))
+
+        # each write on its own: one failure must not strand the remaining placeholders
+        for sid in to_close:
+            try:
+                self._end_session(sid)
+            except Exception:
+                _log(f"live_logger: end_session {sid} failed", traceback=True)
+        for k, info, args in to_open:
+            try:
+                sid = self._start_session(*args)
+            except Exception:
+                _log(f"live_logger: start_session {k} failed", traceback=True)
+                # drop the placeholder so the next payload retries the open
+                with self.lock:
+                    if self.sessions_en_cours.get(k) is info:
+                        del self.sessions_en_cours[k]
+                continue
+            with self.lock:
+                info['session_id'] = sid
+                closed = info.get('closed')
+            if closed:
+                # closed by a later payload while the row was being written
+                try:
+                    self._end_session(sid)
+                except Exception:
+                    _log(f"live_logger: end_session {sid} failed", traceback=True)
 
-                # Close if turns OFF (when proto is SST or proto missing but session exists)
-                if (not is_on) and k in self.sessions_en_cours:
-                    self._end_session(self.sessions_en_cours[k]['session_id'])
-                    del self.sessions_en_cours[k]
+    def _pop_session(self, k, to_close):
+        """Drop session k (caller holds self.lock); queue its id for _end_session, or flag
+        it as closed when its row is still being opened."""
+        info = self.sessions_en_cours.pop(k)
+        if info['session_id'] is None:
+            info['closed'] = True
+        else:
+            to_close.append(info['session_id'])
 
     def _run_ticker(self):
         while not getattr(self, '_stop', False):
             try:
                 with self.lock:
                     now = time.time()
-                    # copy keys to avoid mutation during iteration
-                    sessions = list(self.sessions_en_cours.items())
                     batch_rows = []
-                    for (dev_id, input_key), info in sessions:
+                    debug_sessions = []
+                    stamp = self._now_parts()
+                    # sessions_en_cours is only resized under self.lock, held for the whole
+                    # loop, so it is iterated in place rather than copied
+                    for (dev_id, input_key), info in self.sessions_en_cours.items():
+                        if info['session_id'] is None:
+                            # still being opened by observe_payload
+                            continue
                         payload = self.last_payloads.get(dev_id)
-                        if payload is None:
-                            payload = self.last_payloads.get(info.get('host'))
+                        if payload is None and info.get('host'):
+                            payload = self.last_payloads.get(self._host_to_device.get(info['host']))
+                            if payload:
+                                _log(f"ticker: fallback to host payload for dev {dev_id} host {info['host']}")
                         payload = payload or {}
-                        if not self.last_payloads.get(dev_id) and info.get('host') and self.last_payloads.get(info['host']):
-                            try:
-                                import cherrypy; cherrypy.log(f"ticker: fallback to host payload for dev {dev_id} host {info['host']}")
-                            except Exception:
-                                pass
                         inputs = (payload or {}).get('inputs', {})
-                        v = inputs.get(input_key)
+                        # inputs keyed by str or int depending on the payload source: the form
+                        # that resolved is kept per session, both are retried on a miss
+                        v = inputs.get(info.get('key', input_key))
                         if v is None:
-                            try:
-                                v = inputs.get(int(input_key))
-                            except Exception:
-                                v = None
+                            v = inputs.get(input_key)
+                            if v is not None:
+                                info['key'] = input_key
+                            else:
+                                try:
+                                    ik = int(input_key)
+                                except ValueError:
+                                    ik = None
+                                v = inputs.get(ik)
+                                if v is not None:
+                                    info['key'] = ik
                         v = v or {}
                         gps = self._extract_gps(v)
                         if not gps:
@@ -224,101 +459,65 @@ class LiveLogger:
                         else:
                             info['last_gps'] = gps
                         drops = ((v.get('notifications') or {}).get('dropped')) or {}
-                        link_rows = []
+                        # Columns shared by every row of this session's tick; each link appends
+                        # its own INSERT tuple straight into the batch
+                        head = (info['session_id'],) + stamp + (
+                            (gps or {}).get('lat'), (gps or {}).get('lng'),
+                            drops.get('video', 0), drops.get('ts', 0),
+                        )
+                        n_before = len(batch_rows)
                         L = v.get('links') or {}
                         for lk, it in L.items():
                             if lk in ('total_links','total_rx_bitrate_from_links','total_tx_bitrate_from_links'):
                                 continue
                             if not isinstance(it, dict):
-                                link_rows.append({'name': lk, 'owdR': None, 'rx_bitrate': None, 'rx_percent_lost': None, 'rx_lost_nb_packets': None})
+                                batch_rows.append(head + (lk, None, None, None, None))
                                 continue
-                            # helpers to coerce to int safely
-                            def to_int(x):
-                                try:
-                                    if x is None:
-                                        return None
-                                    if isinstance(x, bool):
-                                        return int(x)
-                                    if isinstance(x, (int, float)):
-                                        return int(x)
-                                    s = str(x).strip().replace(',', '.')
-                                    # strip units if any (e.g., "123 kb/s")
-                                    m = ''.join(ch for ch in s if (ch.isdigit() or ch in '.-'))
-                                    return int(float(m)) if m not in ('', '-', '.') else None
-                                except Exception:
-                                    return None
-
                             name = it.get('name') or lk
-                            # owdR fallbacks
-                            owdR = it.get('owdR')
-                            if owdR is None:
-                                owdR = it.get('owd_r')
-                            if owdR is None:
-                                owdR = it.get('owd')
-                            if owdR is None:
-                                owdR = it.get('oneway')
-                            if owdR is None:
-                                owdR = it.get('rtt')  # as last resort
-                            owdR = to_int(owdR)
-
-                            # rx_bitrate fallbacks
-                            rx_bitrate = it.get('rx_bitrate')
-                            if rx_bitrate is None:
-                                rx_bitrate = it.get('rxBitrate')
-                            if rx_bitrate is None:
-                                rx_bitrate = it.get('rx_kbits')
+                            owdR = _to_int(_first(it, _OWDR_KEYS))
+                            rx_bitrate = _first(it, _RX_BITRATE_KEYS)
                             if rx_bitrate is None:
+                                # last resort: bitrate / rx, possibly {kbits|value}
                                 rb = it.get('bitrate') or it.get('rx')
                                 if isinstance(rb, dict):
                                     rb = rb.get('kbits') or rb.get('value')
                                 rx_bitrate = rb
-                            rx_bitrate = to_int(rx_bitrate)
-
-                            # loss metrics
-                            rx_percent_lost = it.get('rx_percent_lost')
-                            if rx_percent_lost is None:
-                                rx_percent_lost = it.get('rx_percent_loss')
-                            if rx_percent_lost is None:
-                                rx_percent_lost = it.get('rx_loss_percent')
-                            rx_percent_lost = to_int(rx_percent_lost)
-
-                            rx_lost_nb_packets = it.get('rx_lost_nb_packets')
-                            if rx_lost_nb_packets is None:
-                                rx_lost_nb_packets = it.get('rx_lost_packets')
-                            if rx_lost_nb_packets is None:
-                                rx_lost_nb_packets = it.get('rx_lost_nb')
-                            if rx_lost_nb_packets is None:
-                                rx_lost_nb_packets = it.get('rx_lost')
-                            rx_lost_nb_packets = to_int(rx_lost_nb_packets)
-                            link_rows.append({
-                                'name': name,
-                                'owdR': owdR,
-                                'rx_bitrate': rx_bitrate,
-                                'rx_percent_lost': rx_percent_lost,
-                                'rx_lost_nb_packets': rx_lost_nb_packets
-                            })
-                        # Always append a sample every tick (even if no links)
-                        try:
-                            import cherrypy
-                            cherrypy.log(f"live_tick session={info['session_id']} dev={dev_id} in={input_key} links={len(link_rows)} lat={(gps or {}).get('lat')} lng={(gps or {}).get('lng')}")
-                        except Exception:
-                            pass
-                        batch_rows.extend(self._build_rows(info['session_id'], gps, drops, link_rows))
+                            rx_bitrate = _to_int(rx_bitrate)
+                            rx_percent_lost = _to_int(_first(it, _LOSS_PERCENT_KEYS))
+                            rx_lost_nb_packets = _to_int(_first(it, _LOST_PACKETS_KEYS))
+                            batch_rows.append(head + (name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets))
+                        n_links = len(batch_rows) - n_before
+                        # A session always gets a sample row (even if no links)
+                        if not n_links:
+                            batch_rows.append(head + (None, None, None, None, None))
+                        # Drop the tick when nothing but the time columns changed (stale or
+                        # steady payload), up to the heartbeat
+                        values = tuple(r[3:] for r in batch_rows[n_before:])
+                        if values == info.get('last_values') and now - info.get('last_written', 0.0) < HEARTBEAT_SEC:
+                            del batch_rows[n_before:]
+                            continue
+                        info['last_values'] = values
+                        info['last_written'] = now
+                        if _DEBUG:
+                            debug_sessions.append((info['session_id'], dev_id, input_key, n_links))
+                if debug_sessions:
+                    _log("live_tick " + "; ".join(f"s{s} d{d} i{i} L{n}" for s, d, i, n in debug_sessions))
                 # flush outside the lock
                 try:
                     self._insert_samples_batch(batch_rows)
                 except Exception:
+                    _log('live_logger_ticker: batch insert error', traceback=True)
+                if now - self._last_checkpoint >= CHECKPOINT_SEC:
+                    self._last_checkpoint = now
                     try:
-                        import cherrypy; cherrypy.log('live_logger_ticker: batch insert error', traceback=True)
+                        with self._writer() as c:
+                            c.execute("PRAGMA wal_checkpoint(PASSIVE)")
                     except Exception:
-                        pass
+                        _log('live_logger_ticker: wal checkpoint error', traceback=True)
                 time.sleep(TICK_SECONDS)
             except Exception:
                 # be resilient; never crash the ticker
-                try:
-                    import cherrypy; cherrypy.log('live_logger_ticker: exception', traceback=True)
-                except Exception:
-                    pass
+                _log('live_logger_ticker: exception', traceback=True)
                 time.sleep(TICK_SECONDS)
 
     def _extract_gps(self, v):
@@ -329,87 +528,33 @@ class LiveLogger:
       if not isinstance(v, dict):
           return None
 
-      # helpers
-      def to_float(x):
-          try:
-              if x is None:
-                  return None
-              if isinstance(x, (int, float)):
-                  return float(x)
-              s = str(x).strip()
-              # remove trailing N/E/S/W if present
-              if s and s[-1] in 'NESWnesw':
-                  s = s[:-1]
-              # replace comma decimal
-              s = s.replace(',', '.')
-              return float(s)
-          except Exception:
-              return None
-
-      def pair(lat_val, lng_val):
-          lat_f, lng_f = to_float(lat_val), to_float(lng_val)
-          if lat_f is None or lng_f is None:
-              return None
-          return {'lat': lat_f, 'lng': lng_f}
-
-      lat_keys = ('latitude','lat','Latitude','Lat','gps_lat','y')
-      lng_keys = ('longitude','lng','lon','long','Longitude','Lng','Lon','Long','gps_lng','gps_lon','x')
-
       # 1) top-level direct keys
-      for la in lat_keys:
-          for lo in lng_keys:
-              if la in v and lo in v:
-                  p = pair(v.get(la), v.get(lo))
-                  if p:
-                      return p
-
-      # 2) known containers (one level)
-      containers = (
-          'gps','GPS','location','position','geo','coordinates','geolocation','coord',
-          'metadata','meta','state','extra','status','status_details'
-      )
-      for ckey in containers:
-          g = v.get(ckey)
-          if isinstance(g, dict):
-              # 2a) dict with lat/lng
-              for la in lat_keys:
-                  for lo in lng_keys:
-                      if la in g and lo in g:
-                          p = pair(g.get(la), g.get(lo))
-                          if p:
-                              return p
-              # 2b) array-like forms inside container
-              for kk, vv in g.items():
-                  # arrays [lat,lng]
-                  if isinstance(vv, (list, tuple)) and len(vv) >= 2:
-                      p = pair(vv[0], vv[1])
-                      if p:
-                          return p
-                  # nested dict one more level
-                  if isinstance(vv, dict):
-                      for la in lat_keys:
-                          for lo in lng_keys:
-                              if la in vv and lo in vv:
-                                  p = pair(vv.get(la), vv.get(lo))
-                                  if p:
-                                      return p
-          # coordinates provided as list/tuple at container
-          if isinstance(g, (list, tuple)) and len(g) >= 2:
-              p = pair(g[0], g[1])
+      p = _latlng_in(v)
+      if p:
+          return p
+
+      # 2) known containers, then 3) last-known variants
+      get = v.get
+      for ckey, deep in _GPS_PATHS:
+          g = get(ckey)
+          if g is not None:
+              p = _gps_in(g, deep)
               if p:
                   return p
-
-      # 3) last-known variants
-      for ckey in ('last_gps','lastGps','last_position','lastPosition','last_location','lastLocation'):
-          g = v.get(ckey)
-          if isinstance(g, dict):
-              for la in lat_keys:
-                  for lo in lng_keys:
-                      if la in g and lo in g:
-                          p = pair(g.get(la), g.get(lo))
-                          if p:
-                              return p
       return None
 
     def stop(self):
         self._stop = True
+        # let the ticker finish its current flush/checkpoint before the connection goes away
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=TICK_SECONDS + 2)
+        with self._wlock:
+            try:
+                # refresh planner statistics for the next start, then release the file
+                self._write_conn.execute("PRAGMA optimize")
+            except Exception:
+                pass
+            try:
+                self._write_conn.close()
+            except Exception:
+                pass
@@ -11,49 +11,403 @@ if str(PROJECT_ROOT) not in sys.path:
 import base64, hashlib as _hl
 from datetime import datetime as _dt, timedelta as _td, timezone as _tz
     
-import json, html as _html
+import json, html as _html, csv, io
 import os, time, sqlite3, cherrypy
 import hashlib, secrets, functools
-import threading
-import random
-from collections import deque
+import threading, weakref
+import queue
+from array import array
+from collections import deque, OrderedDict, defaultdict
 from typing import Optional
 from mako.lookup import TemplateLookup
-from collect.scripts.streamhub import fetch_streamhub
+try:
+    import orjson as _orjson  # optional, much faster JSON encoding
+except ImportError:
+    _orjson = None
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collect.scripts.streamhub import fetch_streamhub, fetch_logs_structured
 try:
     from .logger import LiveLogger  # cas package
 except Exception:
     from logger import LiveLogger    # cas script direct
 
+def _dumps(obj) -> bytes:
+    """Compact UTF-8 JSON bytes; orjson when installed, stdlib json otherwise."""
+    if _orjson is not None:
+        try:
+            return _orjson.dumps(obj, option=_orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+# /data response envelope: {"ok":..,"payload":..,"timestamp":..}
+_DATA_OK_HEAD = b'{"ok":true,"payload":'
+_DATA_KO_HEAD = b'{"ok":false,"payload":'
+_DATA_TS_MID = b',"timestamp":'
+
+# Error bodies of /data and the session export endpoints (kept byte-identical per endpoint)
+_ERR_MISSING_ID = b'{"ok": false, "error": "missing id"}'
+_ERR_BAD_SID = b'{"ok": false, "error": "bad session_id"}'
+_ERR_SESSION_NOT_FOUND = b'{"ok": false, "error": "session_not_found"}'
+_ERR_NO_DEVICE_FOR_SESSION_HOST = b'{"ok": false, "error": "device_not_found_for_session_host"}'
+_ERR_NO_DEVICE_FOR_HOST = b'{"ok": false, "error": "device_not_found_for_host"}'
+_ERR_NOT_FOUND = b'{"ok": false, "error": "not found"}'
+_ERR_JSON_MISSING_SID = b'{"ok": false, "error":"missing session_id"}'
+_ERR_JSON_BAD_SID = b'{"ok": false, "error":"bad session_id"}'
+_ERR_JSON_SESSION_NOT_FOUND = b'{"ok": false, "error":"session_not_found"}'
+_ERR_CSV_MISSING_SID = b'error, missing session_id'
+_ERR_CSV_BAD_SID = b'error, bad session_id'
+_ERR_GEO_MISSING_SID = b'{"error":"missing session_id"}'
+_ERR_GEO_BAD_SID = b'{"error":"bad session_id"}'
+_ERR_GEO_SESSION_NOT_FOUND = b'{"error":"session_not_found"}'
+
+def _fixed(body):
+    """Return a small bytes body with an explicit Content-Length, so a handler
+    configured with response.stream does not send it chunked."""
+    cherrypy.response.headers['Content-Length'] = str(len(body))
+    return body
+
 BASE_DIR = Path(__file__).resolve().parent
 ROOT = BASE_DIR.parent  # project root
 DB_PATH = ROOT / "mini.db"
-APP_META = {"client": None, "status": None}
-
-def _get_client_status():
-    """Load client/status from environment variables (no YAML)."""
+# log_view's script is a static file; its mtime busts browser caches after an upgrade
+try:
+    _LOG_VIEW_JS_VER = str(int((BASE_DIR / 'static' / 'log_view.js').stat().st_mtime))
+except OSError:
+    _LOG_VIEW_JS_VER = '0'
+APP_META = {"client": None, "status": None, "max_streamhub": None}
+
+def _load_app_meta():
+    """Resolve env-driven UI settings once (CLIENT_NAME, MAX_STREAMHUB).
+    Called from run(), after __main__ has exported the CLI arguments."""
+    APP_META["client"] = (os.getenv('CLIENT_NAME') or '').strip() or None
+    limit_env = os.getenv('MAX_STREAMHUB')
     try:
-        client = (os.getenv('CLIENT_NAME') or '').strip() or None
-        APP_META["client"] = client
-        APP_META["status"] = status
-        return client, status
+        limit = int(limit_env) if (limit_env is not None and str(limit_env).strip()) else 1
     except Exception:
-        return APP_META.get("client"), APP_META.get("status")
+        limit = 1
+    APP_META["max_streamhub"] = max(1, limit)
+    return APP_META
+
+def _get_client_status():
+    """Return cached (client, status); resolved lazily if run() was bypassed."""
+    if APP_META.get("max_streamhub") is None:
+        _load_app_meta()
+    return APP_META.get("client"), APP_META.get("status")
+
+def _max_streamhub():
+    if APP_META.get("max_streamhub") is None:
+        _load_app_meta()
+    return APP_META["max_streamhub"]
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 LOGGER = LiveLogger(DB_PATH)
 
 # Global poller reference for health/status
 POLLER = None
 
+# Compiled templates are cached on disk and in memory; set SP_TEMPLATE_RELOAD=1
+# while editing view/*.html to re-check mtimes on every render.
 lookup = TemplateLookup(
     directories=[str(BASE_DIR / "view")],
+    module_directory=str(BASE_DIR / "view" / "__mako_cache__"),
+    filesystem_checks=(os.getenv("SP_TEMPLATE_RELOAD") or "").strip() in ("1", "true", "yes"),
+    collection_size=256,
     input_encoding="utf-8",
     output_encoding="utf-8",
     encoding_errors="replace",
 )
 
+# --- Shared SQL (module constants so every call hits the per-connection statement cache) ---
+
+# ISO `ts` (UTC) -> epoch milliseconds, for backfilling live_sample.ts_ms
+_TS_MS_FROM_TS = "CAST((julianday(ts) - 2440587.5) * 86400000 AS INTEGER)"
+
+SQL_DEVICES = "SELECT id,name,protocol,host,port,api_path,token FROM devices"
+
+# Last sample epoch ms per host (poller age history)
+SQL_LAST_MS_BY_HOST = (
+    "SELECT ls.device_host, MAX(s.ts_ms) FROM live_session ls "
+    "LEFT JOIN live_sample s ON s.session_id = ls.id "
+    "GROUP BY ls.device_host"
+)
+
+# (id, name, protocol, host, port, last_ts, last_ts_ms, active_sessions) per device
+SQL_DEVICE_OVERVIEW = (
+    "SELECT d.id, d.name, d.protocol, d.host, d.port,"
+    " (SELECT MAX(s.ts) FROM live_sample s JOIN live_session x ON x.id = s.session_id"
+    "   WHERE x.device_host = d.host),"
+    " (SELECT MAX(s.ts_ms) FROM live_sample s JOIN live_session x ON x.id = s.session_id"
+    "   WHERE x.device_host = d.host),"
+    " (SELECT COUNT(*) FROM live_session WHERE device_host = d.host AND ended_at IS NULL)"
+    " FROM devices d ORDER BY d.id ASC"
+)
+
+SQL_INSERT_SAMPLE = (
+    "INSERT INTO live_sample(session_id, ts, latitude, longitude, "
+    "drops_video, drops_ts, link_name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets) "
+    "VALUES(?,?,?,?,?,?,?,?,?,?,?)"
+)
+
+def _csv_cell(v):
+    """One CSV field, same output as csv.writer's QUOTE_MINIMAL: samples are numeric
+    except ts and link_name, so only strings are checked for quoting."""
+    if v is None:
+        return ''
+    if v.__class__ is str:
+        if ',' in v or '"' in v or '\n' in v or '\r' in v:
+            return '"' + v.replace('"', '""') + '"'
+        return v
+    return str(v)
+
+# GeoJSON tick quality: good if owd<=100, fair if 100<owd<200, poor if owd>=200.
+# Unknown OWD ranks as good so it never hides a worse link on the same tick.
+_Q = ('good', 'fair', 'poor')
+
+def _rank(owd):
+    if not isinstance(owd, (int, float)):
+        return 0
+    return 2 if owd >= 200 else (1 if owd > 100 else 0)
+
+# Column order of the live_session SELECTs behind /logs and the exports
+_LOG_KEYS = ("id", "device_id", "device_host", "input_key", "input_index",
+             "input_identifier", "input_display_name", "started_at", "ended_at", "title")
+
+def _group_samples(rows):
+    """Group live_sample rows (ts, year..second, lat, lng, drops_video, drops_ts,
+    link_name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets) by tick.
+    Lat/lng and drops appear once per tick, with every link listed under it.
+    Rows must be ORDER BY id: dict insertion order is then tick order.
+    Pass the cursor itself, so the raw rows are never all held in memory at once."""
+    by_ts = {}
+    get = by_ts.get
+    for r in rows:
+        # Index instead of unpacking all 16 columns: year..second are only read for a new tick
+        link = {
+            "name": r[11],
+            "owdR": r[12],
+            "rx_bitrate": r[13],
+            "rx_percent_lost": r[14],
+            "rx_lost_nb_packets": r[15],
+        }
+        ts = r[0]
+        entry = get(ts)
+        if entry is None:
+            by_ts[ts] = {
+                "ts": ts,
+                "year": r[1], "month": r[2], "day": r[3],
+                "hour": r[4], "minute": r[5], "second": r[6],
+                "latitude": r[7], "longitude": r[8],
+                "drops_video": r[9], "drops_ts": r[10],
+                "links": [link]
+            }
+            continue
+        # prefer non-null GPS if some rows have it per tick
+        if entry["latitude"] is None and r[7] is not None:
+            entry["latitude"] = r[7]
+        if entry["longitude"] is None and r[8] is not None:
+            entry["longitude"] = r[8]
+        if r[9] is not None:
+            entry["drops_video"] = r[9]
+        if r[10] is not None:
+            entry["drops_ts"] = r[10]
+        entry["links"].append(link)
+    return list(by_ts.values())
+
+def _tick_owd(tick):
+    """Worst OWD of a tick's links; a link without a usable OWD counts as infinitely bad
+    (log_view scores it 'poor'). None for a tick without links."""
+    worst = None
+    for link in tick["links"]:
+        v = link["owdR"]
+        try:
+            v = float(v) if v is not None else float('inf')
+        except (TypeError, ValueError):
+            try:
+                v = float(str(v).replace(',', '.'))
+            except ValueError:
+                v = float('inf')
+        if worst is None or v > worst:
+            worst = v
+    return worst
+
+def _num(v):
+    """Float of a numeric link field (decimal comma accepted), None if not numeric."""
+    if v is None:
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        try:
+            return float(str(v).replace(',', '.'))
+        except ValueError:
+            return None
+
+def _tick_loss(tick):
+    """Highest rx_percent_lost of a tick's links, None when no link reports one."""
+    worst = None
+    for link in tick["links"]:
+        v = _num(link["rx_percent_lost"])
+        if v is not None and (worst is None or v > worst):
+            worst = v
+    return worst
+
+def _tick_bitrate(tick):
+    """Total rx_bitrate of a tick's links, None when no link reports one."""
+    total = None
+    for link in tick["links"]:
+        v = _num(link["rx_bitrate"])
+        if v is not None:
+            total = v if total is None else total + v
+    return total
+
+def _decimate_ticks(samples, buckets):
+    """M4 over grouped ticks: per bucket keep the first and last tick, the ticks with the
+    lowest and highest worst-link OWD, the highest packet loss and the lowest total bitrate,
+    so quality changes, loss spikes, bitrate dips, the cumulative drop counters and the last
+    tick (the live cursor) all survive. Returns samples unchanged when small enough."""
+    n = len(samples)
+    if buckets <= 0 or n <= buckets * 4:
+        return samples
+    keep = []
+    size = n / buckets
+    for b in range(buckets):
+        lo, hi = int(b * size), min(n, int((b + 1) * size))
+        if lo >= hi:
+            continue
+        i_min = i_max = i_loss = i_rate = None
+        v_min = v_max = v_loss = v_rate = None
+        for i in range(lo, hi):
+            tick = samples[i]
+            v = _tick_owd(tick)
+            if v is not None:
+                if v_min is None or v < v_min:
+                    v_min, i_min = v, i
+                if v_max is None or v > v_max:
+                    v_max, i_max = v, i
+            v = _tick_loss(tick)
+            if v is not None and (v_loss is None or v > v_loss):
+                v_loss, i_loss = v, i
+            v = _tick_bitrate(tick)
+            if v is not None and (v_rate is None or v < v_rate):
+                v_rate, i_rate = v, i
+        for i in sorted({lo, hi - 1, i_min, i_max, i_loss, i_rate} - {None}):
+            keep.append(samples[i])
+    return keep
+
+# --- Export cache: a session with ended_at set no longer changes, so its encoded
+# JSON/CSV/GeoJSON export is kept (bounded LRU) until it is renamed or deleted ---
+_EXPORT_CACHE = OrderedDict()  # (session_id, fmt, tz_offset) -> bytes
+_EXPORT_CACHE_MAX = 64
+# log_download ?pixels= granularity (decimation width and cache key)
+_PIXELS_STEP = 256
+_EXPORT_CACHE_LOCK = threading.Lock()
+
+def _export_cache_get(key):
+    with _EXPORT_CACHE_LOCK:
+        data = _EXPORT_CACHE.get(key)
+        if data is not None:
+            _EXPORT_CACHE.move_to_end(key)
+        return data
+
+def _export_cache_put(key, data):
+    with _EXPORT_CACHE_LOCK:
+        _EXPORT_CACHE[key] = data
+        _EXPORT_CACHE.move_to_end(key)
+        while len(_EXPORT_CACHE) > _EXPORT_CACHE_MAX:
+            _EXPORT_CACHE.popitem(last=False)
+
+def _export_settled(sid, ended_at):
+    """True once session sid can be cached: it ended a few poll cycles ago (the poller
+    persists streamhub_log events up to one poll after ended_at, and the JSON export
+    carries those events) and LOGGER no longer tracks it (a session stopped from
+    /log_stop keeps getting samples until its input goes off)."""
+    if not ended_at:
+        return False
+    try:
+        end = _dt.fromisoformat(str(ended_at)[:19])
+    except ValueError:
+        return False
+    interval = getattr(POLLER, 'interval', 2.0) if POLLER else 2.0
+    # at least 10 s: a cycle can outlast its interval by the 5 s fetch timeout
+    if (_dt.now(_tz.utc).replace(tzinfo=None) - end).total_seconds() < max(3 * interval, 10.0):
+        return False
+    return not LOGGER.is_tracking(sid)
+
+def _export_cache_drop(session_id=None):
+    """Forget cached exports of one session, or all of them when session_id is None."""
+    with _EXPORT_CACHE_LOCK:
+        if session_id is None:
+            _EXPORT_CACHE.clear()
+            return
+        for k in [k for k in _EXPORT_CACHE if k[0] == session_id]:
+            del _EXPORT_CACHE[k]
+
+# The logger rewrites ended_at when it closes a session itself
+LOGGER.on_session_end = _export_cache_drop
+
+def _not_modified(data):
+    """Tag an export of an ended session so browsers revalidate instead of re-downloading.
+    Returns True (status set to 304) when If-None-Match already holds this content."""
+    tag = '"%s"' % hashlib.sha1(data).hexdigest()[:20]
+    cherrypy.response.headers['ETag'] = tag
+    cherrypy.response.headers['Cache-Control'] = 'private, no-cache'
+    if tag in cherrypy.request.headers.get('If-None-Match', ''):
+        cherrypy.response.status = 304
+        return True
+    return False
+
+# --- Short-lived StreamHub response cache for /data (dashboards polling the same device) ---
+_STREAMHUB_CACHE = {}  # (base, token) -> (monotonic ts, ok, payload)
+_STREAMHUB_CACHE_LOCK = threading.Lock()
+
+def _cached_fetch(base, token, ttl=0.5, timeout=5):
+    """fetch_streamhub() memoized for `ttl` seconds per (base, token).
+    Returns (ok, payload, fresh); fresh is False when served from the cache."""
+    key = (base, token)
+    with _STREAMHUB_CACHE_LOCK:
+        hit = _STREAMHUB_CACHE.get(key)
+    if hit is not None and time.monotonic() - hit[0] < ttl:
+        return hit[1], hit[2], False
+    ok, payload = fetch_streamhub(base, token, timeout=timeout)
+    with _STREAMHUB_CACHE_LOCK:
+        _STREAMHUB_CACHE[key] = (time.monotonic(), ok, payload)
+    return ok, payload, True
+
 # --- Background poller for StreamHub data ---
 
+class AgeRing:
+    """Fixed-capacity ring of last-sample ages (seconds) for the health sparklines.
+    Backed by one preallocated array; -1 marks an unknown age."""
+    __slots__ = ('buf', 'idx', 'n', 'cap')
+
+    def __init__(self, cap):
+        self.cap = max(1, int(cap))
+        self.buf = array('i', [-1]) * self.cap
+        self.idx = 0
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def append(self, age):
+        self.buf[self.idx] = -1 if age is None else min(int(age), 2**31 - 1)
+        self.idx = (self.idx + 1) % self.cap
+        if self.n < self.cap:
+            self.n += 1
+
+    def snapshot(self):
+        """Ages oldest -> newest as a contiguous array."""
+        if self.n < self.cap:
+            return self.buf[:self.n]
+        return self.buf[self.idx:] + self.buf[:self.idx]
+
+def _poll_workers():
+    """Poller fetch threads: SP_POLL_WORKERS if set, else 32 (two blocking GETs per StreamHub)."""
+    try:
+        return max(1, int(os.getenv("SP_POLL_WORKERS") or 32))
+    except ValueError:
+        return 32
+
 class BackgroundPoller:
     def __init__(self, db_path: Path, interval: float = 2.0):
         self.db_path = Path(db_path)
@@ -62,12 +416,18 @@ class BackgroundPoller:
         self._thr = None
         self.last_cycle_at = 0
         self.last_error = None
-        self.age_history = {}  # host -> deque[(ts, age_sec)]
+        self.age_history = {}  # host -> AgeRing of age_sec
         self.age_window_sec = 120
         self.slack_seen = {}          # host -> deque of log fingerprints
         self.slack_seen_max = 4000
         self.alert_state = {}         # host -> {owd,bitrate,drops,error,active_sessions}
         self._slack_initialized = set()
+        self._pool = None             # ThreadPoolExecutor for per-device HTTP fetches
+        self.max_workers = _poll_workers()
+        # (device_id, host, payload) for the writer thread; bounded so a stalled disk
+        # drops observations (the next poll supersedes them) instead of growing memory
+        self._q = queue.Queue(maxsize=10000)
+        self._writer = None
 
     # ── Slack helpers ─────────────────────────────────────────────────────
 
@@ -247,46 +607,129 @@ class BackgroundPoller:
         if self._thr and self._thr.is_alive():
             return
         self._stop.clear()
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='poll')
         self._thr = threading.Thread(target=self._loop, name="StreamPilotBackgroundPoller", daemon=True)
         self._thr.start()
+        if not (self._writer and self._writer.is_alive()):
+            self._writer = threading.Thread(target=self._writer_loop, name="StreamPilotPayloadWriter", daemon=True)
+            self._writer.start()
 
     def stop(self):
         try:
             self._stop.set()
             if self._thr:
                 self._thr.join(timeout=2.0)
+            if self._writer:
+                self._writer.join(timeout=2.0)
+            if self._pool:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
         except Exception:
             pass
 
+    def _writer_loop(self):
+        """Drain queued payloads into LOGGER (session open/close + SQLite writes),
+        so the poll cycle only pays for the HTTP fetches. FIFO keeps per-device order."""
+        while not self._stop.is_set() or not self._q.empty():
+            try:
+                batch = [self._q.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while len(batch) < 64:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            for device_id, device_host, payload in batch:
+                try:
+                    LOGGER.observe_payload(device_id, device_host, payload)
+                except Exception as e:
+                    cherrypy.log(f"[poller] observe_payload error: {e}")
+
+    def submit_payload(self, device_id, device_host, payload):
+        """Hand a payload to the writer thread; False when it was not queued (writer not
+        running, or queue full: logged; the payload is lost unless the caller writes it)."""
+        if not (self._writer and self._writer.is_alive()):
+            return False
+        try:
+            self._q.put_nowait((device_id, device_host, payload))
+        except queue.Full:
+            cherrypy.log(f"[poller] writer queue full, payload for {device_host} not queued")
+            return False
+        return True
+
+    @staticmethod
+    def _base_url(protocol, host, port):
+        # Normalize default ports for StreamHub API
+        p = int(port or 0)
+        if protocol == 'http' and (p in (0, 80, 443)):
+            p = 8893
+        if protocol == 'https' and (p in (0, 80, 443)):
+            p = 8896
+        return f"{protocol}://{host}:{p}"
+
+    @staticmethod
+    def _extract_device_id(p, fallback):
+        """characteristics.identifier, else configuration.device.Identifier, else fallback.
+        Raises AttributeError for a non-dict payload (error string), like before."""
+        c = p.get('characteristics')
+        if c:
+            v = c.get('identifier')
+            if v:
+                return v
+        cfg = p.get('configuration')
+        if cfg:
+            d = cfg.get('device')
+            if d:
+                v = d.get('Identifier')
+                if v:
+                    return v
+        return fallback
+
+    @staticmethod
+    def _logs_result(f_logs):
+        """Structured logs future -> (ok, entries), or the exception it raised."""
+        try:
+            return f_logs.result()
+        except Exception as e:
+            return e
+
     def _loop(self):
+        next_deadline = time.monotonic()
         while not self._stop.is_set():
             self.last_cycle_at = time.time()
             self.last_error = None
-            loop_start = time.time()
+            next_deadline += self.interval
             try:
                 # Read configured devices and poll each one
                 with connect_db() as conn:
-                    cur = conn.execute("SELECT id,name,protocol,host,port,api_path,token FROM devices")
-                    rows = cur.fetchall()
-
-                for row in rows:
+                    rows = conn.execute(SQL_DEVICES).fetchall()
+                    # Last sample epoch ms per host, one aggregate for the whole cycle
+                    host_to_last_ms = dict(conn.execute(SQL_LAST_MS_BY_HOST).fetchall())
+
+                # Fan out the HTTP fetches (snapshot and structured logs side by side, both
+                # submitted from here so no pool task waits on another); DB writes and
+                # notifications stay on this thread
+                pool = self._pool
+                if pool is None:
+                    # stop() already shut the pool down mid-cycle
+                    break
+                futures = {}
+                for r in rows:
+                    base, token = self._base_url(r[2], r[3], r[4]), r[6] or None
+                    f_logs = pool.submit(fetch_logs_structured, base, token, 5)
+                    futures[pool.submit(fetch_streamhub, base, token, 5)] = (r, f_logs)
+                for fut in as_completed(futures):
+                    row, f_logs = futures[fut]
                     try:
                         did, name, protocol, host, port, api_path, token = row
-                        # Normalize default ports for StreamHub API
-                        p = int(port or 0)
-                        if protocol == 'http' and (p in (0, 80, 443)):
-                            p = 8893
-                        if protocol == 'https' and (p in (0, 80, 443)):
-                            p = 8896
-                        base = f"{protocol}://{host}:{p}"
-                        ok, payload = fetch_streamhub(base, token or None, timeout=5)
+                        ok, payload = fut.result()
+                        logs = self._logs_result(f_logs)
                         # Always observe, even if not ok (logger can decide)
                         try:
-                            device_id = (payload.get('characteristics') or {}).get('identifier') \
-                                or (payload.get('configuration') or {}).get('device', {}).get('Identifier') \
-                                or str(did)
-                            device_host = host
-                            LOGGER.observe_payload(device_id, device_host, payload)
+                            device_id = self._extract_device_id(payload, str(did))
+                            self.submit_payload(device_id, host, payload)
                             # Persist input→output name mapping
                             try:
                                 _persist_output_map(host, payload)
@@ -294,8 +737,9 @@ class BackgroundPoller:
                                 cherrypy.log(f'[output_map] persist error: {_ome}')
                             # Fetch and persist StreamHub logs (plain text /logs endpoint)
                             try:
-                                from collect.scripts.streamhub import fetch_logs_structured
-                                ok_logs, log_entries = fetch_logs_structured(base, token or None, timeout=5)
+                                if isinstance(logs, Exception):
+                                    raise logs
+                                ok_logs, log_entries = logs
                                 if ok_logs and log_entries:
                                     _persist_logs(host, log_entries)
                                     try:
@@ -330,44 +774,51 @@ class BackgroundPoller:
                             except Exception: pass
                         # Update age history for this host (based on last sample ts in DB)
                         try:
-                            with connect_db() as db2:
-                                last_ts = db2.execute(
-                                    "SELECT MAX(ts) FROM live_sample WHERE session_id IN (SELECT id FROM live_session WHERE device_host=?)",
-                                    (host,)
-                                ).fetchone()[0]
+                            last_ms = host_to_last_ms.get(host)
                             age_sec = None
-                            if last_ts:
-                                from datetime import datetime
-                                try:
-                                    _ts_str = str(last_ts)[:19].replace('T', ' ')
-                                    dt = datetime.strptime(_ts_str, '%Y-%m-%d %H:%M:%S')
-                                    age_sec = max(0, int((datetime.utcnow() - dt).total_seconds()))
-                                except Exception:
-                                    age_sec = None
-                            dq = self.age_history.get(host)
-                            if dq is None:
-                                dq = deque(maxlen=int(self.age_window_sec / max(self.interval, 1e-3)) + 5)
-                                self.age_history[host] = dq
-                            dq.append((time.time(), age_sec))
+                            if last_ms:
+                                age_sec = max(0, (int(time.time() * 1000) - last_ms) // 1000)
+                            ring = self.age_history.get(host)
+                            if ring is None:
+                                ring = AgeRing(int(self.age_window_sec / max(self.interval, 1e-3)) + 5)
+                                self.age_history[host] = ring
+                            ring.append(age_sec)
                         except Exception as _ah_err:
                             cherrypy.log(f"[poller] age_history update error: {_ah_err}")
                     except Exception as dev_err:
                         cherrypy.log(f"[poller] device poll error: {dev_err}")
-                    # Jitter per device to avoid synchronized bursts under load
-                    time.sleep(min(0.02, self.interval * 0.1) * random.random())
 
             except Exception as e:
                 self.last_error = str(e)
                 cherrypy.log(f"[poller] loop error: {e}")
             finally:
-                # Sleep the remaining time of the interval (wall-clock), or a minimal breather if overrun
-                sleep_left = self.interval - (time.time() - loop_start)
-                if sleep_left > 0:
-                    time.sleep(sleep_left)
-                else:
-                    time.sleep(0.05)
+                # Wait until the next monotonic deadline (wakes immediately on stop());
+                # on overrun, re-anchor instead of bursting to catch up
+                remaining = next_deadline - time.monotonic()
+                if remaining <= 0:
+                    next_deadline = time.monotonic()
+                    remaining = 0.05
+                self._stop.wait(remaining)
+
 
 
+# --- live_session / live_sample column migrations (checked once per process) ---
+_SCHEMA_READY = False
+
+def _ensure_schema(db):
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    cols = {r[1] for r in db.execute("PRAGMA table_info(live_session)").fetchall()}
+    if 'title' not in cols:
+        db.execute("ALTER TABLE live_session ADD COLUMN title TEXT")
+    cols = {r[1] for r in db.execute("PRAGMA table_info(live_sample)").fetchall()}
+    if 'rx_percent_lost' not in cols:
+        db.execute("ALTER TABLE live_sample ADD COLUMN rx_percent_lost INTEGER")
+    if 'rx_lost_nb_packets' not in cols:
+        db.execute("ALTER TABLE live_sample ADD COLUMN rx_lost_nb_packets INTEGER")
+    _SCHEMA_READY = True
+
 # --- One-time DB indexes (idempotent) ---
 def _ensure_db_indexes(db):
     try:
@@ -382,6 +833,26 @@ def _ensure_db_indexes(db):
         # Helpful when queries still ORDER BY id for a given session
         db.execute("CREATE INDEX IF NOT EXISTS idx_live_sample_sid_id ON live_sample(session_id, id)")
     except Exception: pass
+    try:
+        # Speeds up: live_session JOIN live_sample filtered by host (seek host, then ids)
+        db.execute("CREATE INDEX IF NOT EXISTS idx_live_session_host_id ON live_session(device_host, id)")
+    except Exception: pass
+    try:
+        # Speeds up: per-host MAX(ts) join in the poller (index-only on live_session)
+        db.execute("CREATE INDEX IF NOT EXISTS idx_live_session_id_host ON live_session(id, device_host)")
+    except Exception: pass
+    try:
+        # Epoch-ms sample time (older DBs): age = now_ms - MAX(ts_ms), no ISO parsing
+        db.execute("ALTER TABLE live_sample ADD COLUMN ts_ms INTEGER")
+        db.execute(f"UPDATE live_sample SET ts_ms = {_TS_MS_FROM_TS} WHERE ts_ms IS NULL")
+    except Exception: pass
+    try:
+        db.execute("CREATE INDEX IF NOT EXISTS idx_live_sample_sid_tsms ON live_sample(session_id, ts_ms)")
+    except Exception: pass
+    try:
+        # Speeds up: /data host and session_id resolution (devices WHERE host=?)
+        db.execute("CREATE INDEX IF NOT EXISTS idx_devices_host ON devices(host)")
+    except Exception: pass
 
 def _get_linked_output_names(device_host, input_index):
     """Return set of lowercase output names linked to this input,
@@ -719,18 +1190,77 @@ def _init_db():
             ended_at    TEXT NOT NULL,
             created_at  TEXT
         )""")
+    # Refresh planner statistics (sqlite_stat1) so the per-host joins pick the indexes
+    try:
+        conn.execute("ANALYZE")
+    except Exception: pass
     conn.commit()
     conn.close()
 
 
+# --- Per-thread SQLite connections ---
+# Each worker thread keeps one open connection; PRAGMAs and schema checks run
+# once per thread instead of on every request.  `with connect_db() as c:` keeps
+# working (sqlite3 context manager commits, it never closes).
+_tls = threading.local()
+# thread ident -> (weakref to the thread, its connection); bumping _DB_GEN makes every
+# thread-local connection stale, so threads that survive an engine stop reopen one
+_DB_CONNS = {}
+_DB_CONNS_LOCK = threading.Lock()
+_DB_GEN = 0
+
 def connect_db():
+    conn = getattr(_tls, 'conn', None)
+    if conn is None or _tls.gen != _DB_GEN:
+        conn = _open_db()
+        _tls.conn, _tls.gen = conn, _DB_GEN
+        t = threading.current_thread()
+        with _DB_CONNS_LOCK:
+            # close connections left behind by threads that have exited
+            for ident, (ref, c) in list(_DB_CONNS.items()):
+                th = ref()
+                if th is None or not th.is_alive():
+                    del _DB_CONNS[ident]
+                    try:
+                        c.close()
+                    except Exception:
+                        pass
+            _DB_CONNS[t.ident] = (weakref.ref(t), conn)
+    return conn
+
+def close_db_connections():
+    """Close every cached per-thread connection (called on engine stop)."""
+    global _DB_GEN
+    with _DB_CONNS_LOCK:
+        _DB_GEN += 1
+        conns = [c for _, c in _DB_CONNS.values()]
+        _DB_CONNS.clear()
+    for c in conns:
+        try:
+            c.close()
+        except Exception:
+            pass
+
+_WAL_SET = False
+
+def _open_db():
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(DB_PATH), check_same_thread=False, isolation_level=None, timeout=5.0)
-    conn.execute("PRAGMA journal_mode=WAL;")
+    conn = sqlite3.connect(str(DB_PATH), check_same_thread=False, isolation_level=None, timeout=5.0,
+                           cached_statements=256)
+    global _WAL_SET
+    if not _WAL_SET:
+        # journal_mode is persistent in the DB file: switch once per process, not per connection
+        conn.execute("PRAGMA journal_mode=WAL;")
+        _WAL_SET = True
     conn.execute("PRAGMA synchronous=NORMAL;")
-    conn.execute("PRAGMA busy_timeout=2000;")
+    conn.execute("PRAGMA busy_timeout=5000;")
     conn.execute("PRAGMA temp_store=MEMORY;")
     conn.execute("PRAGMA cache_size=-20000;")
+    try:
+        # Memory-mapped reads (256 MB) for the scan-heavy endpoints; fewer, larger checkpoints
+        conn.execute("PRAGMA mmap_size=268435456;")
+        conn.execute("PRAGMA wal_autocheckpoint=2000;")
+    except Exception: pass
     # Ensure critical tables always exist (idempotent, fast after first run)
     conn.execute(
         "CREATE TABLE IF NOT EXISTS devices ("
@@ -793,6 +1323,11 @@ def connect_db():
     _ensure_db_indexes(conn)
     return conn
 
+def _device_overview(conn):
+    """One row per StreamHub device:
+    (id, name, protocol, host, port, last_ts, last_ts_ms, active_sessions)."""
+    return conn.execute(SQL_DEVICE_OVERVIEW).fetchall()
+
 def _persist_logs(host: str, entries: list):
     if not entries:
         return
@@ -814,20 +1349,8 @@ def render(tpl, **ctx):
     client, status = _get_client_status()
     ctx.setdefault('client', client)
     ctx.setdefault('status', status)
-    # Provide MAX_STREAMHUB (default 1) and a device_count to all templates
-    limit_env = os.getenv('MAX_STREAMHUB')
-    try:
-        limit = int(limit_env) if (limit_env is not None and str(limit_env).strip()) else 1
-    except Exception:
-        limit = 1
-    if limit < 1:
-        limit = 1
-    ctx.setdefault('max_streamhub', limit)
-    if 'devices' in ctx and 'device_count' not in ctx:
-        try:
-            ctx['device_count'] = len(ctx.get('devices') or [])
-        except Exception:
-            ctx['device_count'] = 0
+    # Provide MAX_STREAMHUB (default 1) to all templates
+    ctx.setdefault('max_streamhub', _max_streamhub())
     return lookup.get_template(tpl).render(**ctx)
 
 
@@ -899,15 +1422,47 @@ def require_login(fn):
         return fn(*args, **kwargs)
     return _wrap
 
-def slow(th=0.25):  # log > 250 ms
+def _gzip_level():
+    """zlib level for response compression: SP_GZIP_LEVEL (1..9), default 1."""
+    try:
+        return min(9, max(1, int(os.getenv("SP_GZIP_LEVEL") or 1)))
+    except ValueError:
+        return 1
+
+# SP_GZIP=0 leaves compression to a fronting reverse proxy. Level 1 costs a fraction
+# of CherryPy's default 5 in CPU for slightly larger JSON/HTML bodies.
+_GZIP_ON = (os.getenv("SP_GZIP") or "1").strip() != "0"
+_GZIP_LEVEL = _gzip_level()
+
+# Per-endpoint gzip for the frequently scraped text pages (/metrics, /health)
+_GZIP_TEXT = {'tools.gzip.on': _GZIP_ON,
+              'tools.gzip.compress_level': _GZIP_LEVEL,
+              'tools.gzip.mime_types': ['text/plain', 'text/html', 'application/json']}
+
+# SP_SLOW_MS (read in run()): overrides every @slow threshold; 0 turns the timing off
+_SLOW_NS = None
+
+def _load_slow_threshold():
+    global _SLOW_NS
+    env = (os.getenv("SP_SLOW_MS") or "").strip()
+    try:
+        _SLOW_NS = int(float(env) * 1_000_000) if env else None
+    except ValueError:
+        _SLOW_NS = None
+
+def slow(th=0.25):  # log > 250 ms (only logs, never delays the request)
+    th_ns = int(th * 1e9)
     def deco(fn):
         @functools.wraps(fn)
         def wrap(*a, **k):
-            t = time.perf_counter()
+            lim = th_ns if _SLOW_NS is None else _SLOW_NS
+            if lim <= 0:
+                return fn(*a, **k)
+            t = time.monotonic_ns()
             r = fn(*a, **k)
-            dt = time.perf_counter() - t
-            if dt > th:
-                cherrypy.log(f"[slow] {fn.__name__} {dt*1000:.0f}ms {getattr(cherrypy.request,'path_info','')}")
+            dt = time.monotonic_ns() - t
+            if dt > lim:
+                cherrypy.log(f"[slow] {fn.__name__} {dt // 1_000_000}ms {getattr(cherrypy.request,'path_info','')}")
             return r
         return wrap
     return deco
@@ -933,7 +1488,7 @@ class SRTGatewayPoller:
         self._slack_initialized: set = set()
         self.alert_state: dict = {}
         self.last_payloads: dict = {}  # host -> {route_id -> normalized}
-        self.age_history: dict = {}    # host -> deque[(ts, age_sec)]
+        self.age_history: dict = {}    # host -> AgeRing of age_sec
 
     def start(self):
         import threading
@@ -1129,21 +1684,19 @@ class SRTGatewayPoller:
 
     def _update_age_history(self, host: str):
         """Record sample age (seconds since last sample) for sparkline."""
-        from collections import deque
-        from datetime import datetime as _dth
         try:
             with connect_db() as c:
                 r = c.execute(
                     "SELECT MAX(ts) FROM srt_route_sample WHERE device_host=?", (host,)
                 ).fetchone()[0]
             if r:
-                dt = _dth.strptime(str(r)[:19], "%Y-%m-%d %H:%M:%S")
-                age = max(0, int((_dth.utcnow() - dt).total_seconds()))
+                dt = _dt.strptime(str(r)[:19], "%Y-%m-%d %H:%M:%S")
+                age = max(0, int((_dt.utcnow() - dt).total_seconds()))
             else:
                 age = None
             if host not in self.age_history:
-                self.age_history[host] = deque(maxlen=120)
-            self.age_history[host].append((time.time(), age))
+                self.age_history[host] = AgeRing(120)
+            self.age_history[host].append(age)
         except Exception:
             pass
 
@@ -1397,6 +1950,165 @@ class SRTGatewayPoller:
 
 SRT_POLLER: Optional['SRTGatewayPoller'] = None
 
+# --- /logs_ui row rendering (built once at import, filled with format_map per row) ---
+def _parse_iso19(x):
+    try:
+        return _dt.fromisoformat(str(x)[:19]) if x else None
+    except Exception:
+        return None
+
+def _fmt_dur(total_seconds):
+    try:
+        s = int(total_seconds)
+    except Exception:
+        return ''
+    sign = '-' if s < 0 else ''
+    s = abs(s)
+    d, r = divmod(s, 86400)
+    h, r = divmod(r, 3600)
+    m, s = divmod(r, 60)
+    hhmmss = f"{h:02d}:{m:02d}:{s:02d}"
+    return f"{sign}{d}d {hhmmss}" if d else f"{sign}{hhmmss}"
+
+def _fmt_ts19(x, dt=None):
+    if dt is not None:
+        return dt.strftime("%Y-%m-%d %H:%M:%S")
+    s = '' if x is None else str(x)
+    return s[:19].replace('T', ' ')
+
+_LOGS_UI_DAY = (
+    '<tr><td colspan="11" class="p-0">'
+    '<div class="bd-callout bd-callout-info w-100 mb-2" role="separator">{day}</div>'
+    '</td></tr>'
+)
+
+_LOGS_UI_ROW = """
+            <tr>
+              <td>{sid}</td>
+              <td>{dev_id}</td>
+              <td>{dev_host}</td>
+              <td>{idx}</td>
+              <td>{ident}</td>
+              <td>{disp}</td>
+              <td><div>{start_txt} <span class="text-muted small">UTC</span></div><div class="text-muted small local-ts" data-utc="{start}"></div></td>
+              <td>{dur}</td>
+              <td>
+                <form class="d-flex" method="post" action="/log_rename">
+                  <input type="hidden" name="session_id" value="{sid}">
+                  <input class="form-control form-control-sm me-1" type="text" name="title" placeholder="Session name" value="{title}" />
+                  <button class="btn btn-sm btn-outline-success" type="submit">Save</button>
+                </form>
+              </td>
+              <td><div>{end_txt}{end_utc}</div><div class="text-muted small local-ts" data-utc="{end}"></div></td>
+              <td>
+                <a class="btn btn-sm btn-outline-primary" href="/log_download?session_id={sid}" download="session_{sid}.json">JSON</a>
+                <a class="btn btn-sm btn-outline-secondary ms-1" href="/log_download_csv?session_id={sid}">CSV</a>
+                <a class="btn btn-sm btn-outline-success ms-1" href="/log_download_geojson?session_id={sid}">GeoJSON</a>
+                {pdf_btn}
+                <a class="btn btn-sm btn-outline-dark ms-1" href="/log_view?session_id={sid}">View</a>
+                {stop_btn}
+                <form class="d-inline ms-1" method="post" action="/log_delete" onsubmit="return confirm('Delete this session?');">
+                  <input type="hidden" name="session_id" value="{sid}">
+                  <button class="btn btn-sm btn-danger" type="submit">Delete</button>
+                </form>
+              </td>
+            </tr>"""
+
+_LOGS_UI_STOP = (
+    '<form class="d-inline ms-1" method="post" action="/log_stop" '
+    'onsubmit="return confirm(\'Stop this session now?\');">'
+    '<input type="hidden" name="session_id" value="{sid}">'
+    '<button class="btn btn-sm btn-warning" type="submit">Stop</button>'
+    '</form>'
+)
+_LOGS_UI_PDF = '<a class="btn btn-sm btn-outline-danger ms-1" href="/log_pdf?session_id={sid}">PDF</a>'
+
+# Static page shell around the dynamic message and rows
+_LOGS_UI_HEAD = """
+        <!doctype html>
+        <html><head>
+          <meta charset="utf-8">
+          <meta name="viewport" content="width=device-width,initial-scale=1">
+          <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css" rel="stylesheet">
+          <style>
+            /* Lightweight callout styles for day separators */
+            .bd-callout{padding:.75rem 1rem;border:1px solid var(--bs-border-color);border-left-width:.25rem;border-radius:.25rem;background-color:var(--bs-body-bg);} 
+            .bd-callout-info{border-left-color:#0d6efd;background:rgba(13,110,253,.06);} /* light primary */
+          </style>
+          <title>Live sessions</title>
+        </head>
+        <body class="p-3">
+          <div class="d-flex justify-content-between align-items-center mb-3">
+            <h1 class="h4 m-0">Live sessions</h1>
+            <div>
+              <a class="btn btn-outline-secondary me-2" href="/">← Back to dashboard</a>
+              <a class="btn btn-outline-primary me-2" href="/log_import">Import session</a>
+              <form class="d-inline" method="post" action="/log_purge" onsubmit="return confirm('Purge all logs? This cannot be undone.');">
+                <button class="btn btn-danger">Purge all</button>
+              </form>
+            </div>
+          </div>
+"""
+
+_LOGS_UI_TABLE = """          <div class="table-responsive">
+            <table class="table table-sm align-middle">
+              <thead>
+                <tr>
+                  <th>ID</th>
+                  <th>Device</th>
+                  <th>Host</th>
+                  <th>Input</th>
+                  <th>Identifier</th>
+                  <th>Display name</th>
+                  <th>Started <span class="text-muted small fw-normal">(UTC + local)</span></th>
+                  <th>Duration</th>
+                  <th>Title</th>
+                  <th>Ended <span class="text-muted small fw-normal">(UTC + local)</span></th>
+                  <th>Download</th>
+                </tr>
+              </thead>
+              <tbody>
+"""
+
+_LOGS_UI_TAIL = """              </tbody>
+            </table>
+          </div>
+          <script>
+          (function(){
+            function pad(n){return String(n).padStart(2,'0');}
+            function fmtLocal(d){
+              return d.getFullYear()+'-'+pad(d.getMonth()+1)+'-'+pad(d.getDate())+' '+
+                     pad(d.getHours())+':'+pad(d.getMinutes())+':'+pad(d.getSeconds());
+            }
+            var tzMin = new Date().getTimezoneOffset();
+            var tzLabel = (function(){
+              var off = -tzMin;
+              var sign = off >= 0 ? '+' : '-';
+              var abs = Math.abs(off);
+              return 'UTC' + sign + pad(Math.floor(abs/60)) + ':' + pad(abs%60);
+            })();
+            document.querySelectorAll('.local-ts').forEach(function(el){
+              var iso = el.getAttribute('data-utc');
+              if (!iso) return;
+              var s = iso.length >= 19 ? iso.substring(0,19) : iso;
+              if (s.indexOf('T') < 0) s = s.replace(' ','T');
+              var d = new Date(s + 'Z');
+              if (isNaN(d.getTime())) return;
+              el.textContent = fmtLocal(d) + ' ' + tzLabel;
+            });
+            // Add tz_offset to download links so server-side exports include local time
+            document.querySelectorAll('a[href^="/log_download"], a[href^="/log_pdf"]').forEach(function(a){
+              try {
+                var u = new URL(a.getAttribute('href'), window.location.origin);
+                u.searchParams.set('tz_offset', String(tzMin));
+                a.setAttribute('href', u.pathname + (u.search || ''));
+              } catch(e) {}
+            });
+          })();
+          </script>
+        </body></html>
+        """
+
 class App:
 
     @cherrypy.expose
@@ -2227,7 +2939,6 @@ class App:
         - Creates a new live_session row (new ID).
         - Inserts all per-tick samples; expands links[] into individual rows.
         """
-        import json, sqlite3
         # GET -> simple upload form
         if cherrypy.request.method.upper() != 'POST':
             return ("""
@@ -2257,119 +2968,103 @@ class App:
         sess = (payload or {}).get("session") or {}
         samples = (payload or {}).get("samples") or []
 
-        with connect_db() as c:
-            # Ensure columns exist (migration-safe)
-            cols = {r[1] for r in c.execute("PRAGMA table_info(live_session)").fetchall()}
-            if 'title' not in cols:
-                c.execute("ALTER TABLE live_session ADD COLUMN title TEXT")
-            cols2 = {r[1] for r in c.execute("PRAGMA table_info(live_sample)").fetchall()}
-            if 'rx_percent_lost' not in cols2:
-                c.execute("ALTER TABLE live_sample ADD COLUMN rx_percent_lost INTEGER")
-            if 'rx_lost_nb_packets' not in cols2:
-                c.execute("ALTER TABLE live_sample ADD COLUMN rx_lost_nb_packets INTEGER")
-
-            # Insert session (new ID)
-            cur = c.execute(
-                "INSERT INTO live_session(device_id, device_host, input_key, input_index, input_identifier, input_display_name, started_at, ended_at, title) "
-                "VALUES(?,?,?,?,?,?,?,?,?)",
-                (
-                    sess.get("device_id"), sess.get("device_host"), sess.get("input_key"), sess.get("input_index"),
-                    sess.get("input_identifier"), sess.get("input_display_name"),
-                    sess.get("started_at"), sess.get("ended_at"), sess.get("title"),
-                )
+        # Expand per-tick links[] into flat row tails (session id prepended below);
+        # year..second are derived from ts by the live_sample schema
+        rows = []
+        for s in samples:
+            base_vals = (
+                s.get("ts"),
+                s.get("latitude"), s.get("longitude"),
+                s.get("drops_video"), s.get("drops_ts"),
             )
-            new_sid = cur.lastrowid
-
-            # Insert samples: expand per-tick links[]
-            for s in samples:
-                base_vals = (
-                    new_sid,
-                    s.get("ts"),
-                    s.get("year"), s.get("month"), s.get("day"),
-                    s.get("hour"), s.get("minute"), s.get("second"),
-                    s.get("latitude"), s.get("longitude"),
-                    s.get("drops_video"), s.get("drops_ts"),
-                )
-                links = s.get("links") or [None]
-                if not isinstance(links, list):
-                    links = [None]
-                for l in links:
-                    if isinstance(l, dict):
-                        name = l.get("name")
-                        owdR = l.get("owdR")
-                        rb   = l.get("rx_bitrate")
-                        rpl  = l.get("rx_percent_lost")
-                        rln  = l.get("rx_lost_nb_packets")
-                    else:
-                        name = None; owdR = None; rb = None; rpl = None; rln = None
-                    c.execute(
-                        "INSERT INTO live_sample(session_id, ts, year, month, day, hour, minute, second, latitude, longitude, drops_video, drops_ts, link_name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets) "
-                        "VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
-                        base_vals + (name, owdR, rb, rpl, rln)
-                    )
+            links = s.get("links") or [None]
+            if not isinstance(links, list):
+                links = [None]
+            for l in links:
+                if isinstance(l, dict):
+                    rows.append(base_vals + (l.get("name"), l.get("owdR"), l.get("rx_bitrate"),
+                                             l.get("rx_percent_lost"), l.get("rx_lost_nb_packets")))
+                else:
+                    rows.append(base_vals + (None, None, None, None, None))
+
+        with connect_db() as c:
+            _ensure_schema(c)
 
-            c.commit()
+            # Session + all samples in one transaction (one WAL commit)
+            c.execute("BEGIN")
+            try:
+                cur = c.execute(
+                    "INSERT INTO live_session(device_id, device_host, input_key, input_index, input_identifier, input_display_name, started_at, ended_at, title) "
+                    "VALUES(?,?,?,?,?,?,?,?,?)",
+                    (
+                        sess.get("device_id"), sess.get("device_host"), sess.get("input_key"), sess.get("input_index"),
+                        sess.get("input_identifier"), sess.get("input_display_name"),
+                        sess.get("started_at"), sess.get("ended_at"), sess.get("title"),
+                    )
+                )
+                new_sid = cur.lastrowid
+                c.executemany(SQL_INSERT_SAMPLE, ((new_sid,) + r for r in rows))
+                # Derive epoch-ms from the imported ISO timestamps
+                c.execute(f"UPDATE live_sample SET ts_ms = {_TS_MS_FROM_TS} WHERE session_id=?", (new_sid,))
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
 
         raise cherrypy.HTTPRedirect("/logs_ui?msg=Session%20imported")
 
     @cherrypy.expose
+    @cherrypy.config(**{'response.stream': True, **_GZIP_TEXT})
     def metrics(self):
-        import sqlite3
-        lines = []
         # Poller metrics
         running = 1 if (POLLER and getattr(POLLER, '_thr', None) and POLLER._thr.is_alive()) else 0
         interval = getattr(POLLER, 'interval', 0.0) if POLLER else 0.0
         last_cycle = 0
         if POLLER and getattr(POLLER, 'last_cycle_at', 0):
             last_cycle = max(0, int(time.time() - POLLER.last_cycle_at))
-        lines.append('# HELP poller_running 1 if background poller thread is running')
-        lines.append('# TYPE poller_running gauge')
-        lines.append(f'poller_running {running}')
-        lines.append('# HELP poller_interval_seconds Poller loop interval in seconds')
-        lines.append('# TYPE poller_interval_seconds gauge')
-        lines.append(f'poller_interval_seconds {interval}')
-        lines.append('# HELP poller_last_cycle_seconds Seconds since last poller cycle')
-        lines.append('# TYPE poller_last_cycle_seconds gauge')
-        lines.append(f'poller_last_cycle_seconds {last_cycle}')
+        prelude = (
+            '# HELP poller_running 1 if background poller thread is running\n'
+            '# TYPE poller_running gauge\n'
+            f'poller_running {running}\n'
+            '# HELP poller_interval_seconds Poller loop interval in seconds\n'
+            '# TYPE poller_interval_seconds gauge\n'
+            f'poller_interval_seconds {interval}\n'
+            '# HELP poller_last_cycle_seconds Seconds since last poller cycle\n'
+            '# TYPE poller_last_cycle_seconds gauge\n'
+            f'poller_last_cycle_seconds {last_cycle}\n'
+        )
 
         with connect_db() as c:
-            devs = c.execute("SELECT id,name,host,port FROM devices ORDER BY id ASC").fetchall()
-            for d in devs:
-                did, name, host, port = d
-                # last sample timestamp and age
-                last_ts = c.execute(
-                    "SELECT MAX(ts) FROM live_sample WHERE session_id IN (SELECT id FROM live_session WHERE device_host=?)",
-                    (host,)
-                ).fetchone()[0]
-                age = 'NaN'
-                if last_ts:
-                    try:
-                        from datetime import datetime
-                        dt = datetime.fromisoformat(str(last_ts)[:19])
-                        age = max(0, int((datetime.now() - dt).total_seconds()))
-                    except Exception:
-                        age = 'NaN'
-                active = c.execute(
-                    "SELECT COUNT(*) FROM live_session WHERE device_host=? AND ended_at IS NULL",
-                    (host,)
-                ).fetchone()[0]
-                # emit with labels
-                label = f'id="{did}",host="{host}",name="{name}"'
-                lines.append('# HELP device_last_sample_age_seconds Age in seconds of last sample for this device host')
-                lines.append('# TYPE device_last_sample_age_seconds gauge')
-                lines.append(f'device_last_sample_age_seconds{{{label}}} {age}')
-                lines.append('# HELP device_active_sessions Number of active sessions for this host')
-                lines.append('# TYPE device_active_sessions gauge')
-                lines.append(f'device_active_sessions{{{label}}} {active}')
-
-        out = '\n'.join(lines) + '\n'
+            devs = _device_overview(c)
+        now_ms = int(time.time() * 1000)
+        # (labels, age, active) per device
+        series = []
+        for did, name, _proto, host, port, _last_ts, last_ms, active in devs:
+            age = max(0, (now_ms - last_ms) // 1000) if last_ms else 'NaN'
+            series.append((f'id="{did}",host="{host}",name="{name}"', age, active))
+
+        def _stream(chunk=64):
+            # One HELP/TYPE per metric family, samples grouped under it
+            yield prelude.encode('utf-8')
+            yield (b'# HELP device_last_sample_age_seconds Age in seconds of last sample for this device host\n'
+                   b'# TYPE device_last_sample_age_seconds gauge\n')
+            for i in range(0, len(series), chunk):
+                yield ''.join(f'device_last_sample_age_seconds{{{lb}}} {age}\n'
+                              for lb, age, _ in series[i:i + chunk]).encode('utf-8')
+            yield (b'# HELP device_active_sessions Number of active sessions for this host\n'
+                   b'# TYPE device_active_sessions gauge\n')
+            for i in range(0, len(series), chunk):
+                yield ''.join(f'device_active_sessions{{{lb}}} {active}\n'
+                              for lb, _, active in series[i:i + chunk]).encode('utf-8')
+
         cherrypy.response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
-        return out.encode('utf-8')
+        return _stream()
+
     @require_login
     @cherrypy.expose
+    @cherrypy.config(**_GZIP_TEXT)
     @slow(0.25)
     def health(self):
-        import sqlite3, html
         now = time.time()
         # Poller status
         running = False
@@ -2386,47 +3081,6 @@ class App:
         except Exception:
             pass
 
-        # Devices overview and last sample / active sessions
-        rows = []
-        with connect_db() as c:
-            devs = c.execute("SELECT id,name,protocol,host,port FROM devices ORDER BY id ASC").fetchall()
-            for d in devs:
-                did, name, proto, host, port = d
-                # last sample ts for this host
-                last_ts = c.execute(
-                    "SELECT MAX(ts) FROM live_sample WHERE session_id IN (SELECT id FROM live_session WHERE device_host=?)",
-                    (host,)
-                ).fetchone()[0]
-                # active sessions count for this host
-                active = c.execute(
-                    "SELECT COUNT(*) FROM live_session WHERE device_host=? AND ended_at IS NULL",
-                    (host,)
-                ).fetchone()[0]
-                # compute age in seconds if ts is an ISO string
-                age_sec = None
-                try:
-                    if last_ts:
-                        from datetime import datetime
-                        dt = datetime.strptime(str(last_ts)[:19], '%Y-%m-%dT%H:%M:%S') \
-                            if 'T' in str(last_ts) else \
-                            datetime.strptime(str(last_ts)[:19], '%Y-%m-%d %H:%M:%S')
-                        age_sec = max(0, int((datetime.utcnow() - dt).total_seconds()))
-                except Exception:
-                    age_sec = None
-                rows.append((did, name, host, port, last_ts, active, age_sec))
-
-        def esc(x):
-            return html.escape('' if x is None else str(x))
-
-        def age_badge(age):
-            if age is None:
-                return '<span class="badge text-bg-secondary">n/a</span>'
-            if age <= 10:
-                return f'<span class="badge text-bg-success">{age}s</span>'
-            if age <= 30:
-                return f'<span class="badge text-bg-warning">{age}s</span>'
-            return f'<span class="badge text-bg-danger">{age}s</span>'
-
         def spark_svg(host, srt=False):
             # Build a tiny SVG sparkline (120x24) from POLLER/SRT_POLLER.age_history[host]
             try:
@@ -2434,12 +3088,12 @@ class App:
                 hist = (poller.age_history.get(host) if poller and getattr(poller, 'age_history', None) else None)
                 if not hist:
                     return ''
-                pts = list(hist)[-120:]  # last ~2 minutes depending on interval
-                # Extract ages and map None to previous or 0 for continuity
+                pts = hist.snapshot()[-120:]  # last ~2 minutes depending on interval
+                # Map unknown ages (-1) to previous or 0 for continuity
                 ages = []
                 prev = 0
-                for (_, a) in pts:
-                    if a is None:
+                for a in pts:
+                    if a < 0:
                         a = prev
                     else:
                         prev = a
@@ -2451,15 +3105,17 @@ class App:
                 max_age = max(ages) if max(ages) > 0 else 1
                 # Clip max to 60s to keep dynamic range readable
                 max_age = max(10, min(60, max_age))
-                # Build polyline points
+                # Build polyline points: interleave x,y ints and format them in one pass
                 n = len(ages)
                 if n == 1:
-                    xs = [P, W-P]
-                    ys = [H/2, H/2]
+                    flat = [P, H // 2]
                 else:
-                    xs = [P + i*(W-2*P)/(n-1) for i in range(n)]
-                    ys = [H-P - (min(a, max_age)/max_age)*(H-2*P) for a in ages]
-                path = ' '.join(f"{int(xs[i])},{int(ys[i])}" for i in range(n))
+                    dx = (W-2*P)/(n-1)
+                    dy = (H-2*P)/max_age
+                    flat = [0] * (2*n)
+                    flat[0::2] = [int(P + i*dx) for i in range(n)]
+                    flat[1::2] = [int(H-P - min(a, max_age)*dy) for a in ages]
+                path = ('%d,%d ' * n % tuple(flat)).rstrip()
                 # color by last point (green<=10, orange<=30, red>30)
                 last = ages[-1]
                 color = '#198754' if last <= 10 else ('#fd7e14' if last <= 30 else '#dc3545')
@@ -2471,8 +3127,52 @@ class App:
             except Exception:
                 return ''
 
+        # Devices overview and last sample / active sessions
+        rows = []
+        with connect_db() as c:
+            devs = _device_overview(c)
+            now_ms = int(now * 1000)
+            for d in devs:
+                did, name, proto, host, port, last_ts, last_ms, active = d
+                # age in seconds from epoch ms (ISO ts kept for display)
+                age_sec = max(0, (now_ms - last_ms) // 1000) if last_ms else None
+                rows.append({'id': did, 'name': name, 'host': host, 'port': port,
+                             'last_ts': last_ts, 'active': active, 'age_sec': age_sec,
+                             'spark': spark_svg(host)})
+
+        # SRT Gateway rows
+        gw_rows = []
+        with connect_db() as _cg:
+            gw_devs = _cg.execute(
+                'SELECT id, name, host, port FROM srt_gateway_device ORDER BY id ASC'
+            ).fetchall()
+            for gwid, gwname, gwhost, gwport in gw_devs:
+                # Last sample ts for this gateway
+                gw_last_ts = None
+                gw_running_routes = 0
+                try:
+                    gw_last_ts = _cg.execute(
+                        'SELECT MAX(ts) FROM srt_route_sample WHERE device_host=?', (gwhost,)
+                    ).fetchone()[0]
+                    gw_running_routes = (_cg.execute(
+                        'SELECT COUNT(DISTINCT route_id) FROM srt_session '
+                        'WHERE device_host=? AND ended_at IS NULL', (gwhost,)
+                    ).fetchone()[0] or 0)
+                except Exception:
+                    pass
+                gw_age_sec = None
+                try:
+                    if gw_last_ts:
+                        dt = _dt.strptime(str(gw_last_ts)[:19], "%Y-%m-%d %H:%M:%S")
+                        gw_age_sec = max(0, int((_dt.utcnow() - dt).total_seconds()))
+                except Exception:
+                    pass
+                gw_rows.append({'id': gwid, 'name': gwname, 'host': gwhost, 'port': gwport,
+                                'last_ts': gw_last_ts, 'age_sec': gw_age_sec,
+                                'running_routes': gw_running_routes,
+                                'spark': spark_svg(gwhost, srt=True)})
+
         # --- Database state ---
-        import os
         db_path = str(DB_PATH)
         try:
             db_size_bytes = os.path.getsize(db_path)
@@ -2489,130 +3189,16 @@ class App:
                 n /= 1024.0
                 i += 1
             return f"{n:.1f} {units[i]}"
-        sessions_total = 0
-        sessions_active = 0
-        samples_total = 0
-        last_sample_any = None
-        try:
-            with connect_db(str(DB_PATH)) as _dbc:
-                sessions_total = _dbc.execute("SELECT COUNT(*) FROM live_session").fetchone()[0] or 0
-                sessions_active = _dbc.execute("SELECT COUNT(*) FROM live_session WHERE ended_at IS NULL").fetchone()[0] or 0
-                samples_total = _dbc.execute("SELECT COUNT(*) FROM live_sample").fetchone()[0] or 0
-                last_sample_any = _dbc.execute("SELECT MAX(ts) FROM live_sample").fetchone()[0]
-        except Exception:
-            pass
-
-        # Build HTML
-        body = [
-            '<!doctype html>',
-            '<html><head>',
-            '<meta charset="utf-8">',
-            '<meta name="viewport" content="width=device-width,initial-scale=1">',
-            '<link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css" rel="stylesheet">',
-            '<title>Health</title>',
-            '</head><body class="p-3">',
-            '<div class="d-flex justify-content-between align-items-center mb-3">',
-            '<h1 class="h5 m-0">Health</h1>',
-            '<div>',
-            '<a class="btn btn-outline-secondary me-2" href="/">← Dashboard</a>',
-            '<button class="btn btn-outline-primary" onclick="location.reload()">Refresh</button>',
-            '</div></div>',
-            '<div class="card mb-3"><div class="card-body d-flex flex-wrap gap-3">',
-            f'<div><strong>Poller:</strong> ' + ("<span class=\"badge text-bg-success\">running</span>" if running else "<span class=\"badge text-bg-danger\">stopped</span>") + '</div>',
-            f'<div><strong>Interval:</strong> {esc(interval)} s</div>',
-            f'<div><strong>Last cycle:</strong> {esc(last_cycle_secs)} s ago</div>',
-            (f'<div class="text-danger"><strong>Last error:</strong> {esc(last_error)}</div>' if last_error else ''),
-            '<div class="form-check ms-auto">',
-            '  <input class="form-check-input" type="checkbox" id="auto" checked>',
-            '  <label class="form-check-label" for="auto">Auto-refresh (10s)</label>',
-            '</div>',
-            '</div></div>',
-            # --- DB state card ---
-            '<div class="card mb-3"><div class="card-body">',
-            f'<div class="mb-1"><strong>DB file:</strong> <code>{esc(db_path)}</code></div>',
-            f'<div class="mb-1"><strong>Size:</strong> {hsize(db_size_bytes)}</div>',
-            '</div></div>',
-            '<div class="table-responsive">',
-            '<table class="table table-sm align-middle">',
-            '<thead><tr>',
-            '<th>Type</th><th>Name</th><th>Host</th><th>Port</th><th>Last sample ts</th><th>Age</th><th>Spark</th><th>Active sessions</th><th>Actions</th>',
-            '</tr></thead><tbody>'
-        ]
-        if rows:
-            for (did, name, host, port, last_ts, active, age_sec) in rows:
-                body.append('<tr>')
-                body.append(f'<td><span class="badge text-bg-secondary">StreamHub</span></td>')
-                body.append(f'<td>{esc(name)}</td>')
-                body.append(f'<td>{esc(host)}</td>')
-                body.append(f'<td>{esc(port)}</td>')
-                body.append(f'<td>{esc(last_ts)}</td>')
-                body.append(f'<td>{age_badge(age_sec)}</td>')
-                body.append(f'<td>{spark_svg(host)}</td>')
-                body.append(f'<td>{esc(active)}</td>')
-                body.append('<td>')
-                body.append(f'<a class="btn btn-sm btn-outline-primary" href="/data?id={did}">Ping /data</a>')
-                body.append('</td>')
-                body.append('</tr>')
-        else:
-            body.append('<tr><td colspan="9" class="text-muted">No StreamHub devices</td></tr>')
-        # SRT Gateway rows
-        with connect_db() as _cgw:
-            gw_devs = _cgw.execute(
-                'SELECT id, name, host, port FROM srt_gateway_device ORDER BY id ASC'
-            ).fetchall()
-        for gw in gw_devs:
-            gwid, gwname, gwhost, gwport = gw
-            # Last sample ts for this gateway
-            gw_last_ts = None
-            gw_running_routes = 0
-            try:
-                with connect_db() as _cg:
-                    r_ts = _cg.execute(
-                        'SELECT MAX(ts) FROM srt_route_sample WHERE device_host=?', (gwhost,)
-                    ).fetchone()[0]
-                    gw_last_ts = r_ts
-                    gw_running_routes = (_cg.execute(
-                        'SELECT COUNT(DISTINCT route_id) FROM srt_session '
-                        'WHERE device_host=? AND ended_at IS NULL', (gwhost,)
-                    ).fetchone()[0] or 0)
-            except Exception:
-                pass
-            gw_age_sec = None
-            try:
-                if gw_last_ts:
-                    from datetime import datetime as _dth
-                    dt = _dth.strptime(str(gw_last_ts)[:19], "%Y-%m-%d %H:%M:%S")
-                    gw_age_sec = max(0, int((_dth.utcnow() - dt).total_seconds()))
-            except Exception:
-                pass
-            # Poller status for SRT Gateway
-            gw_poller_ok = bool(SRT_POLLER and getattr(SRT_POLLER, '_thr', None) and SRT_POLLER._thr.is_alive())
-            gw_last_payload = (SRT_POLLER.last_payloads.get(gwhost) or {}) if SRT_POLLER else {}
-            body.append('<tr>')
-            body.append('<td><span class="badge text-bg-primary">SRT Gateway</span></td>')
-            body.append(f'<td>{esc(gwname)}</td>')
-            body.append(f'<td>{esc(gwhost)}</td>')
-            body.append(f'<td>{esc(gwport)}</td>')
-            body.append(f'<td>{esc(gw_last_ts)}</td>')
-            body.append(f'<td>{age_badge(gw_age_sec)}</td>')
-            body.append(f'<td>{spark_svg(gwhost, srt=True)}</td>')
-            body.append(f'<td>{esc(gw_running_routes)} route(s) running</td>')
-            body.append('<td>')
-            body.append(f'<a class="btn btn-sm btn-outline-primary" href="/gateway_data_raw?host={gwhost}">Ping /data</a>')
-            body.append('</td>')
-            body.append('</tr>')
-        body.extend(['</tbody></table></div>',
-                     '<script>\n(function(){\n  var t=null;\n  function tick(){ if(document.getElementById(\'auto\').checked){ location.reload(); } }\n  t=setInterval(tick,10000);\n})();\n</script>',
-                     '</body></html>'])
-
-        cherrypy.response.headers['Content-Type'] = 'text/html; charset=utf-8'
-        return '\n'.join(body).encode('utf-8')
+        cherrypy.response.headers['Content-Type'] = 'text/html; charset=utf-8'
+        return render('health.html', running=running, interval=interval,
+                      last_cycle_secs=last_cycle_secs, last_error=last_error,
+                      db_path=db_path, db_size=hsize(db_size_bytes),
+                      rows=rows, gw_rows=gw_rows)
 
     @require_login
     @cherrypy.expose
     @slow(0.25)
     def health_json(self):
-        import sqlite3, json
         now = time.time()
         running = bool(POLLER and getattr(POLLER, '_thr', None) and POLLER._thr.is_alive())
         interval = getattr(POLLER, 'interval', None) if POLLER else None
@@ -2622,17 +3208,8 @@ class App:
             last_cycle_secs = max(0, int(now - POLLER.last_cycle_at))
         devices = []
         with connect_db() as c:
-            devs = c.execute("SELECT id,name,protocol,host,port FROM devices ORDER BY id ASC").fetchall()
-            for d in devs:
-                did, name, proto, host, port = d
-                last_ts = c.execute(
-                    "SELECT MAX(ts) FROM live_sample WHERE session_id IN (SELECT id FROM live_session WHERE device_host=?)",
-                    (host,)
-                ).fetchone()[0]
-                active = c.execute(
-                    "SELECT COUNT(*) FROM live_session WHERE device_host=? AND ended_at IS NULL",
-                    (host,)
-                ).fetchone()[0]
+            for d in _device_overview(c):
+                did, name, proto, host, port, last_ts, _last_ms, active = d
                 devices.append({
                     "id": did, "name": name, "host": host, "port": port,
                     "last_sample_ts": last_ts, "active_sessions": active
@@ -2652,20 +3229,19 @@ class App:
     @slow(0.25)
     def index(self):
         with connect_db() as db:
-            cur = db.execute("SELECT id,name,protocol,host,port,api_path,token FROM devices ORDER BY id DESC")
-            cols = [c[0] for c in cur.description]
-            devices = [dict(zip(cols, r)) for r in cur.fetchall()]
+            cur = db.cursor()
+            cur.row_factory = sqlite3.Row  # name access for the template, no per-row dict
+            devices = cur.execute("SELECT id,name,protocol,host,port,api_path,token FROM devices ORDER BY id DESC").fetchall()
         return render("dashboard.html", devices=devices, page_title="Dashboard", user=current_user())
 
     @require_login
     @cherrypy.expose
     def devices(self):
         with connect_db() as db:
-            cur = db.execute("SELECT id,name,protocol,host,port,api_path,token FROM devices ORDER BY id DESC")
-            cols = [c[0] for c in cur.description]
-            devices = [dict(zip(cols, r)) for r in cur.fetchall()]
-            gw_cur = db.execute("SELECT id,name,host,port,protocol FROM srt_gateway_device ORDER BY id DESC")
-            srt_gateways = [dict(zip([c[0] for c in gw_cur.description], r)) for r in gw_cur.fetchall()]
+            cur = db.cursor()
+            cur.row_factory = sqlite3.Row  # name access for the template, no per-row dict
+            devices = cur.execute("SELECT id,name,protocol,host,port,api_path,token FROM devices ORDER BY id DESC").fetchall()
+            srt_gateways = cur.execute("SELECT id,name,host,port,protocol FROM srt_gateway_device ORDER BY id DESC").fetchall()
         return render("devices.html", devices=devices, srt_gateways=srt_gateways,
                       page_title="Devices", user=current_user())
 
@@ -2683,13 +3259,7 @@ class App:
             raise cherrypy.HTTPRedirect("/devices")
         with connect_db() as db:
             # Enforce a max number of StreamHub instances based on MAX_STREAMHUB env (default 1)
-            limit_env = os.getenv('MAX_STREAMHUB')
-            try:
-                limit = int(limit_env) if (limit_env is not None and str(limit_env).strip()) else 1
-            except Exception:
-                limit = 1
-            if limit < 1:
-                limit = 1
+            limit = _max_streamhub()
             cur = db.execute("SELECT COUNT(*) FROM devices")
             cnt = cur.fetchone()[0] or 0
             if cnt >= limit:
@@ -2714,36 +3284,34 @@ class App:
     def data(self, id=None, session_id=None, host=None):
         cherrypy.response.headers["Content-Type"] = "application/json; charset=utf-8"
         # Accept either device id (id), a session_id (resolve to device host -> device id), or a host name directly
-        dev_id = None
-        if id not in (None, ""):
-            dev_id = id
-        elif session_id not in (None, ""):
+        if id in (None, "") and session_id in (None, "") and host in (None, ""):
+            return _ERR_MISSING_ID
+        sid = None
+        if id in (None, "") and session_id not in (None, ""):
             try:
                 sid = int(session_id)
             except Exception:
-                return b'{"ok": false, "error": "bad session_id"}'
-            with connect_db() as db:
+                return _ERR_BAD_SID
+        # Whole id/session/host resolution chain runs on one connection
+        with connect_db() as db:
+            if id not in (None, ""):
+                dev_id = id
+            elif sid is not None:
                 row = db.execute("SELECT device_host FROM live_session WHERE id=?", (sid,)).fetchone()
-            if not row:
-                return b'{"ok": false, "error": "session_not_found"}'
-            s_host = row[0]
-            with connect_db() as db:
-                r2 = db.execute("SELECT id FROM devices WHERE host=? LIMIT 1", (s_host,)).fetchone()
-            if not r2:
-                return b'{"ok": false, "error": "device_not_found_for_session_host"}'
-            dev_id = str(r2[0])
-        elif host not in (None, ""):
-            with connect_db() as db:
+                if not row:
+                    return _ERR_SESSION_NOT_FOUND
+                r2 = db.execute("SELECT id FROM devices WHERE host=? LIMIT 1", (row[0],)).fetchone()
+                if not r2:
+                    return _ERR_NO_DEVICE_FOR_SESSION_HOST
+                dev_id = str(r2[0])
+            else:
                 r3 = db.execute("SELECT id FROM devices WHERE host=? LIMIT 1", (host,)).fetchone()
-            if not r3:
-                return b'{"ok": false, "error": "device_not_found_for_host"}'
-            dev_id = str(r3[0])
-        else:
-            return b'{"ok": false, "error": "missing id"}'
-        with connect_db() as db:
+                if not r3:
+                    return _ERR_NO_DEVICE_FOR_HOST
+                dev_id = str(r3[0])
             row = db.execute("SELECT id,name,protocol,host,port,api_path,token FROM devices WHERE id=?", (dev_id,)).fetchone()
         if not row:
-            return b'{"ok": false, "error": "not found"}'
+            return _ERR_NOT_FOUND
         keys = ["id","name","protocol","host","port","api_path","token"]
         d = dict(zip(keys, row))
 
@@ -2761,19 +3329,21 @@ class App:
 
         # Pour StreamHub “ancien probe”, on tape la racine + ?api_key=
         base = f"{d['protocol']}://{d['host']}:{d['port']}"
-        ok, payload = fetch_streamhub(base, d.get("token") or None, timeout=5)
-        import json
-        
-        # Observe payload for live logging
-        try:
-            device_id = (payload.get('characteristics') or {}).get('identifier') \
-                or (payload.get('configuration') or {}).get('device', {}).get('Identifier') \
-                or str(d['id'])
-            device_host = d['host']
-            LOGGER.observe_payload(device_id, device_host, payload)
-        except Exception as _obs_err:
-            cherrypy.log(f"observe_payload error: {_obs_err}")
-        return json.dumps({"ok": ok, "payload": payload, "timestamp": int(time.time()*1000)}).encode("utf-8")
+        ok, payload, fresh = _cached_fetch(base, d.get("token") or None)
+
+        # Observe payload for live logging (a cached reply was already observed); session
+        # writes go through the poller's writer thread, not this request thread
+        if fresh:
+            try:
+                device_id = BackgroundPoller._extract_device_id(payload, str(d['id']))
+                device_host = d['host']
+                if not (POLLER and POLLER.submit_payload(device_id, device_host, payload)):
+                    LOGGER.observe_payload(device_id, device_host, payload)
+            except Exception as _obs_err:
+                cherrypy.log(f"observe_payload error: {_obs_err}")
+        # Fixed envelope around the only variable part (payload)
+        return b''.join((_DATA_OK_HEAD if ok else _DATA_KO_HEAD, _dumps(payload),
+                         _DATA_TS_MID, b'%d}' % int(time.time()*1000)))
 
 
 
@@ -2782,68 +3352,67 @@ class App:
     @slow(0.25)
     def logs(self):
         cherrypy.response.headers["Content-Type"] = "application/json; charset=utf-8"
-        import sqlite3, json
         with connect_db() as c:
-            # Ensure 'title' column exists (migration-safe)
-            cols = {r[1] for r in c.execute("PRAGMA table_info(live_session)").fetchall()}
-            if 'title' not in cols:
-                c.execute("ALTER TABLE live_session ADD COLUMN title TEXT")
+            _ensure_schema(c)
             rows = c.execute("""
                 SELECT id, device_id, device_host, input_key, input_index,
                        input_identifier, input_display_name, started_at, ended_at, title
                 FROM live_session ORDER BY id DESC LIMIT 200
             """).fetchall()
-            out = [{
-                "id": r[0], "device_id": r[1], "device_host": r[2], "input_key": r[3], "input_index": r[4],
-                "input_identifier": r[5], "input_display_name": r[6], "started_at": r[7], "ended_at": r[8],
-                "title": r[9]
-            } for r in rows]
-        return json.dumps({"ok": True, "sessions": out}).encode("utf-8")
+            out = [dict(zip(_LOG_KEYS, r)) for r in rows]
+        return _dumps({"ok": True, "sessions": out})
 
     @require_login
     @cherrypy.expose
-    def log_download(self, session_id=None, tz_offset=None):
+    def log_download(self, session_id=None, tz_offset=None, pixels=None):
+        # pixels=W (log_view's chart width) decimates the ticks to about 4*W; the
+        # Download JSON export passes nothing and always gets every tick
         cherrypy.response.headers["Content-Type"] = "application/json; charset=utf-8"
         if not session_id:
-            return b'{"ok": false, "error":"missing session_id"}'
+            return _ERR_JSON_MISSING_SID
         try:
             sid = int(session_id)
         except Exception:
-            return b'{"ok": false, "error":"bad session_id"}'
+            return _ERR_JSON_BAD_SID
         try:
             tz_min = int(tz_offset) if tz_offset is not None else None
         except Exception:
             tz_min = None
-        import sqlite3, json
-        from datetime import datetime as _dtl, timedelta as _tdl
+        try:
+            pixels = max(0, int(pixels)) if pixels else 0
+        except Exception:
+            pixels = 0
+        # round the chart width up to a 256 px step, so browser widths share cache entries
+        pixels = -(-pixels // _PIXELS_STEP) * _PIXELS_STEP
         def _to_local(iso_str):
             if not iso_str or tz_min is None:
                 return None
             try:
-                dt = _dtl.fromisoformat(str(iso_str)[:19])
+                dt = _dt.fromisoformat(str(iso_str)[:19])
             except Exception:
                 return None
-            return (dt - _tdl(minutes=tz_min)).isoformat()
+            return (dt - _td(minutes=tz_min)).isoformat()
         with connect_db() as c:
-            # Ensure 'title' column exists (migration-safe)
-            cols = {r[1] for r in c.execute("PRAGMA table_info(live_session)").fetchall()}
-            if 'title' not in cols:
-                c.execute("ALTER TABLE live_session ADD COLUMN title TEXT")
-            # Ensure new columns exist (migration-safe)
-            cols = {r[1] for r in c.execute("PRAGMA table_info(live_sample)").fetchall()}
-            if 'rx_percent_lost' not in cols:
-                c.execute("ALTER TABLE live_sample ADD COLUMN rx_percent_lost INTEGER")
-            if 'rx_lost_nb_packets' not in cols:
-                c.execute("ALTER TABLE live_sample ADD COLUMN rx_lost_nb_packets INTEGER")
+            _ensure_schema(c)
             s = c.execute("SELECT id, device_id, device_host, input_key, input_index, input_identifier, input_display_name, started_at, ended_at, title FROM live_session WHERE id=?", (sid,)).fetchone()
             if not s:
-                return b'{"ok": false, "error":"session_not_found"}'
-            rows = c.execute("""
+                return _ERR_JSON_SESSION_NOT_FOUND
+            cache_key = (sid, f'json{pixels}' if pixels else 'json', tz_min) if _export_settled(sid, s[8]) else None
+            cached = _export_cache_get(cache_key) if cache_key else None
+            if cached is not None:
+                if _not_modified(cached):
+                    return b''
+                cherrypy.response.headers['Content-Disposition'] = f'attachment; filename=session_{sid}.json'
+                return cached
+            # Group rows by timestamp so lat/lng and drops appear once per tick, with all links listed under that tick.
+            samples = _group_samples(c.execute("""
                 SELECT ts, year, month, day, hour, minute, second,
                        latitude, longitude, drops_video, drops_ts,
                        link_name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets
                 FROM live_sample WHERE session_id=? ORDER BY id ASC
-            """, (sid,)).fetchall()
+            """, (sid,)))
+        if pixels:
+            samples = _decimate_ticks(samples, pixels)
         payload = {
             "session": {
                 "id": s[0], "device_id": s[1], "device_host": s[2], "input_key": s[3], "input_index": s[4],
@@ -2856,40 +3425,10 @@ class App:
             },
             "samples": []
         }
-        # Group rows by timestamp so lat/lng and drops appear once per tick, with all links listed under that tick.
-        by_ts = {}
-        for r in rows:
-            ts, year, month, day, hour, minute, second, lat, lng, dv, dt, link_name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets = r
-            if ts not in by_ts:
-                by_ts[ts] = {
-                    "ts": ts,
-                    "year": year, "month": month, "day": day,
-                    "hour": hour, "minute": minute, "second": second,
-                    "latitude": lat, "longitude": lng,
-                    "drops_video": dv, "drops_ts": dt,
-                    "links": []
-                }
-            else:
-                if by_ts[ts]["latitude"] is None and lat is not None:
-                    by_ts[ts]["latitude"] = lat
-                if by_ts[ts]["longitude"] is None and lng is not None:
-                    by_ts[ts]["longitude"] = lng
-                if dv is not None:
-                    by_ts[ts]["drops_video"] = dv
-                if dt is not None:
-                    by_ts[ts]["drops_ts"] = dt
-            by_ts[ts]["links"].append({
-                "name": link_name,
-                "owdR": owdR,
-                "rx_bitrate": rx_bitrate,
-                "rx_percent_lost": rx_percent_lost,
-                "rx_lost_nb_packets": rx_lost_nb_packets,
-            })
-        ordered_keys = sorted(by_ts.keys())
         if tz_min is not None:
-            for k in ordered_keys:
-                by_ts[k]["ts_local"] = _to_local(by_ts[k].get("ts"))
-        payload["samples"] = [by_ts[k] for k in ordered_keys]
+            for e in samples:
+                e["ts_local"] = _to_local(e["ts"])
+        payload["samples"] = samples
         try:
             ts_sc = s[7][:19].replace("T"," ") if s[7] else ""
             ts_ec = s[8][:19].replace("T"," ") if s[8] else ""
@@ -2903,280 +3442,175 @@ class App:
             payload["events"] = [{"ts":r[0],"node":r[1],"level":r[2],"message":r[3]} for r in ev_r]
         except Exception:
             payload["events"] = []
-        data = json.dumps(payload, ensure_ascii=False, separators=(',',':'))
         cherrypy.response.headers['Content-Disposition'] = f'attachment; filename=session_{sid}.json'
-        return data.encode("utf-8")
+        data = _dumps(payload)
+        if cache_key:
+            _export_cache_put(cache_key, data)
+            if _not_modified(data):
+                return b''
+        return data
 
+    @require_login
+    @cherrypy.expose
+    @cherrypy.config(**_GZIP_TEXT)
+    def log_stream(self, session_id=None, after=None):
+        # Live delta for log_view: only the ticks whose ts is later than `after`.
+        # A tick's rows are inserted in one transaction, so the last tick seen is complete.
+        cherrypy.response.headers["Content-Type"] = "application/json; charset=utf-8"
+        if not session_id:
+            return _ERR_JSON_MISSING_SID
+        try:
+            sid = int(session_id)
+        except Exception:
+            return _ERR_JSON_BAD_SID
+        with connect_db() as c:
+            _ensure_schema(c)
+            samples = _group_samples(c.execute("""
+                SELECT ts, year, month, day, hour, minute, second,
+                       latitude, longitude, drops_video, drops_ts,
+                       link_name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets
+                FROM live_sample WHERE session_id=? AND ts>? ORDER BY id ASC
+            """, (sid, after or '')))
+        return _dumps({"ok": True, "samples": samples})
 
 
     @require_login
     @cherrypy.expose
     def logs_ui(self, msg=None):
         # Simple HTML page to list sessions and offer downloads/purge
-        import sqlite3, html
         with connect_db() as c:
-            # Ensure 'title' column exists (migration-safe)
-            cols = {r[1] for r in c.execute("PRAGMA table_info(live_session)").fetchall()}
-            if 'title' not in cols:
-                c.execute("ALTER TABLE live_session ADD COLUMN title TEXT")
+            _ensure_schema(c)
             rows = c.execute("""
                 SELECT id, device_id, device_host, input_key, input_index,
                        input_identifier, input_display_name, started_at, ended_at, title
                 FROM live_session ORDER BY id DESC LIMIT 500
             """).fetchall()
 
-        def esc(s):
-            return html.escape("" if s is None else str(s))
-
-        def _parse_iso(x):
-            try:
-                from datetime import datetime
-                return datetime.fromisoformat(str(x)[:19]) if x else None
-            except Exception:
-                return None
-
-        def _fmt_dur(total_seconds):
-            try:
-                s = int(total_seconds)
-            except Exception:
-                return ''
-            sign = '-' if s < 0 else ''
-            s = abs(s)
-            d, r = divmod(s, 86400)
-            h, r = divmod(r, 3600)
-            m, s = divmod(r, 60)
-            hhmmss = f"{h:02d}:{m:02d}:{s:02d}"
-            return f"{sign}{d}d {hhmmss}" if d else f"{sign}{hhmmss}"
-
-        def _fmt_ts(x):
-            try:
-                dt = _parse_iso(x)
-                if dt:
-                    return dt.strftime("%Y-%m-%d %H:%M:%S")
-            except Exception:
-                pass
-            s = '' if x is None else str(x)
-            return s[:19].replace('T', ' ')
+        escape = _html.escape
 
-        def _day_label(ts):
-            dt = _parse_iso(ts)
-            return dt.date().isoformat() if dt else 'Unknown date'
+        def esc(s):
+            return escape("" if s is None else str(s))
 
+        now = _dt.now()
+        row_tmpl = _LOGS_UI_ROW.format_map
         items = []
         current_day = None
-        for r in rows:
-            sid, dev_id, dev_host, key, idx, ident, disp, start, end, title = r
+        for sid, dev_id, dev_host, key, idx, ident, disp, start, end, title in rows:
+            st_dt = _parse_iso19(start)
+            et_dt = _parse_iso19(end) if end else None
 
             # insert day divider when day changes (based on Started)
-            day_lbl = _day_label(start)
+            day_lbl = st_dt.date().isoformat() if st_dt else 'Unknown date'
             if day_lbl != current_day:
-                items.append(
-                    f'<tr><td colspan="11" class="p-0">'
-                    f'<div class="bd-callout bd-callout-info w-100 mb-2" role="separator">{esc(day_lbl)}</div>'
-                    f'</td></tr>'
-                )
+                items.append(_LOGS_UI_DAY.format(day=esc(day_lbl)))
                 current_day = day_lbl
 
-            # compute duration
-            dur_txt = ''
-            try:
-                st_dt = _parse_iso(start)
-                if st_dt is not None:
-                    from datetime import datetime
-                    et_dt = _parse_iso(end) if end else None
-                    ref = et_dt or datetime.now()
-                    dur_txt = _fmt_dur((ref - st_dt).total_seconds())
-            except Exception:
-                dur_txt = ''
-
-            # Safe HTML for Stop button (only if session is still open)
-            stop_btn = ''
-            if not end:
-                stop_btn = (
-                    '<form class="d-inline ms-1" method="post" action="/log_stop" '
-                    'onsubmit="return confirm(\'Stop this session now?\');">'
-                    '<input type="hidden" name="session_id" value="' + str(sid) + '">'
-                    '<button class="btn btn-sm btn-warning" type="submit">Stop</button>'
-                    '</form>'
-                )
-
-            items.append(f"""
-            <tr>
-              <td>{sid}</td>
-              <td>{esc(dev_id)}</td>
-              <td>{esc(dev_host)}</td>
-              <td>{esc(idx)}</td>
-              <td>{esc(ident)}</td>
-              <td>{esc(disp)}</td>
-              <td><div>{esc(_fmt_ts(start))} <span class="text-muted small">UTC</span></div><div class="text-muted small local-ts" data-utc="{esc(start) if start else ''}"></div></td>
-              <td>{esc(dur_txt)}</td>
-              <td>
-                <form class="d-flex" method="post" action="/log_rename">
-                  <input type="hidden" name="session_id" value="{sid}">
-                  <input class="form-control form-control-sm me-1" type="text" name="title" placeholder="Session name" value="{esc(title)}" />
-                  <button class="btn btn-sm btn-outline-success" type="submit">Save</button>
-                </form>
-              </td>
-              <td><div>{esc(_fmt_ts(end))}{' <span class="text-muted small">UTC</span>' if end else ''}</div><div class="text-muted small local-ts" data-utc="{esc(end) if end else ''}"></div></td>
-              <td>
-                <a class="btn btn-sm btn-outline-primary" href="/log_download?session_id={sid}" download="session_{sid}.json">JSON</a>
-                <a class="btn btn-sm btn-outline-secondary ms-1" href="/log_download_csv?session_id={sid}">CSV</a>
-                <a class="btn btn-sm btn-outline-success ms-1" href="/log_download_geojson?session_id={sid}">GeoJSON</a>
-                {'<a class="btn btn-sm btn-outline-danger ms-1" href="/log_pdf?session_id='+str(sid)+'">PDF</a>' if end else ''}
-                <a class="btn btn-sm btn-outline-dark ms-1" href="/log_view?session_id={sid}">View</a>
-                {stop_btn}
-                <form class="d-inline ms-1" method="post" action="/log_delete" onsubmit="return confirm('Delete this session?');">
-                  <input type="hidden" name="session_id" value="{sid}">
-                  <button class="btn btn-sm btn-danger" type="submit">Delete</button>
-                </form>
-              </td>
-            </tr>""")
-
-        body = f"""
-        <!doctype html>
-        <html><head>
-          <meta charset="utf-8">
-          <meta name="viewport" content="width=device-width,initial-scale=1">
-          <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css" rel="stylesheet">
-          <style>
-            /* Lightweight callout styles for day separators */
-            .bd-callout{{padding:.75rem 1rem;border:1px solid var(--bs-border-color);border-left-width:.25rem;border-radius:.25rem;background-color:var(--bs-body-bg);}} 
-            .bd-callout-info{{border-left-color:#0d6efd;background:rgba(13,110,253,.06);}} /* light primary */
-          </style>
-          <title>Live sessions</title>
-        </head>
-        <body class="p-3">
-          <div class="d-flex justify-content-between align-items-center mb-3">
-            <h1 class="h4 m-0">Live sessions</h1>
-            <div>
-              <a class="btn btn-outline-secondary me-2" href="/">← Back to dashboard</a>
-              <a class="btn btn-outline-primary me-2" href="/log_import">Import session</a>
-              <form class="d-inline" method="post" action="/log_purge" onsubmit="return confirm('Purge all logs? This cannot be undone.');">
-                <button class="btn btn-danger">Purge all</button>
-              </form>
-            </div>
-          </div>
-          {('<div class="alert alert-info">'+esc(msg)+'</div>' if msg else '')}
-          <div class="table-responsive">
-            <table class="table table-sm align-middle">
-              <thead>
-                <tr>
-                  <th>ID</th>
-                  <th>Device</th>
-                  <th>Host</th>
-                  <th>Input</th>
-                  <th>Identifier</th>
-                  <th>Display name</th>
-                  <th>Started <span class="text-muted small fw-normal">(UTC + local)</span></th>
-                  <th>Duration</th>
-                  <th>Title</th>
-                  <th>Ended <span class="text-muted small fw-normal">(UTC + local)</span></th>
-                  <th>Download</th>
-                </tr>
-              </thead>
-              <tbody>
-                {''.join(items) if items else '<tr><td colspan="11" class="text-muted">No sessions</td></tr>'}
-              </tbody>
-            </table>
-          </div>
-          <script>
-          (function(){{
-            function pad(n){{return String(n).padStart(2,'0');}}
-            function fmtLocal(d){{
-              return d.getFullYear()+'-'+pad(d.getMonth()+1)+'-'+pad(d.getDate())+' '+
-                     pad(d.getHours())+':'+pad(d.getMinutes())+':'+pad(d.getSeconds());
-            }}
-            var tzMin = new Date().getTimezoneOffset();
-            var tzLabel = (function(){{
-              var off = -tzMin;
-              var sign = off >= 0 ? '+' : '-';
-              var abs = Math.abs(off);
-              return 'UTC' + sign + pad(Math.floor(abs/60)) + ':' + pad(abs%60);
-            }})();
-            document.querySelectorAll('.local-ts').forEach(function(el){{
-              var iso = el.getAttribute('data-utc');
-              if (!iso) return;
-              var s = iso.length >= 19 ? iso.substring(0,19) : iso;
-              if (s.indexOf('T') < 0) s = s.replace(' ','T');
-              var d = new Date(s + 'Z');
-              if (isNaN(d.getTime())) return;
-              el.textContent = fmtLocal(d) + ' ' + tzLabel;
-            }});
-            // Add tz_offset to download links so server-side exports include local time
-            document.querySelectorAll('a[href^="/log_download"], a[href^="/log_pdf"]').forEach(function(a){{
-              try {{
-                var u = new URL(a.getAttribute('href'), window.location.origin);
-                u.searchParams.set('tz_offset', String(tzMin));
-                a.setAttribute('href', u.pathname + (u.search || ''));
-              }} catch(e) {{}}
-            }});
-          }})();
-          </script>
-        </body></html>
-        """
+            items.append(row_tmpl({
+                "sid": sid,
+                "dev_id": esc(dev_id),
+                "dev_host": esc(dev_host),
+                "idx": esc(idx),
+                "ident": esc(ident),
+                "disp": esc(disp),
+                "start_txt": esc(_fmt_ts19(start, st_dt)),
+                "start": esc(start) if start else '',
+                "dur": esc(_fmt_dur(((et_dt or now) - st_dt).total_seconds())) if st_dt is not None else '',
+                "title": esc(title),
+                "end_txt": esc(_fmt_ts19(end, et_dt)),
+                "end_utc": ' <span class="text-muted small">UTC</span>' if end else '',
+                "end": esc(end) if end else '',
+                "pdf_btn": _LOGS_UI_PDF.format(sid=sid) if end else '',
+                "stop_btn": '' if end else _LOGS_UI_STOP.format(sid=sid),
+            }))
+
+        body = "".join((
+            _LOGS_UI_HEAD,
+            '          ' + ('<div class="alert alert-info">' + esc(msg) + '</div>' if msg else '') + '\n',
+            _LOGS_UI_TABLE,
+            '                ',
+            ''.join(items) if items else '<tr><td colspan="11" class="text-muted">No sessions</td></tr>',
+            '\n',
+            _LOGS_UI_TAIL,
+        ))
         cherrypy.response.headers['Content-Type'] = 'text/html; charset=utf-8'
         return body.encode('utf-8')
 
     @require_login
     @cherrypy.expose
+    @cherrypy.config(**{'response.stream': True})
     def log_download_csv(self, session_id=None, tz_offset=None):
-        import sqlite3, csv, io, json
-        from datetime import datetime as _dtc, timedelta as _tdc
         cherrypy.response.headers["Content-Type"] = "text/csv; charset=utf-8"
         if not session_id:
-            return b'error, missing session_id'
+            return _fixed(_ERR_CSV_MISSING_SID)
         try:
             sid = int(session_id)
         except Exception:
-            return b'error, bad session_id'
+            return _fixed(_ERR_CSV_BAD_SID)
         try:
             tz_min = int(tz_offset) if tz_offset is not None else None
         except Exception:
             tz_min = None
-        with connect_db() as c:
-            # Ensure new columns exist (migration-safe)
-            cols = {r[1] for r in c.execute("PRAGMA table_info(live_sample)").fetchall()}
-            if 'rx_percent_lost' not in cols:
-                c.execute("ALTER TABLE live_sample ADD COLUMN rx_percent_lost INTEGER")
-            if 'rx_lost_nb_packets' not in cols:
-                c.execute("ALTER TABLE live_sample ADD COLUMN rx_lost_nb_packets INTEGER")
-            rows = c.execute("""
-                SELECT ts, year, month, day, hour, minute, second,
-                       latitude, longitude, drops_video, drops_ts,
-                       link_name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets
-                FROM live_sample WHERE session_id=? ORDER BY id ASC
-            """, (sid,)).fetchall()
 
         def _ts_local(iso_str):
             if not iso_str or tz_min is None:
                 return ''
             try:
-                dt = _dtc.fromisoformat(str(iso_str)[:19])
+                dt = _dt.fromisoformat(str(iso_str)[:19])
             except Exception:
                 return ''
-            return (dt - _tdc(minutes=tz_min)).isoformat()
-
-        output = io.StringIO()
-        w = csv.writer(output)
-        w.writerow(["ts_utc","ts_local","year","month","day","hour","minute","second","latitude","longitude","drops_video","drops_ts","link_name","owdR","rx_bitrate","rx_percent_lost","rx_lost_nb_packets"])
-        for r in rows:
-            w.writerow((r[0], _ts_local(r[0])) + tuple(r[1:]))
-        data = output.getvalue()
+            return (dt - _td(minutes=tz_min)).isoformat()
+
+        with connect_db() as c:
+            s = c.execute("SELECT ended_at FROM live_session WHERE id=?", (sid,)).fetchone()
+        cache_key = (sid, 'csv', tz_min) if (s and _export_settled(sid, s[0])) else None
+        cached = _export_cache_get(cache_key) if cache_key else None
+        if cached is not None:
+            cherrypy.response.headers['Content-Disposition'] = f'attachment; filename=session_{sid}.csv'
+            return _fixed(cached)
+
+        def _stream(chunk=500):
+            # Rows are pulled lazily from the cursor and flushed every `chunk` lines;
+            # a closed session's chunks are also kept for the export cache
+            parts = [] if cache_key else None
+            buf = io.StringIO()
+            csv.writer(buf).writerow(["ts_utc","ts_local","year","month","day","hour","minute","second","latitude","longitude","drops_video","drops_ts","link_name","owdR","rx_bitrate","rx_percent_lost","rx_lost_nb_packets"])
+            lines = [buf.getvalue()]
+            with connect_db() as c:
+                _ensure_schema(c)
+                cur = c.execute("""
+                    SELECT ts, year, month, day, hour, minute, second,
+                           latitude, longitude, drops_video, drops_ts,
+                           link_name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets
+                    FROM live_sample WHERE session_id=? ORDER BY id ASC
+                """, (sid,))
+                cell = _csv_cell
+                for r in cur:
+                    lines.append(','.join(map(cell, (r[0], _ts_local(r[0])) + r[1:])) + '\r\n')
+                    if len(lines) >= chunk:
+                        part = ''.join(lines).encode('utf-8')
+                        if parts is not None:
+                            parts.append(part)
+                        yield part
+                        lines.clear()
+            part = ''.join(lines).encode('utf-8')
+            if parts is not None:
+                parts.append(part)
+                _export_cache_put(cache_key, b''.join(parts))
+            yield part
+
         cherrypy.response.headers['Content-Disposition'] = f'attachment; filename=session_{sid}.csv'
-        return data.encode('utf-8')
+        return _stream()
 
     @require_login
     @cherrypy.expose
     def log_download_geojson(self, session_id=None, tz_offset=None):
-        import sqlite3, json
-        from datetime import datetime as _dtg, timedelta as _tdg
         cherrypy.response.headers["Content-Type"] = "application/geo+json; charset=utf-8"
         if not session_id:
-            return b'{"error":"missing session_id"}'
+            return _ERR_GEO_MISSING_SID
         try:
             sid = int(session_id)
         except Exception:
-            return b'{"error":"bad session_id"}'
+            return _ERR_GEO_BAD_SID
         try:
             tz_min = int(tz_offset) if tz_offset is not None else None
         except Exception:
@@ -3185,18 +3619,13 @@ class App:
             if not iso_str or tz_min is None:
                 return None
             try:
-                dt = _dtg.fromisoformat(str(iso_str)[:19])
+                dt = _dt.fromisoformat(str(iso_str)[:19])
             except Exception:
                 return None
-            return (dt - _tdg(minutes=tz_min)).isoformat()
+            return (dt - _td(minutes=tz_min)).isoformat()
 
         with connect_db() as c:
-            # Ensure columns exist (migration-safe)
-            cols = {r[1] for r in c.execute("PRAGMA table_info(live_sample)").fetchall()}
-            if 'rx_percent_lost' not in cols:
-                c.execute("ALTER TABLE live_sample ADD COLUMN rx_percent_lost INTEGER")
-            if 'rx_lost_nb_packets' not in cols:
-                c.execute("ALTER TABLE live_sample ADD COLUMN rx_lost_nb_packets INTEGER")
+            _ensure_schema(c)
 
             s = c.execute(
                 "SELECT id, device_id, device_host, input_key, input_index, input_identifier, input_display_name, started_at, ended_at, title "
@@ -3204,9 +3633,15 @@ class App:
                 (sid,)
             ).fetchone()
             if not s:
-                return b'{"error":"session_not_found"}'
-
-            rows = c.execute(
+                return _ERR_GEO_SESSION_NOT_FOUND
+            cache_key = (sid, 'geojson', tz_min) if _export_settled(sid, s[8]) else None
+            cached = _export_cache_get(cache_key) if cache_key else None
+            if cached is not None:
+                cherrypy.response.headers['Content-Disposition'] = f'attachment; filename=session_{sid}.geojson'
+                return cached
+
+            # Group by timestamp (tick)
+            ordered_ticks = _group_samples(c.execute(
                 """
                 SELECT ts, year, month, day, hour, minute, second,
                        latitude, longitude, drops_video, drops_ts,
@@ -3214,73 +3649,28 @@ class App:
                 FROM live_sample WHERE session_id=? ORDER BY id ASC
                 """,
                 (sid,)
-            ).fetchall()
-
-        # Group by timestamp (tick)
-        by_ts = {}
-        for r in rows:
-            (ts, year, month, day, hour, minute, second,
-             lat, lng, dv, dt,
-             link_name, owdR, rx_bitrate, rx_percent_lost, rx_lost_nb_packets) = r
-            if ts not in by_ts:
-                by_ts[ts] = {
-                    "ts": ts,
-                    "year": year, "month": month, "day": day,
-                    "hour": hour, "minute": minute, "second": second,
-                    "latitude": lat, "longitude": lng,
-                    "drops_video": dv, "drops_ts": dt,
-                    "links": []
-                }
-            else:
-                # prefer non-null GPS if some rows have it per tick
-                if by_ts[ts]["latitude"] is None and lat is not None:
-                    by_ts[ts]["latitude"] = lat
-                if by_ts[ts]["longitude"] is None and lng is not None:
-                    by_ts[ts]["longitude"] = lng
-                if dv is not None:
-                    by_ts[ts]["drops_video"] = dv
-                if dt is not None:
-                    by_ts[ts]["drops_ts"] = dt
-            by_ts[ts]["links"].append({
-                "name": link_name,
-                "owdR": owdR,
-                "rx_bitrate": rx_bitrate,
-                "rx_percent_lost": rx_percent_lost,
-                "rx_lost_nb_packets": rx_lost_nb_packets,
-            })
+            ))
 
         # Build FeatureCollection
         def worst_quality(links):
-            # Good if owd<100; Fair if 100<owd<200; Poor if owd>=200; default poor if unknown
-            q = 'good'
-            for l in links:
-                owd = l.get('owdR')
-                if isinstance(owd, (int, float)):
-                    if owd >= 200:
-                        return 'poor'
-                    if 100 < owd < 200 and q == 'good':
-                        q = 'fair'
-                else:
-                    # keep as is; unknown OWD will not upgrade beyond current q
-                    pass
-            return q
+            return _Q[max((_rank(l.get('owdR')) for l in links), default=0)]
 
         # Main path coordinates (LineString): [lng, lat]
-        _ordered_keys = sorted(by_ts.keys())
         if tz_min is not None:
-            for _k in _ordered_keys:
-                by_ts[_k]["ts_local"] = _to_local(by_ts[_k].get("ts"))
-        ordered_ticks = [by_ts[k] for k in _ordered_keys]
+            for t in ordered_ticks:
+                t["ts_local"] = _to_local(t["ts"])
         path_coords = []
         for t in ordered_ticks:
             lat, lng = t.get('latitude'), t.get('longitude')
             if lat is not None and lng is not None:
                 path_coords.append([float(lng), float(lat)])
 
-        features = []
+        # Serialized feature by feature into one buffer instead of building the
+        # whole FeatureCollection as Python objects first
+        buf = bytearray(b'{"type":"FeatureCollection","features":[')
         # 1) Main LineString path (if any coordinate present)
         if path_coords:
-            features.append({
+            buf += _dumps({
                 "type": "Feature",
                 "geometry": {"type": "LineString", "coordinates": path_coords},
                 "properties": {
@@ -3300,18 +3690,21 @@ class App:
                     "title": s[9]
                 }
             })
+            buf += b','
 
-        # 2) Per-tick points with full attributes (including links)
+        # 2) Per-tick points with full attributes (including links);
+        # a tick without GPS still gets a Feature, with null geometry
         for t in ordered_ticks:
             lat, lng = t.get('latitude'), t.get('longitude')
-            geom = None
+            buf += b'{"type":"Feature","geometry":'
             if lat is not None and lng is not None:
-                geom = {"type": "Point", "coordinates": [float(lng), float(lat)]}
+                buf += b'{"type":"Point","coordinates":'
+                buf += _dumps([float(lng), float(lat)])
+                buf += b'}'
             else:
-                # If no GPS at this tick, still emit a Point with null geometry? GeoJSON requires geometry or null.
-                geom = None
-
-            props = {
+                buf += b'null'
+            buf += b',"properties":'
+            buf += _dumps({
                 "type": "sample",
                 "ts": t.get('ts'),
                 "ts_local": t.get('ts_local'),
@@ -3321,23 +3714,22 @@ class App:
                 "drops_ts": t.get('drops_ts'),
                 "worst_quality": worst_quality(t.get('links') or []),
                 "links": t.get('links') or []
-            }
-            features.append({
-                "type": "Feature",
-                "geometry": geom,
-                "properties": props
             })
+            buf += b'},'
+        if buf[-1] == 0x2c:  # trailing ','
+            del buf[-1]
+        buf += b']}'
 
-        fc = {"type": "FeatureCollection", "features": features}
-        data = json.dumps(fc, ensure_ascii=False, separators=(',',':'))
         cherrypy.response.headers['Content-Disposition'] = f'attachment; filename=session_{sid}.geojson'
-        return data.encode('utf-8')
+        data = bytes(buf)
+        if cache_key:
+            _export_cache_put(cache_key, data)
+        return data
     
     @require_login
     @cherrypy.expose
     @slow(0.25)
     def log_view(self, session_id=None):
-        import sqlite3, html, json
         if not session_id:
             raise cherrypy.HTTPRedirect("/logs_ui?msg=Missing%20session_id")
         try:
@@ -3363,7 +3755,7 @@ class App:
             dev_row_id = None
 
         def esc(x):
-            return html.escape("" if x is None else str(x))
+            return _html.escape("" if x is None else str(x))
 
         def _parse_iso(x):
             try:
@@ -3381,12 +3773,11 @@ class App:
 
         page_title = f"Session #{s_id} — {s_title or (s_disp or s_dev) or ''}"
 
-        import json as _json
-        _t_end_js = ("new Date(" + _json.dumps(str(s_end)) + ").getTime()") if s_end else "Date.now()"
+        _t_end_js = ("new Date(" + json.dumps(str(s_end)) + ").getTime()") if s_end else "Date.now()"
         _events_js_tpl = '(function(){\nvar SESSION_ID=__SID__;\nvar T_START=new Date(__TSTART__).getTime();\nvar T_END=__TEND__;\nvar NL=String.fromCharCode(10);\nvar LEVEL_COLOR={ERROR:"#dc3545",WARNING:"#fd7e14",WARN:"#fd7e14",INFO:"#0d6efd",DEBUG:"#6c757d"};\nvar LEVEL_BADGE={ERROR:"<span class=\'badge\' style=\'background:#dc3545\'>ERROR</span>",WARNING:"<span class=\'badge\' style=\'background:#fd7e14\'>WARN</span>",INFO:"<span class=\'badge\' style=\'background:#0d6efd\'>INFO</span>",DEBUG:"<span class=\'badge\' style=\'background:#6c757d\'>DEBUG</span>"};\nfunction _pad2(n){return String(n).padStart(2,"0");}\nfunction fmtEvUTC(ts){return ts?String(ts).replace("T"," ").substring(0,19):"";}\nfunction fmtEvLocal(ts){if(!ts)return "";var s=String(ts);if(s.length>=19)s=s.substring(0,19);if(s.indexOf("T")<0)s=s.replace(" ","T");var d=new Date(s+"Z");if(isNaN(d.getTime()))return "";var off=-d.getTimezoneOffset(),sign=off>=0?"+":"-",ab=Math.abs(off);var lbl="UTC"+sign+_pad2(Math.floor(ab/60))+":"+_pad2(ab%60);return d.getFullYear()+"-"+_pad2(d.getMonth()+1)+"-"+_pad2(d.getDate())+" "+_pad2(d.getHours())+":"+_pad2(d.getMinutes())+":"+_pad2(d.getSeconds())+" "+lbl;}\nfunction fmtEvTsHTML(ts){var u=fmtEvUTC(ts),l=fmtEvLocal(ts);return l?(u+" UTC<br><span class=\'text-muted\'>"+l+"</span>"):(u+" UTC");}\nfunction fmtEvTsTip(ts){var u=fmtEvUTC(ts),l=fmtEvLocal(ts);return l?(u+" UTC"+NL+l):(u+" UTC");}\nvar tip=document.createElement("div");\ntip.style.cssText="position:fixed;background:#212529;color:#fff;padding:5px 10px;border-radius:5px;font-size:11px;pointer-events:none;display:none;max-width:480px;z-index:9999;white-space:pre-wrap;";\ndocument.body.appendChild(tip);\nfunction renderEvents(evs){\nvar el=document.getElementById("eventsTimeline");\nvar listWrap=document.getElementById("eventsListWrap");\nvar tbody=document.getElementById("eventsList");\nif(!evs||!evs.length){el.innerHTML="<span class=\'text-muted small\'>Aucun event trouv\\u00e9 pour cette session.</span>";listWrap.style.display="none";return;}\nvar W=1000,H=44,cy=H/2,tEnd=T_END;if(tEnd<=T_START)tEnd=T_START+1;\nvar dur=tEnd-T_START||1;\nvar svg=\'<svg width="100%" height="\'+H+\'" viewBox="0 0 \'+W+\' \'+H+\'" xmlns="http://www.w3.org/2000/svg" style="display:block">\';\nsvg+=\'<rect x="0" y="\'+(cy-2)+\'" width="\'+W+\'" height="4" fill="#dee2e6" rx="2"/>\';\nevs.forEach(function(ev,i){\nvar t=new Date(ev.ts).getTime();\nvar x=Math.max(6,Math.min(W-6,Math.round((t-T_START)/dur*W)));\nvar col=LEVEL_COLOR[ev.level]||"#0d6efd";\nvar msg=(ev.message||"").replace(/&/g,"&amp;").replace(/</g,"&lt;").replace(/"/g,"&quot;");\nsvg+=\'<line x1="\'+x+\'" y1="4" x2="\'+x+\'" y2="\'+(H-4)+\'" stroke="\'+col+\'" stroke-width="1.5" opacity="0.4"/>\';\nsvg+=\'<circle cx="\'+x+\'" cy="\'+cy+\'" r="5" fill="\'+col+\'" data-idx="\'+i+\'" data-ts="\'+ev.ts+\'" data-lvl="\'+(ev.level||"")+\'" data-msg="\'+msg+\'" style="cursor:pointer"/>\';\n});\nsvg+=\'</svg>\';el.innerHTML=svg;\nvar rows="";\nevs.forEach(function(ev,i){\nvar badge=LEVEL_BADGE[ev.level]||LEVEL_BADGE["INFO"];\nvar msg=(ev.message||"").replace(/&/g,"&amp;").replace(/</g,"&lt;");\nrows+=\'<tr data-idx="\'+i+\'" style="cursor:pointer"><td class="text-muted">\'+fmtEvTsHTML(ev.ts)+\'</td><td>\'+badge+\'</td><td>\'+msg+\'</td></tr>\';\n});\ntbody.innerHTML=rows;listWrap.style.display="block";\nfunction highlightDot(idx,on){var c=el.querySelector(\'circle[data-idx="\'+idx+\'"]\');if(!c)return;c.setAttribute("r",on?"9":"5");c.setAttribute("stroke",on?"#fff":"none");c.setAttribute("stroke-width",on?"2":"0");}\nfunction highlightRow(idx,on){var tr=tbody.querySelector(\'tr[data-idx="\'+idx+\'"]\');if(!tr)return;tr.style.background=on?"#e8f4fd":"";if(on)tr.scrollIntoView({block:"nearest",behavior:"smooth"});}\ntbody.querySelectorAll("tr").forEach(function(tr){var idx=tr.dataset.idx;tr.addEventListener("mouseenter",function(){highlightDot(idx,true);});tr.addEventListener("mouseleave",function(){highlightDot(idx,false);});});\nel.querySelectorAll("circle").forEach(function(c){\nc.addEventListener("mouseenter",function(){highlightDot(c.dataset.idx,true);highlightRow(c.dataset.idx,true);tip.textContent=fmtEvTsTip(c.dataset.ts)+"  ["+c.dataset.lvl+"]"+NL+c.dataset.msg;tip.style.display="block";});\nc.addEventListener("mousemove",function(e){tip.style.left=(e.clientX+14)+"px";tip.style.top=(e.clientY-10)+"px";});\nc.addEventListener("mouseleave",function(){highlightDot(c.dataset.idx,false);highlightRow(c.dataset.idx,false);tip.style.display="none";});\n});}\nfunction fetchEvents(){fetch("/session_events?session_id="+SESSION_ID).then(function(r){return r.json();}).then(function(data){renderEvents(data.ok?data.events:[]);}).catch(function(){document.getElementById("eventsTimeline").innerHTML="<span class=\'text-muted small\'>Erreur chargement events.</span>";});}\nwindow.refreshEvents=fetchEvents;fetchEvents();\n})();'
         _events_js = (_events_js_tpl
             .replace('__SID__', str(s_id))
-            .replace('__TSTART__', _json.dumps(str(s_start or '')))
+            .replace('__TSTART__', json.dumps(str(s_start or '')))
             .replace('__TEND__', _t_end_js)
         )
         _events_html_tpl = '<div class="mt-4"><div class="fw-semibold small mb-1">Events <span class="text-muted fw-normal">(logs StreamHub)</span></div><div id="eventsTimeline" style="min-height:44px;border:1px solid #dee2e6;border-radius:4px;padding:4px 8px;"><span class="text-muted small">Chargement…</span></div><div id="eventsListWrap" class="mt-2" style="display:none;"><table class="table table-sm table-hover mb-0" style="font-size:0.78rem;font-family:ui-monospace,SFMono-Regular,Menlo,monospace;border:1px solid #dee2e6;border-radius:4px;"><thead class="table-light"><tr><th style="width:230px">Timestamp <span class="text-muted fw-normal">(UTC + local)</span></th><th style="width:70px">Level</th><th>Message</th></tr></thead><tbody id="eventsList"></tbody></table></div></div>'
@@ -3395,14 +3786,15 @@ class App:
         esc_page = esc(page_title)
         esc_start = esc(_fmt_ts(s_start))
         esc_end = (esc(_fmt_ts(s_end)) if s_end else 'live')
+        poller_running = bool(POLLER and getattr(POLLER, '_thr', None) and POLLER._thr.is_alive())
 
-        body = """
+        body = "".join(("""
         <!doctype html>
         <html>
         <head>
             <meta charset="utf-8">
             <meta name="viewport" content="width=device-width,initial-scale=1">
-            <title>""" + esc_page + """</title>
+            <title>""", esc_page, """</title>
             <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css" rel="stylesheet">
             <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" integrity="sha256-p4NxAoJBhIIN+hmNHrzRCf9tD/miZyoHS5obTRR9BMY=" crossorigin=""/>
             <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js"></script>
@@ -3416,17 +3808,17 @@ class App:
         <body class="p-3">
             <div class="d-flex align-items-center justify-content-between mb-2">
               <div>
-                <h1 class="h5 m-0">""" + esc_page + """</h1>
+                <h1 class="h5 m-0">""", esc_page, """</h1>
                 <div class="text-muted small">
-                  Started: """ + esc_start + """ <span class="text-muted">UTC</span>
-                  <span class="local-ts" data-utc='""" + esc(s_start or '') + """'></span>
-                  — Ended: """ + (esc_end + ' <span class="text-muted">UTC</span>' if s_end else 'live') + """
-                  <span class="local-ts" data-utc='""" + esc(s_end or '') + """'></span>
+                  Started: """, esc_start, """ <span class="text-muted">UTC</span>
+                  <span class="local-ts" data-utc='""", esc(s_start or ''), """'></span>
+                  — Ended: """, (esc_end + ' <span class="text-muted">UTC</span>' if s_end else 'live'), """
+                  <span class="local-ts" data-utc='""", esc(s_end or ''), """'></span>
                 </div>
               </div>
               <div>
                 <a class="btn btn-outline-secondary me-2" href="/logs_ui">← Sessions</a>
-                <a id="dlJsonBtn" class="btn btn-outline-primary" href="/log_download?session_id=""" + str(s_id) + """" download="session_""" + str(s_id) + """.json">Download JSON</a>
+                <a id="dlJsonBtn" class="btn btn-outline-primary" href="/log_download?session_id=""", str(s_id), """" download="session_""", str(s_id), """.json">Download JSON</a>
               </div>
             </div>
             <script>
@@ -3535,651 +3927,57 @@ class App:
               </div>
             </div>
 
-            """ + _events_timeline_html + """
+            """, _events_timeline_html, """
 
             <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js" integrity="sha256-20nQCchB9co0qIjJZRGuk2/Z9VM+kNiyxNV1lvTlZBo=" crossorigin=""></script>
             <script>
-            (async function() {
-              const sid = """ + str(s_id) + """;
-              const deviceRowId = """ + (str(dev_row_id) if 'dev_row_id' in locals() and dev_row_id is not None else 'null') + """;
-              const res = await fetch('/log_download?session_id=' + sid);
-              if (!res.ok) {
-                alert('Failed to load session JSON');
-                return;
-              }
-              let data = await res.json();
-              let samples = data.samples || [];
-              // ===== Charts (Chart.js) =====
-                const linkSet = new Set();
-                for (const s of samples) {
-                  for (const l of (s.links||[])) if (l && l.name) linkSet.add(String(l.name));
-                }
-                const linkNames = Array.from(linkSet).sort();
-
-                // ===== Render link filter checkboxes =====
-                const filterHost = document.getElementById('linkFilter');
-                function renderLinkFilters(){
-                  if (!filterHost) return;
-                  filterHost.innerHTML = '';
-                  linkNames.forEach(function(name, idx){
-                    const id = 'lf_' + idx;
-                    const wrap = document.createElement('div');
-                    wrap.className = 'form-check form-check-inline m-0';
-                    wrap.innerHTML = '<input class="form-check-input" type="checkbox" id="'+id+'" data-name="'+name+'" checked>'+
-                                     '<label class="form-check-label small" for="'+id+'">'+name+'</label>';
-                    filterHost.appendChild(wrap);
-                  });
-                  // handlers
-                  filterHost.querySelectorAll('input[type="checkbox"]').forEach(function(cb){
-                    cb.addEventListener('change', function(){
-                      const nm = cb.getAttribute('data-name');
-                      const on = cb.checked;
-                      // toggle datasets in 3 charts
-                      [chartRB, chartOWD, chartLOSS].forEach(function(ch){
-                        const ds = ch.data.datasets.find(d => d.label === nm);
-                        if (ds) ds.hidden = !on;
-                        ch.update('none');
-                      });
-                    });
-                  });
-                }
-
-                // Build empty per-link arrays
-                function emptySeries() { return new Array(samples.length).fill(null); }
-                const seriesRB   = Object.fromEntries(linkNames.map(n => [n, emptySeries()]));   // kb/s
-                const seriesOWD  = Object.fromEntries(linkNames.map(n => [n, emptySeries()]));   // ms
-                const seriesLOSS = Object.fromEntries(linkNames.map(n => [n, emptySeries()]));   // %
-                const labels = samples.map(s => s.ts);
-                const dropsVideo = samples.map(s => (typeof s.drops_video === 'number' ? s.drops_video : 0));
-                const dropsTs    = samples.map(s => (typeof s.drops_ts    === 'number' ? s.drops_ts    : 0));
-
-                function toNum(x){ if (typeof x==='number') return x; if (x==null) return null; var n=parseFloat(String(x).replace(',','.')); return isNaN(n)?null:n; }
-
-                // Fill series
-                for (let i=0;i<samples.length;i++){
-                  const s = samples[i];
-                  const seen = new Set();
-                  for (const l of (s.links||[])){
-                    if (!l || !l.name) continue;
-                    const name = String(l.name);
-                    seen.add(name);
-                    const rb   = toNum(l.rx_bitrate);
-                    const owd  = toNum(l.owdR);
-                    const loss = toNum(l.rx_percent_lost);
-                    if (name in seriesRB)   seriesRB[name][i]   = (rb!=null?rb:null);
-                    if (name in seriesOWD)  seriesOWD[name][i]  = (owd!=null?owd:null);
-                    if (name in seriesLOSS) seriesLOSS[name][i] = (loss!=null?loss:null);
-                  }
-                }
-
-                // Stable colors per link
-                const basePalette = ['#0077b6','#ff6f00','#6a4c93','#00a896','#d7263d','#118ab2','#ef476f','#06d6a0','#ff9f1c','#8338ec','#3a86ff','#8ac926','#1982c4','#ff595e','#6a994e','#b56576'];
-                const colorForLink = (name) => {
-                  const idx = linkNames.indexOf(name);
-                  return basePalette[(idx>=0?idx:0) % basePalette.length];
-                };
-
-                // Cursor plugin draws a vertical line at current index
-                let currentIndex = 0;
-                const cursorPlugin = {
-                  id: 'cursorLine',
-                  afterDatasetsDraw(chart) {
-                    if (!chart || !chart.scales || !chart.scales.x) return;
-                    const xScale = chart.scales.x;
-                    const yScale = chart.scales.y;
-                    if (currentIndex < 0 || currentIndex >= (labels.length||0)) return;
-                    const ctx = chart.ctx;
-                    const x = xScale.getPixelForValue(currentIndex);
-                    ctx.save();
-                    ctx.strokeStyle = '#111';
-                    ctx.lineWidth = 1;
-                    ctx.setLineDash([4,3]);
-                    ctx.beginPath();
-                    ctx.moveTo(x, yScale.top);
-                    ctx.lineTo(x, yScale.bottom);
-                    ctx.stroke();
-                    ctx.restore();
-                  }
-                };
-
-                function buildDatasets(seriesMap){
-                  return linkNames.map(name => ({
-                    label: name,
-                    data: seriesMap[name],
-                    spanGaps: false,
-                    pointRadius: 0,
-                    stepped: false,
-                    borderWidth: 2,
-                    borderColor: colorForLink(name),
-                    backgroundColor: colorForLink(name),
-                  }));
-                }
-
-                // Create charts
-                const ctxRB   = document.getElementById('chartBitrate').getContext('2d');
-                const ctxOWD  = document.getElementById('chartOWD').getContext('2d');
-                const ctxLOSS = document.getElementById('chartLoss').getContext('2d');
-                const ctxDROP = document.getElementById('chartDrops').getContext('2d');
-
-                const chartRB = new Chart(ctxRB, {
-                  type: 'line',
-                  data: { labels: labels, datasets: buildDatasets(seriesRB) },
-                  options: { responsive: true, animation:false, plugins:{legend:{position:'top'}}, scales:{ y:{ title:{display:true, text:'kb/s'}}, x:{display:false} } },
-                  plugins: [cursorPlugin]
-                });
-                const chartOWD = new Chart(ctxOWD, {
-                  type: 'line',
-                  data: { labels: labels, datasets: buildDatasets(seriesOWD) },
-                  options: { responsive: true, animation:false, plugins:{legend:{position:'top'}}, scales:{ y:{ title:{display:true, text:'OWD (ms)'}}, x:{display:false} } },
-                  plugins: [cursorPlugin]
-                });
-                const chartLOSS = new Chart(ctxLOSS, {
-                  type: 'line',
-                  data: { labels: labels, datasets: buildDatasets(seriesLOSS) },
-                  options: { responsive: true, animation:false, plugins:{legend:{position:'top'}}, scales:{ y:{ min:0, max:100, title:{display:true, text:'Loss (%)'}}, x:{display:false} } },
-                  plugins: [cursorPlugin]
-                });
-                const chartDROP = new Chart(ctxDROP, {
-                  type: 'line',
-                  data: { labels: labels, datasets: [
-                    { label:'Dropped Video', data: dropsVideo, borderColor:'#dc3545', backgroundColor:'#dc3545', pointRadius:0, borderWidth:2 },
-                    { label:'Dropped TS',    data: dropsTs,    borderColor:'#fd7e14', backgroundColor:'#fd7e14', pointRadius:0, borderWidth:2 }
-                  ] },
-                  options: { responsive: true, animation:false, plugins:{legend:{position:'top'}}, scales:{ y:{ title:{display:true, text:'Cumulative drops'}}, x:{display:false} } },
-                  plugins: [cursorPlugin]
-                });
-
-                function updateCursor(i){
-                  currentIndex = i;
-                  chartRB.update('none');
-                  chartOWD.update('none');
-                  chartLOSS.update('none');
-                  chartDROP.update('none');
-                }
-
-                renderLinkFilters();
-                const btnAll = document.getElementById('btnAllLinks');
-                const btnNone = document.getElementById('btnNoneLinks');
-                function setAllLinks(on){
-                  if (!filterHost) return;
-                  filterHost.querySelectorAll('input[type="checkbox"]').forEach(function(cb){ cb.checked = on; });
-                  [chartRB, chartOWD, chartLOSS].forEach(function(ch){
-                    ch.data.datasets.forEach(function(ds){ ds.hidden = !on; });
-                    ch.update('none');
-                  });
-                }
-                if (btnAll)  btnAll.addEventListener('click', function(){ setAllLinks(true); });
-                if (btnNone) btnNone.addEventListener('click', function(){ setAllLinks(false); });
-              const isLive = """ + ("false" if s_end else "true") + """;
-              if (!samples.length) {
-                alert('No samples');
-                return;
-              }
-
-              // Build Leaflet map
-              const map = L.map('map');
-              const osm = L.tileLayer('https://tile.openstreetmap.org/{z}/{x}/{y}.png', { maxZoom: 19, attribution: '&copy; OpenStreetMap' });
-              osm.addTo(map);
-
-              // Helpers
-              const toLatLng = function(s) { return (s.latitude!=null && s.longitude!=null) ? L.latLng(s.latitude, s.longitude) : null; };
-              // Haversine distance in meters between two Leaflet LatLng
-              function distMeters(a, b) {
-                const R = 6371000; // m
-                const toRad = function(x){ return x * Math.PI / 180; };
-                const dLat = toRad(b.lat - a.lat);
-                const dLng = toRad(b.lng - a.lng);
-                const la = toRad(a.lat), lb = toRad(b.lat);
-                const h = Math.sin(dLat/2)**2 + Math.cos(la)*Math.cos(lb)*Math.sin(dLng/2)**2;
-                return 2 * R * Math.asin(Math.sqrt(h));
-              }
-              const MOVE_EPS_M = 3;      // under 3 m: consider same position
-              const STALE_TICKS = 30;     // ~60 s if your sampling is 2 s per tick
-
-              // Quality scoring per link
-              function scoreLink(link) {
-                function toNum(x){
-                  if (typeof x === 'number') return x;
-                  if (x == null) return null;
-                  var n = parseFloat(String(x).replace(',','.'));
-                  return isNaN(n) ? null : n;
-                }
-                const owd  = toNum(link.owdR);
-                if (typeof owd === 'number') {
-                  if (owd < 100) return 'good';
-                  if (owd > 100 && owd < 200) return 'fair';
-                  if (owd >= 200) return 'poor';
-                }
-                return 'poor';
-              }
-              const colorFor = function(q) { return q==='good' ? '#ff00ff' : (q==='fair' ? '#ff7f00' : '#ffff00'); };
-
-              // Buckets of polylines per category for toggle visibility
-              const layersGood = [];   // fuchsia
-              const layersFair = [];   // vivid orange
-              const layersPoor = [];   // fluorescent yellow
-              const layersDrop = [];   // red dashed
-
-              function applyLegendFilters() {
-                const showGood  = document.getElementById('chkGood').checked;
-                const showFair  = document.getElementById('chkFair').checked;
-                const showPoor  = document.getElementById('chkPoor').checked;
-                const showDrops = document.getElementById('chkDrops').checked;
-                const sets = [
-                  [layersGood, showGood],
-                  [layersFair, showFair],
-                  [layersPoor, showPoor],
-                  [layersDrop, showDrops]
-                ];
-                for (const [arr, show] of sets) {
-                  for (const line of arr) {
-                    if (show) { if (!line._map) line.addTo(map); }
-                    else { if (line._map) map.removeLayer(line); }
-                  }
-                }
-              }
-
-              let cursorMarker = null; // moving point that follows the timeline
-
-              // Build overall path and per-link paths
-              let latlngs = [];
-              let perLink = new Map(); // name -> {latlngs:[], segs:[]}
-              for (let i = 0; i < samples.length; ++i) {
-                const s = samples[i];
-                const ll = toLatLng(s);
-                if (ll) latlngs.push(ll);
-
-                const links = (s.links||[]).filter(function(l) { return l && l.name; });
-                for (let j = 0; j < links.length; ++j) {
-                  const l = links[j];
-                  const key = l.name;
-                  if (!perLink.has(key)) perLink.set(key, {latlngs:[], segs:[] });
-                  const q = scoreLink(l);
-                  const ll2 = ll; // per-tick uses same GPS
-                  if (ll2) perLink.get(key).segs.push({ ll: ll2, q: q });
-                }
-              }
-              // Precompute ticks since last movement for each index
-              let coords = samples.map(function(s){ return toLatLng(s); });
-              let ticksSinceMove = new Array(samples.length).fill(Infinity);
-              let prevLL = null, lastMovedIdx = -1;
-              for (let i = 0; i < coords.length; ++i) {
-                const ll = coords[i];
-                if (ll) {
-                  if (!prevLL) { prevLL = ll; lastMovedIdx = i; }
-                  else {
-                    try {
-                      if (distMeters(ll, prevLL) > MOVE_EPS_M) { lastMovedIdx = i; prevLL = ll; }
-                    } catch (e) { /* ignore */ }
-                  }
-                }
-                ticksSinceMove[i] = (lastMovedIdx >= 0) ? (i - lastMovedIdx) : Infinity;
-              }
-
-let lastCoord = coords.length ? coords[coords.length-1] : null;
-
-function appendSample(i){
-  const s = samples[i];
-  const ll = toLatLng(s);
-  if (ll) {
-    latlngs.push(ll);
-    try {
-      if (lastCoord == null) { lastCoord = ll; lastMovedIdx = i; }
-      else if (distMeters(ll, lastCoord) > MOVE_EPS_M) { lastCoord = ll; lastMovedIdx = i; }
-    } catch(e) {}
-  }
-  ticksSinceMove[i] = (lastMovedIdx >= 0) ? (i - lastMovedIdx) : Infinity;
-
-  const links = (s.links||[]).filter(function(l){ return l && l.name; });
-  for (let j=0;j<links.length;++j){
-    const l = links[j];
-    const key = l.name;
-    if (!perLink.has(key)) perLink.set(key, {latlngs:[], segs:[]});
-    const q = scoreLink(l);
-    if (ll) perLink.get(key).segs.push({ ll: ll, q: q });
-  }
-
-  let worst = 'good';
-  for (let j=0;j<(s.links||[]).length;++j){
-    const q = scoreLink(s.links[j]);
-    if (q === 'poor') { worst = 'poor'; break; }
-    if (q === 'fair' && worst === 'good') worst = 'fair';
-  }
-  const curVid = (typeof s.drops_video === 'number') ? s.drops_video : 0;
-  const curTs  = (typeof s.drops_ts === 'number') ? s.drops_ts : 0;
-
-  const prev = segs.length ? segs[segs.length-1] : null;
-  const prevVid = (segs._prevVid || 0), prevTs = (segs._prevTs || 0);
-  const newDrop = (curVid > prevVid) || (curTs > prevTs);
-
-  const seg = { ll: ll || (prev && prev.ll) || null, q: worst, drop: newDrop };
-  segs.push(seg);
-  segs._prevVid = curVid; segs._prevTs = curTs;
-
-  if (prev && (prev.ll || seg.ll)){
-    let opts = { color: colorFor(prev.q), weight: 4, opacity: 0.9 };
-    let bucket = null;
-    if (seg.drop) { opts = { color: '#ff0000', weight: 4, opacity: 0.9, dashArray: '6,6' }; bucket = layersDrop; }
-    else if (prev.q === 'good') bucket = layersGood;
-    else if (prev.q === 'fair') bucket = layersFair;
-    else bucket = layersPoor;
-    const a = prev.ll || seg.ll; const b = seg.ll || prev.ll;
-    const line = L.polyline([a,b], opts).addTo(map);
-    bucket.push(line);
-  }
-}
-
-async function repoll(){
-  try{
-    const r = await fetch('/log_download?session_id=' + sid);
-    if (!r.ok) return;
-    const d = await r.json();
-    const incoming = d.samples || [];
-    if (incoming.length <= samples.length) return;
-    const wasAtEnd = (parseInt(scrub.value,10) === parseInt(scrub.max,10));
-    for (let i=samples.length; i<incoming.length; ++i){
-      samples.push(incoming[i]);
-      coords.push(toLatLng(incoming[i]));
-      ticksSinceMove.push(Infinity);
-      appendSample(i);
-    }
-    // === charts: append labels and per-link values ===
-    labels.push(incoming[incoming.length-1].ts);
-    dropsVideo.push(typeof incoming[incoming.length-1].drops_video === 'number' ? incoming[incoming.length-1].drops_video : 0);
-    dropsTs.push(typeof incoming[incoming.length-1].drops_ts === 'number' ? incoming[incoming.length-1].drops_ts : 0);
-
-    // Append per link at the last tick only (charts are per tick)
-    const lastS = incoming[incoming.length-1];
-    const seen = new Set();
-    for (const l of (lastS.links||[])){
-      if (!l || !l.name) continue;
-      const name = String(l.name);
-      if (!(name in seriesRB)) { // new link seen live; add full-length null series
-        seriesRB[name]   = new Array(labels.length-1).fill(null);
-        seriesOWD[name]  = new Array(labels.length-1).fill(null);
-        seriesLOSS[name] = new Array(labels.length-1).fill(null);
-        linkNames.push(name);
-        chartRB.data.datasets.push({label:name, data:seriesRB[name], pointRadius:0, borderWidth:2, borderColor:colorForLink(name), backgroundColor:colorForLink(name)});
-        chartOWD.data.datasets.push({label:name, data:seriesOWD[name], pointRadius:0, borderWidth:2, borderColor:colorForLink(name), backgroundColor:colorForLink(name)});
-        chartLOSS.data.datasets.push({label:name, data:seriesLOSS[name], pointRadius:0, borderWidth:2, borderColor:colorForLink(name), backgroundColor:colorForLink(name)});
-        // add filter checkbox for the new link
-        if (filterHost) {
-          const id = 'lf_' + linkNames.length;
-          const wrap = document.createElement('div');
-          wrap.className = 'form-check form-check-inline m-0';
-          wrap.innerHTML = '<input class="form-check-input" type="checkbox" id="'+id+'" data-name="'+name+'" checked>'+
-                           '<label class="form-check-label small" for="'+id+'">'+name+'</label>';
-          filterHost.appendChild(wrap);
-          const cb = wrap.querySelector('input');
-          cb.addEventListener('change', function(){
-            const nm = cb.getAttribute('data-name');
-            const on = cb.checked;
-            [chartRB, chartOWD, chartLOSS].forEach(function(ch){
-              const ds = ch.data.datasets.find(d => d.label === nm);
-              if (ds) ds.hidden = !on;
-              ch.update('none');
-            });
-          });
-        }
-      }
-      const rb   = toNum(l.rx_bitrate);
-      const owd  = toNum(l.owdR);
-      const loss = toNum(l.rx_percent_lost);
-      seriesRB[name].push(rb!=null?rb:null);
-      seriesOWD[name].push(owd!=null?owd:null);
-      seriesLOSS[name].push(loss!=null?loss:null);
-      seen.add(name);
-    }
-    // Pad other links with null to keep alignment
-    for (const nm of linkNames){
-      if (!seen.has(nm)){
-        if (seriesRB[nm].length   < labels.length) seriesRB[nm].push(null);
-        if (seriesOWD[nm].length  < labels.length) seriesOWD[nm].push(null);
-        if (seriesLOSS[nm].length < labels.length) seriesLOSS[nm].push(null);
-      }
-    }
-    chartRB.data.labels = labels;
-    chartOWD.data.labels = labels;
-    chartLOSS.data.labels = labels;
-    chartDROP.data.labels = labels;
-    chartDROP.data.datasets[0].data = dropsVideo;
-    chartDROP.data.datasets[1].data = dropsTs;
-    chartRB.update('none'); chartOWD.update('none'); chartLOSS.update('none'); chartDROP.update('none');
-    const chkAll = document.getElementById('chkAllLinks');
-    if (chkAll && chkAll.checked) { clearPerLink(); drawPerLink(); }
-    scrub.max = Math.max(0, samples.length - 1);
-    if (wasAtEnd || (chkFollow && chkFollow.checked)) { scrub.value = scrub.max; renderAt(parseInt(scrub.max,10)); }
-  } catch(e){}
-}
-
-
-              // Overall polyline colored by worst quality per tick; mark NEW drops only
-              let segs = [];
-              let prevDropVid = 0, prevDropTs = 0; // cumulative counters observed so far
-              for (let i = 0; i < samples.length; ++i) {
-                const s = samples[i];
-                const ll = toLatLng(s);
-                if (!ll) continue;
-
-                // Quality from links only
-                let worst = 'good';
-                for (let j = 0; j < (s.links||[]).length; ++j) {
-                  const l = s.links[j];
-                  const q = scoreLink(l);
-                  if (q === 'poor') { worst = 'poor'; break; }
-                  if (q === 'fair' && worst === 'good') worst = 'fair';
-                }
-
-                // Mark segment red-dashed only if drops INCREASED since previous tick
-                const curVid = (typeof s.drops_video === 'number') ? s.drops_video : 0;
-                const curTs  = (typeof s.drops_ts === 'number') ? s.drops_ts : 0;
-                const newDrop = (curVid > prevDropVid) || (curTs > prevDropTs);
-                segs.push({ ll: ll, q: worst, drop: newDrop });
-                prevDropVid = curVid;
-                prevDropTs  = curTs;
-              }
-              // Draw segments into category buckets; visibility controlled by checkboxes
-              let last = null;
-              for (let i = 0; i < segs.length; ++i) {
-                const seg = segs[i];
-                if (!last) { last = seg; continue; }
-                let opts = { color: colorFor(last.q), weight: 4, opacity: 0.9 };
-                let bucket = null;
-                if (seg.drop) {
-                  opts = { color: '#ff0000', weight: 4, opacity: 0.9, dashArray: '6,6' };
-                  bucket = layersDrop;
-                } else if (last.q === 'good') {
-                  bucket = layersGood;
-                } else if (last.q === 'fair') {
-                  bucket = layersFair;
-                } else {
-                  bucket = layersPoor;
-                }
-                const line = L.polyline([last.ll, seg.ll], opts).addTo(map);
-                bucket.push(line);
-                last = seg;
-              }
-              // Apply initial visibility from legend toggles
-              applyLegendFilters();
-
-              // Per-link optional polylines (thin)
-              const linkLayers = new Map();
-              function drawPerLink() {
-                for (const [name, obj] of perLink.entries()) {
-                  if (linkLayers.has(name)) continue;
-                  let prev = null;
-                  const llayers = [];
-                  for (let i = 0; i < obj.segs.length; ++i) {
-                    const seg = obj.segs[i];
-                    if (!prev) { prev = seg; continue; }
-                    llayers.push(L.polyline([prev.ll, seg.ll], { color: colorFor(seg.q), weight: 2, opacity: 0.5 }).addTo(map));
-                    prev = seg;
-                  }
-                  linkLayers.set(name, llayers);
-                }
-              }
-              function clearPerLink() {
-                for (const arr of linkLayers.values()) arr.forEach(function(l) { map.removeLayer(l); });
-                linkLayers.clear();
-              }
-
-              // Fit map
-              if (latlngs.length) {
-                map.fitBounds(L.latLngBounds(latlngs), { padding:[20,20] });
-                L.circleMarker(latlngs[0], { radius:5, color:'#333', fill:true, fillOpacity:1 }).addTo(map).bindTooltip('Start');
-                L.circleMarker(latlngs[latlngs.length-1], { radius:5, color:'#333', fill:true, fillOpacity:1 }).addTo(map).bindTooltip('End');
-              }
-
-              // Timeline & badges
-              const scrub = document.getElementById('scrub');
-              const tsStart = document.getElementById('tsStart');
-              const tsNow = document.getElementById('tsNow');
-              const tsEnd = document.getElementById('tsEnd');
-              const linkBadges = document.getElementById('linkBadges');
-              scrub.max = Math.max(0, samples.length - 1);
-              function _pad2(n){return String(n).padStart(2,'0');}
-              function _tzLabel(d){
-                var tz = d.getTimezoneOffset(), off = -tz;
-                var sign = off>=0?'+':'-', abs = Math.abs(off);
-                return 'UTC'+sign+_pad2(Math.floor(abs/60))+':'+_pad2(abs%60);
-              }
-              function fmtTs(ts){
-                if(!ts) return '';
-                var utc = ts.replace('T',' ').substring(0,19);
-                var sIso = ts.length>=19 ? ts.substring(0,19) : ts;
-                if(sIso.indexOf('T')<0) sIso = sIso.replace(' ','T');
-                var d = new Date(sIso+'Z');
-                if(isNaN(d.getTime())) return utc+' UTC';
-                var local = d.getFullYear()+'-'+_pad2(d.getMonth()+1)+'-'+_pad2(d.getDate())+' '+
-                            _pad2(d.getHours())+':'+_pad2(d.getMinutes())+':'+_pad2(d.getSeconds());
-                return '<div>'+utc+' <span class="text-muted">UTC</span></div>'+
-                       '<div class="text-muted">'+local+' '+_tzLabel(d)+'</div>';
-              }
-              tsStart.innerHTML = fmtTs(samples[0].ts);
-              tsEnd.innerHTML = fmtTs(samples[samples.length-1].ts);
-              function renderAt(i) {
-                const s = samples[i];
-                tsNow.innerHTML = fmtTs(s.ts);
-                // Move the cursor point to the current GPS position (always reflect latest lat/lng; no warnings)
-                var llc = (s && s.latitude!=null && s.longitude!=null) ? L.latLng(s.latitude, s.longitude) : null;
-                if (llc) {
-                  if (cursorMarker) {
-                    cursorMarker.setLatLng(llc);
-                    cursorMarker.setStyle({ color: '#111' });
-                  } else {
-                    cursorMarker = L.circleMarker(llc, { radius: 6, color: '#111', weight: 2, fill: true, fillOpacity: 1 }).addTo(map);
-                  }
-                }
-                const links = (s.links||[]);
-                // Sort links by name for stable display
-                links.sort(function(a,b){ return String(a.name).localeCompare(String(b.name)); });
-                let dropsHtml = '';
-                if (s.drops_video && s.drops_video > 0) {
-                  dropsHtml += '<span class="badge me-1 mb-1" style="background:#ff0000;color:#fff;">Dropped Video: ' + s.drops_video + '</span>';
-                }
-                if (s.drops_ts && s.drops_ts > 0) {
-                  dropsHtml += '<span class="badge me-1 mb-1" style="background:#ff0000;color:#fff;">Dropped TS: ' + s.drops_ts + '</span>';
-                }
-                let html = dropsHtml;
-                for (let j = 0; j < links.length; ++j) {
-                  const l = links[j];
-                  const q = scoreLink(l);
-                  const bg = colorFor(q); // sync badge color with map segments
-                  const rb = (typeof l.rx_bitrate==='number'? l.rx_bitrate : 0);
-                  const fg = '#000'; // readable on light green / light blue / orange
-                  const owd = (l.owdR!=null? l.owdR : '–');
-                  const loss = (l.rx_percent_lost!=null? l.rx_percent_lost+'%' : '–');
-                  html += '<span class="badge me-1 mb-1 badge-link" style="background:' + bg + '; color:' + fg + ';">' + l.name + ': ' + rb + ' kb/s • OWD ' + owd + ' ms • loss ' + loss + '</span>';
-                }
-                linkBadges.innerHTML = html || '<span class="text-muted">No links</span>';
-                updateCursor(i);
-              }
-              scrub.addEventListener('input', function(e){ renderAt(parseInt(scrub.value,10)||0); });
-              renderAt(0);
-              updateCursor(0);
-
-              // Toggle per-link overlays (checkbox removed by default; keep graceful behavior)
-              const chkAllLinks = document.getElementById('chkAllLinks');
-              if (chkAllLinks) {
-                chkAllLinks.addEventListener('change', function() {
-                  if (chkAllLinks.checked) drawPerLink(); else clearPerLink();
-                });
-                if (chkAllLinks.checked) { drawPerLink(); } else { clearPerLink(); }
-              } else {
-                // No checkbox present: ensure overlays stay hidden on load
-                clearPerLink();
-              }
-
-              // Legend toggles for Good/Fair/Poor/Drops
-              ['chkGood','chkFair','chkPoor','chkDrops'].forEach(function(id){
-                const el = document.getElementById(id);
-                if (el) el.addEventListener('change', applyLegendFilters);
-              });
-
-
-            // Follow live
-            const chkFollow = document.getElementById('chkFollowLive');
-            let pollTimer = null;
-            function setPolling(on){
-              if (pollTimer) { clearInterval(pollTimer); pollTimer = null; }
-              if (on) {
-                pollTimer = setInterval(async function(){
-                  try {
-                    await repoll();
-                    if (deviceRowId !== null && deviceRowId !== 'null') {
-                      fetch('/data?id=' + deviceRowId).catch(()=>{});
-                    }
-                    if (window.refreshEvents) window.refreshEvents();
-                  } catch(e){}
-                }, 4000);
-              }
-            }
-            if (chkFollow) {
-              chkFollow.addEventListener('change', function(){
-                setPolling(chkFollow.checked && isLive);
-              });
-              setPolling(chkFollow.checked && isLive);
-            }
-            })();
+            window.LOG_VIEW = {sid: """, str(s_id), """, deviceRowId: """, (str(dev_row_id) if 'dev_row_id' in locals() and dev_row_id is not None else 'null'), """, pollerRunning: """, ("true" if poller_running else "false"), """, isLive: """, ("false" if s_end else "true"), """};
             </script>
+            <script src="/static/log_view.js?v=""", _LOG_VIEW_JS_VER, """"></script>
           </body></html>
-          """
+          """))
         cherrypy.response.headers['Content-Type'] = 'text/html; charset=utf-8'
         return body.encode('utf-8')
 
     @require_login
     @cherrypy.expose
     def log_purge(self, **kwargs):
-        import sqlite3
         with connect_db() as c:
-            c.execute("DELETE FROM live_sample")
-            c.execute("DELETE FROM live_session")
+            # Both tables in one write transaction (the connection is autocommit); a
+            # WHERE-less DELETE lets SQLite truncate the table instead of visiting rows
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                c.execute("DELETE FROM live_sample")
+                c.execute("DELETE FROM live_session")
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+        _export_cache_drop()
         # redirect back to UI with message
         raise cherrypy.HTTPRedirect("/logs_ui?msg=Logs%20purged")
     
     @require_login
     @cherrypy.expose
     def log_stop(self, session_id=None):
-        import sqlite3
-        from datetime import datetime
         if not session_id:
             raise cherrypy.HTTPRedirect("/logs_ui?msg=Missing%20session_id")
         try:
             sid = int(session_id)
         except Exception:
             raise cherrypy.HTTPRedirect("/logs_ui?msg=Bad%20session_id")
-        now_iso = datetime.utcnow().replace(tzinfo=None).isoformat()
+        now_iso = _dt.utcnow().replace(tzinfo=None).isoformat()
         with connect_db() as c:
             c.execute(
                 "UPDATE live_session SET ended_at=? WHERE id=? AND ended_at IS NULL",
                 (now_iso, sid)
             )
+        _export_cache_drop(sid)
         raise cherrypy.HTTPRedirect("/logs_ui?msg=Session%20stopped")
 
     @require_login
     @cherrypy.expose
     def log_delete(self, session_id=None):
-        import sqlite3
         if not session_id:
             raise cherrypy.HTTPRedirect("/logs_ui?msg=Missing%20session_id")
         try:
@@ -4187,15 +3985,21 @@ async function repoll(){
         except Exception:
             raise cherrypy.HTTPRedirect("/logs_ui?msg=Bad%20session_id")
         with connect_db() as c:
-            # Delete samples first, then the session
-            c.execute("DELETE FROM live_sample WHERE session_id=?", (sid,))
-            c.execute("DELETE FROM live_session WHERE id=?", (sid,))
+            # Delete samples first, then the session, in one write transaction
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                c.execute("DELETE FROM live_sample WHERE session_id=?", (sid,))
+                c.execute("DELETE FROM live_session WHERE id=?", (sid,))
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+        _export_cache_drop(sid)
         raise cherrypy.HTTPRedirect("/logs_ui?msg=Session%20deleted")
         
     @require_login
     @cherrypy.expose
     def log_rename(self, session_id=None, title=""):
-        import sqlite3
         if not session_id:
             raise cherrypy.HTTPRedirect("/logs_ui?msg=Missing%20session_id")
         try:
@@ -4205,13 +4009,12 @@ async function repoll(){
         title = (title or "").strip()
         with connect_db() as c:
             c.execute("UPDATE live_session SET title=? WHERE id=?", (title if title else None, sid))
+        _export_cache_drop(sid)
         raise cherrypy.HTTPRedirect("/logs_ui?msg=Title%20saved")
     
     @require_login
     @cherrypy.expose
     def session_events(self, session_id=None):
-        import json
-        from datetime import datetime as _dt2
         cherrypy.response.headers["Content-Type"] = "application/json; charset=utf-8"
         if not session_id:
             return b'{"ok":false,"error":"missing session_id"}'
@@ -4228,7 +4031,7 @@ async function repoll(){
                 return b'{"ok":false,"error":"session_not_found"}'
             host, started_at, ended_at, input_index, input_identifier = s
             ts_start_cmp = started_at[:19].replace('T', ' ')
-            ts_end_cmp   = (ended_at[:19].replace('T', ' ') if ended_at else _dt2.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
+            ts_end_cmp   = (ended_at[:19].replace('T', ' ') if ended_at else _dt.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
             rows = c.execute(
                 "SELECT ts, node, level, message FROM streamhub_log "
                 "WHERE device_host=? AND ts >= ? AND ts <= ? ORDER BY ts ASC",
@@ -4244,8 +4047,6 @@ async function repoll(){
     @require_login
     @cherrypy.expose
     def log_pdf(self, session_id=None, tz_offset=None):
-        import io
-        from datetime import datetime, timedelta
         if not session_id:
             raise cherrypy.HTTPRedirect("/logs_ui?msg=Missing%20session_id")
         try:
@@ -4283,11 +4084,38 @@ async function repoll(){
             if not s[8]:
                 raise cherrypy.HTTPRedirect("/logs_ui?msg=Session%20still%20live")
 
-            rows = c.execute(
+            # ── Compute per-link stats (streamed in fetchmany batches) ───────
+            link_stats = defaultdict(lambda: {
+                'rb': [], 'owd': [], 'loss': [], 'lost_pkts': 0
+            })
+            drops_video_max = 0
+            drops_ts_max = 0
+            bitrate_series = []   # (ts_str, total_rb) for chart
+
+            by_ts = {}
+            cur = c.execute(
                 "SELECT ts, link_name, owdR, rx_bitrate, rx_percent_lost, "
                 "rx_lost_nb_packets, drops_video, drops_ts "
                 "FROM live_sample WHERE session_id=? ORDER BY id ASC", (sid,)
-            ).fetchall()
+            )
+            while batch := cur.fetchmany(1000):
+                for ts, lname, owd, rb, rpl, rlnp, dv, dt in batch:
+                    if ts not in by_ts:
+                        by_ts[ts] = {'total_rb': 0, 'dv': dv or 0, 'dt': dt or 0}
+                    if lname:
+                        if rb is not None:
+                            link_stats[lname]['rb'].append(rb)
+                            by_ts[ts]['total_rb'] += rb
+                        if owd is not None:
+                            link_stats[lname]['owd'].append(owd)
+                        if rpl is not None:
+                            link_stats[lname]['loss'].append(rpl)
+                        if rlnp:
+                            link_stats[lname]['lost_pkts'] += rlnp
+                    if dv:
+                        drops_video_max = max(drops_video_max, dv)
+                    if dt:
+                        drops_ts_max = max(drops_ts_max, dt)
 
             ts_start_cmp = s[7][:19].replace('T', ' ') if s[7] else ''
             ts_end_cmp   = s[8][:19].replace('T', ' ') if s[8] else ''
@@ -4310,35 +4138,6 @@ async function repoll(){
             ).fetchone()
             first_gps = (round(gps_row[0], 6), round(gps_row[1], 6)) if gps_row else None
 
-        # ── Compute per-link stats ───────────────────────────────────────────
-        from collections import defaultdict
-        link_stats = defaultdict(lambda: {
-            'rb': [], 'owd': [], 'loss': [], 'lost_pkts': 0
-        })
-        drops_video_max = 0
-        drops_ts_max = 0
-        bitrate_series = []   # (ts_str, total_rb) for chart
-
-        by_ts = {}
-        for r in rows:
-            ts, lname, owd, rb, rpl, rlnp, dv, dt = r
-            if ts not in by_ts:
-                by_ts[ts] = {'total_rb': 0, 'dv': dv or 0, 'dt': dt or 0}
-            if lname:
-                if rb is not None:
-                    link_stats[lname]['rb'].append(rb)
-                    by_ts[ts]['total_rb'] += rb
-                if owd is not None:
-                    link_stats[lname]['owd'].append(owd)
-                if rpl is not None:
-                    link_stats[lname]['loss'].append(rpl)
-                if rlnp:
-                    link_stats[lname]['lost_pkts'] += rlnp
-            if dv:
-                drops_video_max = max(drops_video_max, dv)
-            if dt:
-                drops_ts_max = max(drops_ts_max, dt)
-
         for ts_key in sorted(by_ts.keys()):
             bitrate_series.append((ts_key, by_ts[ts_key]['total_rb']))
 
@@ -4350,13 +4149,13 @@ async function repoll(){
             m, s2 = divmod(r, 60)
             return f"{h:02d}:{m:02d}:{s2:02d}"
         def _parse_dt(x):
-            try: return datetime.fromisoformat(str(x)[:19])
+            try: return _dt.fromisoformat(str(x)[:19])
             except: return None
 
         started_dt = _parse_dt(s[7])
         ended_dt   = _parse_dt(s[8])
         duration   = _fmt_dur((ended_dt - started_dt).total_seconds()) if started_dt and ended_dt else "—"
-        generated  = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
+        generated  = _dt.utcnow().strftime("%Y-%m-%d %H:%M UTC")
         session_title = s[9] or ''
         title_str  = session_title or s[6] or s[1] or f"Session #{sid}"
         # Filename: include session title slug if set
@@ -4399,7 +4198,7 @@ async function repoll(){
             dt = _parse_dt(iso_str)
             if not dt:
                 return None
-            local_dt = dt - timedelta(minutes=tz_min)
+            local_dt = dt - _td(minutes=tz_min)
             return local_dt.strftime('%Y-%m-%d %H:%M:%S')
 
         def _tz_label():
@@ -4896,7 +4695,6 @@ async function repoll(){
         gw_name  = gw[0] if gw else host
         generated_utc   = _dtr.utcnow().strftime('%d/%m/%Y %H:%M:%S UTC')
 
-        from collections import defaultdict
         client_data    = defaultdict(list)      # addr → [(ts,br,rtt,loss)]
         client_srt_ver = {}                       # addr → latest srt_version
         for row in client_samples_raw:
@@ -5630,8 +5428,29 @@ async function repoll(){
         raise cherrypy.HTTPRedirect("/settings?msg=SRT+Gateway+notifications+resumed")
 
 
+def _thread_pool_size():
+    """CherryPy worker count: SP_THREAD_POOL if set, else ~10 per GB of RAM (10..100)."""
+    env = (os.getenv("SP_THREAD_POOL") or "").strip()
+    if env:
+        try:
+            return max(1, int(env))
+        except Exception:
+            pass
+    try:
+        try:
+            import psutil
+            mem = psutil.virtual_memory().total
+        except ImportError:
+            mem = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        mem_gb = max(1, int(mem / (1024 ** 3)))
+    except Exception:
+        return 32
+    return min(100, max(10, mem_gb * 10))
+
 def run():
     _init_db()  # create tables/indexes once at startup
+    _load_app_meta()
+    _load_slow_threshold()
     # Attach CORS headers to every response (including 3xx redirects)
     def _cors():
         cherrypy.response.headers['Access-Control-Allow-Origin'] = '*'
@@ -5656,11 +5475,12 @@ def run():
             ("Access-Control-Allow-Origin", "*"),
         ],
         "tools.cors.on": True,
-        "server.thread_pool": 32,
+        "server.thread_pool": _thread_pool_size(),
         "server.socket_timeout": 5,
         "tools.sessions.on": True,
         "tools.sessions.timeout": int(os.getenv("SP_SESSION_TIMEOUT_MIN", "480")),
-        "tools.gzip.on": True,
+        "tools.gzip.on": _GZIP_ON,
+        "tools.gzip.compress_level": _GZIP_LEVEL,
         "tools.encode.on": True,
         "tools.encode.encoding": "utf-8",
         "tools.sessions.httponly": True,
@@ -5694,6 +5514,12 @@ def run():
                 SRT_POLLER.stop()
         except Exception:
             pass
+        # after POLLER.stop(), so its writer queue has drained into LOGGER
+        try:
+            LOGGER.stop()
+        except Exception:
+            pass
+        close_db_connections()
     cherrypy.engine.subscribe('stop', _on_stop)
 
     # Enable static file serving for /static if not already enabled
@@ -5701,7 +5527,13 @@ def run():
     static_dir.mkdir(parents=True, exist_ok=True)
     cherrypy.tree.mount(None, '/static', {'/': {
         'tools.staticdir.on': True,
-        'tools.staticdir.dir': str(static_dir)
+        'tools.staticdir.dir': str(static_dir),
+        # log_view.js is versioned by ?v=<mtime>, so it can be cached for a long time
+        'tools.response_headers.on': True,
+        'tools.response_headers.headers': [('Cache-Control', 'public, max-age=86400')],
+        'tools.gzip.on': _GZIP_ON,
+        'tools.gzip.compress_level': _GZIP_LEVEL,
+        'tools.gzip.mime_types': ['text/javascript', 'application/javascript'],
     }})
     cherrypy.quickstart(App())
 
@@ -0,0 +1,799 @@
+// SPDX-License-Identifier: LGPL-2.1-or-later
+// Copyright (C) 2026 Alexandre Licinio
+// Session log viewer (map, charts, scrubber, follow-live) for /log_view.
+// Expects window.LOG_VIEW = {sid, deviceRowId, pollerRunning, isLive} set by the page.
+(async function() {
+  // Per-page values rendered by log_view() into window.LOG_VIEW
+  const sid = LOG_VIEW.sid;
+  const deviceRowId = LOG_VIEW.deviceRowId;
+  // The background poller already collects this device; /data is only pinged without it
+  const pollerRunning = LOG_VIEW.pollerRunning;
+  // NaN when missing; only strings with a decimal comma take the allocating path
+  function toNum(x){
+    if (typeof x === 'number') return x;
+    if (x == null) return NaN;
+    if (typeof x === 'string' && x !== '' && x.indexOf(',') < 0) { const n = +x; if (n === n) return n; }
+    return parseFloat(String(x).replace(',','.'));
+  }
+  // Sorted link names plus one NaN-filled Float32Array per link for rate (kb/s), OWD (ms)
+  // and loss (%), and the drop counters. Self-contained: it also runs as the worker body.
+  function fillSeries(samples){
+    const linkSet = new Set();
+    for (const s of samples) {
+      for (const l of (s.links||[])) if (l && l.name) linkSet.add(String(l.name));
+    }
+    const linkNames = Array.from(linkSet).sort();
+    const n = samples.length, index = new Map(), rb = [], owd = [], loss = [];
+    linkNames.forEach(function(name, k){
+      index.set(name, k);
+      rb.push(new Float32Array(n).fill(NaN));
+      owd.push(new Float32Array(n).fill(NaN));
+      loss.push(new Float32Array(n).fill(NaN));
+    });
+    const dropsVideo = new Uint32Array(n), dropsTs = new Uint32Array(n);
+    for (let i = 0; i < n; ++i) {
+      const s = samples[i];
+      dropsVideo[i] = (typeof s.drops_video === 'number' ? s.drops_video : 0);
+      dropsTs[i]    = (typeof s.drops_ts    === 'number' ? s.drops_ts    : 0);
+      for (const l of (s.links||[])) {
+        if (!l || !l.name) continue;
+        const k = index.get(String(l.name));
+        rb[k][i]   = toNum(l.rx_bitrate);
+        owd[k][i]  = toNum(l.owdR);
+        loss[k][i] = toNum(l.rx_percent_lost);
+      }
+    }
+    return { linkNames: linkNames, rb: rb, owd: owd, loss: loss, dropsVideo: dropsVideo, dropsTs: dropsTs };
+  }
+  // Parse + fill in a worker while this thread parses the same text for the map and
+  // badges; the typed buffers come back transferred. Resolves null if no worker could run.
+  function fillSeriesOffThread(raw){
+    return new Promise(function(resolve){
+      let url = null, w = null;
+      function done(v){ if (w) w.terminate(); if (url) URL.revokeObjectURL(url); resolve(v); }
+      try {
+        const src = toNum.toString() + fillSeries.toString() +
+          'onmessage = function(e){ const r = fillSeries(JSON.parse(e.data).samples || []);' +
+          ' postMessage(r, [].concat(r.rb, r.owd, r.loss, [r.dropsVideo, r.dropsTs]).map(function(a){ return a.buffer; })); };';
+        url = URL.createObjectURL(new Blob([src], { type: 'text/javascript' }));
+        w = new Worker(url);
+        w.onmessage = function(e){ done(e.data); };
+        w.onerror = function(){ done(null); };
+        w.postMessage(raw);
+      } catch (e) { done(null); }
+    });
+  }
+
+  // The server keeps ~4 ticks per chart pixel column; live ticks come in undecimated
+  const chartPx = Math.max(100, Math.ceil(document.getElementById('chartBitrate').clientWidth || 0));
+  const res = await fetch('/log_download?session_id=' + sid + '&pixels=' + chartPx);
+  if (!res.ok) {
+    alert('Failed to load session JSON');
+    return;
+  }
+  const raw = await res.text();
+  const filling = fillSeriesOffThread(raw);
+  let data = JSON.parse(raw);
+  let samples = data.samples || [];
+  const filled = (await filling) || fillSeries(samples);
+  // ===== Charts (Chart.js) =====
+    const linkNames = filled.linkNames;
+
+    // ===== Render link filter checkboxes =====
+    const filterHost = document.getElementById('linkFilter');
+    // The three link charts hold one dataset per link, created in linkNames order
+    const dsIndexByName = new Map();
+    linkNames.forEach(function(name, k){ dsIndexByName.set(name, k); });
+    function setLinkVisible(nm, on){
+      const k = dsIndexByName.get(nm);
+      if (k === undefined) return;
+      chartRB.data.datasets[k].hidden = !on;
+      chartOWD.data.datasets[k].hidden = !on;
+      chartLOSS.data.datasets[k].hidden = !on;
+      scheduleRender();
+    }
+    function renderLinkFilters(){
+      if (!filterHost) return;
+      filterHost.innerHTML = '';
+      linkNames.forEach(function(name, idx){
+        const id = 'lf_' + idx;
+        const wrap = document.createElement('div');
+        wrap.className = 'form-check form-check-inline m-0';
+        wrap.innerHTML = '<input class="form-check-input" type="checkbox" id="'+id+'" data-name="'+name+'" checked>'+
+                         '<label class="form-check-label small" for="'+id+'">'+name+'</label>';
+        filterHost.appendChild(wrap);
+      });
+      // handlers
+      filterHost.querySelectorAll('input[type="checkbox"]').forEach(function(cb){
+        cb.addEventListener('change', function(){
+          setLinkVisible(cb.getAttribute('data-name'), cb.checked); // toggle datasets in 3 charts
+        });
+      });
+    }
+
+    // Series are typed arrays (NaN = no value); their logical length is labels.length
+    // and live ticks grow them by 1.5x so appending stays amortised O(1)
+    function growTyped(arr, need, fill){
+      if (arr.length >= need) return arr;
+      const out = new arr.constructor(Math.max(need, Math.ceil(arr.length * 1.5)));
+      if (fill !== undefined) out.fill(fill);
+      out.set(arr);
+      return out;
+    }
+    // One slot per link: rb (kb/s), owd (ms), loss (%)
+    function newSlot(n) {
+      return { rb: new Float32Array(n).fill(NaN), owd: new Float32Array(n).fill(NaN), loss: new Float32Array(n).fill(NaN) };
+    }
+    function growSlot(slot, n) {
+      slot.rb   = growTyped(slot.rb, n, NaN);
+      slot.owd  = growTyped(slot.owd, n, NaN);
+      slot.loss = growTyped(slot.loss, n, NaN);
+    }
+    const seriesByName = new Map();
+    linkNames.forEach(function(name, k){
+      seriesByName.set(name, { rb: filled.rb[k], owd: filled.owd[k], loss: filled.loss[k] });
+    });
+    const labels = samples.map(s => s.ts);
+    let dropsVideo = filled.dropsVideo;
+    let dropsTs    = filled.dropsTs;
+
+    // Stable colors per link
+    const basePalette = ['#0077b6','#ff6f00','#6a4c93','#00a896','#d7263d','#118ab2','#ef476f','#06d6a0','#ff9f1c','#8338ec','#3a86ff','#8ac926','#1982c4','#ff595e','#6a994e','#b56576'];
+    // Assigned in linkNames order; addLinkColor runs whenever a name is appended
+    const colorByLink = new Map();
+    const addLinkColor = (name) => { colorByLink.set(name, basePalette[colorByLink.size % basePalette.length]); };
+    linkNames.forEach(addLinkColor);
+    const colorForLink = (name) => colorByLink.get(name) || basePalette[0];
+
+    // Cursor plugin draws a vertical line at current index
+    let currentIndex = 0;
+    const cursorPlugin = {
+      id: 'cursorLine',
+      afterDatasetsDraw(chart) {
+        if (!chart || !chart.scales || !chart.scales.x) return;
+        const xScale = chart.scales.x;
+        const yScale = chart.scales.y;
+        if (currentIndex < 0 || currentIndex >= (labels.length||0)) return;
+        const ctx = chart.ctx;
+        const x = xScale.getPixelForValue(currentIndex);
+        ctx.save();
+        ctx.strokeStyle = '#111';
+        ctx.lineWidth = 1;
+        ctx.setLineDash([4,3]);
+        ctx.beginPath();
+        ctx.moveTo(x, yScale.top);
+        ctx.lineTo(x, yScale.bottom);
+        ctx.stroke();
+        ctx.restore();
+      }
+    };
+
+    // M4 downsampling: per index bucket keep the first, min, max and last point.
+    // A chart cannot show more than ~4 points per pixel column, so each series is
+    // cut to 4 * canvas width points while its visual envelope stays exact.
+    // Points are {x: sample index, y}; an empty bucket keeps one null (a gap).
+    // n is the logical length, typed series may carry spare capacity.
+    function m4Downsample(ys, targetBuckets, n){
+      if (n === undefined) n = labels.length;
+      const out = [];
+      if (n <= targetBuckets * 4) {
+        for (let i = 0; i < n; ++i) out.push({x: i, y: ys[i]});
+        return out;
+      }
+      const size = n / targetBuckets;
+      for (let b = 0; b < targetBuckets; ++b) {
+        const lo = Math.floor(b * size), hi = Math.min(n, Math.floor((b + 1) * size));
+        let first = -1, last = -1, iMin = -1, iMax = -1;
+        for (let i = lo; i < hi; ++i) {
+          const y = ys[i];
+          if (y == null || y !== y) continue;
+          if (first < 0) first = i;
+          last = i;
+          if (iMin < 0 || y < ys[iMin]) iMin = i;
+          if (iMax < 0 || y > ys[iMax]) iMax = i;
+        }
+        if (first < 0) { out.push({x: lo, y: null}); continue; }
+        const idx = [first, iMin, iMax, last].sort(function(a, b){ return a - b; });
+        let prev = -1;
+        for (const i of idx) { if (i !== prev) { out.push({x: i, y: ys[i]}); prev = i; } }
+      }
+      return out;
+    }
+    function chartBuckets(canvas){ return Math.max(100, Math.ceil(canvas.clientWidth || 0)); }
+    // Live ticks are appended raw after the downsampled history; once a dataset holds
+    // more than 8 points per bucket the whole series is re-bucketed, so a long
+    // Follow-Live session stays at O(chart width) points instead of one per tick
+    function pushTail(ds, ys, from, buckets){
+      for (let i = from; i < labels.length; ++i) ds.data.push({x: i, y: ys[i]});
+      if (ds.data.length > buckets * 8) ds.data = m4Downsample(ys, buckets);
+    }
+    // x is the sample index (linear scale); tooltips show the sample timestamp
+    const xIndexScale = { type:'linear', display:false, min:0 };
+    const tooltipByIndex = { callbacks: { title: function(items){ return items.length ? labels[items[0].parsed.x] : ''; } } };
+
+    function buildDatasets(field, buckets){
+      return linkNames.map(name => ({
+        label: name,
+        data: m4Downsample(seriesByName.get(name)[field], buckets),
+        parsing: false,
+        spanGaps: false,
+        pointRadius: 0,
+        stepped: false,
+        borderWidth: 2,
+        borderColor: colorForLink(name),
+        backgroundColor: colorForLink(name),
+      }));
+    }
+
+    // Create charts
+    const ctxRB   = document.getElementById('chartBitrate').getContext('2d');
+    const ctxOWD  = document.getElementById('chartOWD').getContext('2d');
+    const ctxLOSS = document.getElementById('chartLoss').getContext('2d');
+    const ctxDROP = document.getElementById('chartDrops').getContext('2d');
+
+    const chartRB = new Chart(ctxRB, {
+      type: 'line',
+      data: { datasets: buildDatasets('rb', chartBuckets(ctxRB.canvas)) },
+      options: { responsive: true, animation:false, normalized:true, plugins:{legend:{position:'top'}, tooltip: tooltipByIndex}, scales:{ y:{ title:{display:true, text:'kb/s'}}, x: xIndexScale } },
+      plugins: [cursorPlugin]
+    });
+    const chartOWD = new Chart(ctxOWD, {
+      type: 'line',
+      data: { datasets: buildDatasets('owd', chartBuckets(ctxOWD.canvas)) },
+      options: { responsive: true, animation:false, normalized:true, plugins:{legend:{position:'top'}, tooltip: tooltipByIndex}, scales:{ y:{ title:{display:true, text:'OWD (ms)'}}, x: xIndexScale } },
+      plugins: [cursorPlugin]
+    });
+    const chartLOSS = new Chart(ctxLOSS, {
+      type: 'line',
+      data: { datasets: buildDatasets('loss', chartBuckets(ctxLOSS.canvas)) },
+      options: { responsive: true, animation:false, normalized:true, plugins:{legend:{position:'top'}, tooltip: tooltipByIndex}, scales:{ y:{ min:0, max:100, title:{display:true, text:'Loss (%)'}}, x: xIndexScale } },
+      plugins: [cursorPlugin]
+    });
+    const chartDROP = new Chart(ctxDROP, {
+      type: 'line',
+      data: { datasets: [
+        { label:'Dropped Video', data: m4Downsample(dropsVideo, chartBuckets(ctxDROP.canvas)), parsing:false, borderColor:'#dc3545', backgroundColor:'#dc3545', pointRadius:0, borderWidth:2 },
+        { label:'Dropped TS',    data: m4Downsample(dropsTs, chartBuckets(ctxDROP.canvas)),    parsing:false, borderColor:'#fd7e14', backgroundColor:'#fd7e14', pointRadius:0, borderWidth:2 }
+      ] },
+      options: { responsive: true, animation:false, normalized:true, plugins:{legend:{position:'top'}, tooltip: tooltipByIndex}, scales:{ y:{ title:{display:true, text:'Cumulative drops'}}, x: xIndexScale } },
+      plugins: [cursorPlugin]
+    });
+
+    // Every chart redraw goes through one requestAnimationFrame, so bursts of
+    // scrub / poll / filter events cost at most one repaint per frame. A cursor move
+    // changes no data, so unless data changed too the frame only redraws (draw())
+    // and skips update()'s scale and element recomputation.
+    let renderPending = false, dataDirty = false;
+    function requestChartFrame(){
+      if (renderPending) return;
+      renderPending = true;
+      requestAnimationFrame(function(){
+        renderPending = false;
+        const charts = [chartRB, chartOWD, chartLOSS, chartDROP];
+        if (dataDirty) { dataDirty = false; charts.forEach(function(ch){ ch.update('none'); }); }
+        else charts.forEach(function(ch){ ch.draw(); });
+      });
+    }
+    function scheduleRender(){
+      dataDirty = true;
+      requestChartFrame();
+    }
+
+    function updateCursor(i){
+      currentIndex = i;
+      requestChartFrame();
+    }
+
+    renderLinkFilters();
+    const btnAll = document.getElementById('btnAllLinks');
+    const btnNone = document.getElementById('btnNoneLinks');
+    function setAllLinks(on){
+      if (!filterHost) return;
+      filterHost.querySelectorAll('input[type="checkbox"]').forEach(function(cb){ cb.checked = on; });
+      [chartRB, chartOWD, chartLOSS].forEach(function(ch){
+        ch.data.datasets.forEach(function(ds){ ds.hidden = !on; });
+      });
+      scheduleRender();
+    }
+    if (btnAll)  btnAll.addEventListener('click', function(){ setAllLinks(true); });
+    if (btnNone) btnNone.addEventListener('click', function(){ setAllLinks(false); });
+  const isLive = LOG_VIEW.isLive;
+  if (!samples.length) {
+    alert('No samples');
+    return;
+  }
+
+  // Build Leaflet map
+  const map = L.map('map');
+  const osm = L.tileLayer('https://tile.openstreetmap.org/{z}/{x}/{y}.png', { maxZoom: 19, attribution: '&copy; OpenStreetMap' });
+  osm.addTo(map);
+
+  // Helpers
+  // Plain [lat, lng] tuples: Leaflet accepts them wherever it takes a LatLng
+  function llTuple(s) { return (s.latitude!=null && s.longitude!=null) ? [s.latitude, s.longitude] : null; }
+  // Per-sample coordinates as parallel typed arrays (NaN = no GPS fix), with the
+  // latitude cosine cached so the haversine below needs no per-call Math.cos
+  const DEG = Math.PI / 180;
+  let latArr = new Float64Array(samples.length);
+  let lngArr = new Float64Array(samples.length);
+  let cosArr = new Float64Array(samples.length);
+  let ticksSinceMove = new Float64Array(samples.length).fill(Infinity);
+  function growCoords(need) {
+    latArr = growTyped(latArr, need, NaN);
+    lngArr = growTyped(lngArr, need, NaN);
+    cosArr = growTyped(cosArr, need, NaN);
+    ticksSinceMove = growTyped(ticksSinceMove, need, Infinity);
+  }
+  // Validated once here, so the distance loops need no guard beyond the NaN check
+  function setCoord(i, s) {
+    const lat = s.latitude, lng = s.longitude;
+    if (lat!=null && lng!=null && Number.isFinite(+lat) && Number.isFinite(+lng)) {
+      latArr[i] = lat; lngArr[i] = lng; cosArr[i] = Math.cos(lat * DEG);
+    } else {
+      latArr[i] = NaN; lngArr[i] = NaN; cosArr[i] = NaN;
+    }
+  }
+  // Haversine distance in meters between samples i and j
+  function distMetersIdx(i, j) {
+    const R = 6371000; // m
+    const dLat = (latArr[j] - latArr[i]) * DEG;
+    const dLng = (lngArr[j] - lngArr[i]) * DEG;
+    const h = Math.sin(dLat/2)**2 + cosArr[i]*cosArr[j]*Math.sin(dLng/2)**2;
+    return 2 * R * Math.asin(Math.sqrt(h));
+  }
+  const MOVE_EPS_M = 3;      // under 3 m: consider same position
+
+  // Quality scoring per link
+  function scoreLink(link) {
+    const owd  = toNum(link.owdR);
+    if (owd === owd) {
+      if (owd < 100) return 'good';
+      if (owd > 100 && owd < 200) return 'fair';
+      if (owd >= 200) return 'poor';
+    }
+    return 'poor';
+  }
+  // Score every link once per sample: l._q per link, s._worst for the tick
+  function annotateSample(s) {
+    let worst = 'good';
+    const links = s.links || [];
+    for (let j = 0; j < links.length; ++j) {
+      const l = links[j];
+      if (!l) continue;
+      const q = l._q = scoreLink(l);
+      if (q === 'poor') worst = 'poor';
+      else if (q === 'fair' && worst === 'good') worst = 'fair';
+    }
+    s._worst = worst;
+  }
+  for (let i = 0; i < samples.length; ++i) annotateSample(samples[i]);
+  const colorFor = function(q) { return q==='good' ? '#ff00ff' : (q==='fair' ? '#ff7f00' : '#ffff00'); };
+
+  // All track polylines share one <canvas> instead of one SVG <path> each
+  const renderer = L.canvas({ padding: 0.5 });
+
+  // One layer group per category: a legend toggle adds or removes the whole group
+  const layersGood = L.layerGroup().addTo(map);   // fuchsia
+  const layersFair = L.layerGroup().addTo(map);   // vivid orange
+  const layersPoor = L.layerGroup().addTo(map);   // fluorescent yellow
+  const layersDrop = L.layerGroup().addTo(map);   // red dashed
+
+  // Style of the overall-path segment ending on a tick: red dashed on a new drop,
+  // else the quality of the tick it starts from
+  function segStyle(prevQ, drop) {
+    if (drop) return { key: 'drop', bucket: layersDrop, opts: { color: '#ff0000', weight: 4, opacity: 0.9, dashArray: '6,6', renderer: renderer } };
+    const bucket = prevQ === 'good' ? layersGood : (prevQ === 'fair' ? layersFair : layersPoor);
+    return { key: prevQ, bucket: bucket, opts: { color: colorFor(prevQ), weight: 4, opacity: 0.9, renderer: renderer } };
+  }
+  // Consecutive segments with the same style are merged into one polyline
+  let liveRun = null; // {key, line}: the last polyline, extended by live ticks
+
+  function applyLegendFilters() {
+    const showGood  = document.getElementById('chkGood').checked;
+    const showFair  = document.getElementById('chkFair').checked;
+    const showPoor  = document.getElementById('chkPoor').checked;
+    const showDrops = document.getElementById('chkDrops').checked;
+    const sets = [
+      [layersGood, showGood],
+      [layersFair, showFair],
+      [layersPoor, showPoor],
+      [layersDrop, showDrops]
+    ];
+    for (const [group, show] of sets) {
+      if (show && !map.hasLayer(group)) map.addLayer(group);
+      else if (!show && map.hasLayer(group)) map.removeLayer(group);
+    }
+  }
+
+  let cursorMarker = null; // moving point that follows the timeline
+
+  // Build overall path
+  let latlngs = [];
+  for (let i = 0; i < samples.length; ++i) {
+    const ll = llTuple(samples[i]);
+    if (ll) latlngs.push(ll);
+  }
+  // Per-link paths are only needed for the per-link overlay: built on its first
+  // draw, then kept up to date by live ticks
+  let perLink = null; // name -> {segs:[]}
+  function addPerLinkTick(s, ll) {
+    const links = s.links || [];
+    for (let j = 0; j < links.length; ++j) {
+      const l = links[j];
+      if (!l || !l.name) continue;
+      let obj = perLink.get(l.name);
+      if (!obj) { obj = { segs: [] }; perLink.set(l.name, obj); }
+      if (ll) obj.segs.push({ ll: ll, q: l._q }); // per-tick uses same GPS
+    }
+  }
+  // Precompute ticks since last movement for each index
+  let prevIdx = -1, lastMovedIdx = -1;
+  for (let i = 0; i < samples.length; ++i) {
+    setCoord(i, samples[i]);
+    if (latArr[i] === latArr[i]) {
+      if (prevIdx < 0) { prevIdx = i; lastMovedIdx = i; }
+      else if (distMetersIdx(i, prevIdx) > MOVE_EPS_M) { lastMovedIdx = i; prevIdx = i; }
+    }
+    ticksSinceMove[i] = (lastMovedIdx >= 0) ? (i - lastMovedIdx) : Infinity;
+  }
+
+let lastCoordIdx = (samples.length && latArr[samples.length-1] === latArr[samples.length-1]) ? samples.length-1 : -1;
+
+function appendSample(i){
+const s = samples[i];
+annotateSample(s);
+const ll = llTuple(s);
+if (ll) {
+latlngs.push(ll);
+if (lastCoordIdx < 0) { lastCoordIdx = i; lastMovedIdx = i; }
+else if (distMetersIdx(i, lastCoordIdx) > MOVE_EPS_M) { lastCoordIdx = i; lastMovedIdx = i; }
+}
+ticksSinceMove[i] = (lastMovedIdx >= 0) ? (i - lastMovedIdx) : Infinity;
+
+if (perLink) addPerLinkTick(s, ll);
+
+const curVid = (typeof s.drops_video === 'number') ? s.drops_video : 0;
+const curTs  = (typeof s.drops_ts === 'number') ? s.drops_ts : 0;
+
+const prev = segs.length ? segs[segs.length-1] : null;
+const prevVid = (segs._prevVid || 0), prevTs = (segs._prevTs || 0);
+const newDrop = (curVid > prevVid) || (curTs > prevTs);
+
+const seg = { ll: ll || (prev && prev.ll) || null, q: s._worst, drop: newDrop };
+segs.push(seg);
+segs._prevVid = curVid; segs._prevTs = curTs;
+
+if (prev && (prev.ll || seg.ll)){
+const st = segStyle(prev.q, seg.drop);
+const a = prev.ll || seg.ll; const b = seg.ll || prev.ll;
+if (liveRun && liveRun.key === st.key) {
+liveRun.line.addLatLng(b);
+} else {
+const line = L.polyline([a,b], st.opts);
+st.bucket.addLayer(line);
+liveRun = { key: st.key, line: line };
+}
+}
+}
+
+// Chart side of a batch of live ticks: every buffer grows once to the final length,
+// then each tick writes only the links it carries (an absent link stays NaN, a gap)
+function appendChartTicks(ticks){
+const from = labels.length, n = from + ticks.length;
+dropsVideo = growTyped(dropsVideo, n);
+dropsTs    = growTyped(dropsTs, n);
+for (const nm of linkNames) growSlot(seriesByName.get(nm), n);
+for (let k = 0; k < ticks.length; ++k){
+const s = ticks[k], i = from + k;
+labels.push(s.ts);
+dropsVideo[i] = (typeof s.drops_video === 'number' ? s.drops_video : 0);
+dropsTs[i]    = (typeof s.drops_ts === 'number' ? s.drops_ts : 0);
+for (const l of (s.links||[])){
+if (!l || !l.name) continue;
+const name = String(l.name);
+let slot = seriesByName.get(name);
+if (!slot) { // new link seen live; add full-length NaN series
+slot = newSlot(n);
+seriesByName.set(name, slot);
+linkNames.push(name);
+dsIndexByName.set(name, linkNames.length - 1);
+addLinkColor(name);
+chartRB.data.datasets.push({label:name, data:[], parsing:false, pointRadius:0, borderWidth:2, borderColor:colorForLink(name), backgroundColor:colorForLink(name)});
+chartOWD.data.datasets.push({label:name, data:[], parsing:false, pointRadius:0, borderWidth:2, borderColor:colorForLink(name), backgroundColor:colorForLink(name)});
+chartLOSS.data.datasets.push({label:name, data:[], parsing:false, pointRadius:0, borderWidth:2, borderColor:colorForLink(name), backgroundColor:colorForLink(name)});
+// add filter checkbox for the new link
+if (filterHost) {
+const id = 'lf_' + linkNames.length;
+const wrap = document.createElement('div');
+wrap.className = 'form-check form-check-inline m-0';
+wrap.innerHTML = '<input class="form-check-input" type="checkbox" id="'+id+'" data-name="'+name+'" checked>'+
+               '<label class="form-check-label small" for="'+id+'">'+name+'</label>';
+filterHost.appendChild(wrap);
+const cb = wrap.querySelector('input');
+cb.addEventListener('change', function(){
+setLinkVisible(cb.getAttribute('data-name'), cb.checked);
+});
+}
+}
+slot.rb[i]   = toNum(l.rx_bitrate);
+slot.owd[i]  = toNum(l.owdR);
+slot.loss[i] = toNum(l.rx_percent_lost);
+}
+}
+}
+
+// Poll ticks can outlast the 4 s timer: an overlapping call shares the pending one
+// instead of appending the same ticks twice
+let repollPending = null;
+function repoll(){
+if (!repollPending) repollPending = fetchNewTicks().finally(function(){ repollPending = null; });
+return repollPending;
+}
+
+async function fetchNewTicks(){
+try{
+// Ask only for the ticks after the last one we hold
+const after = samples.length ? samples[samples.length-1].ts : '';
+const r = await fetch('/log_stream?session_id=' + sid + '&after=' + encodeURIComponent(after));
+if (!r.ok) return;
+const d = await r.json();
+const incoming = d.samples || [];
+if (!incoming.length) return;
+const wasAtEnd = (parseInt(scrub.value,10) === parseInt(scrub.max,10));
+const firstNew = samples.length;
+for (const s of incoming){
+const i = samples.length;
+samples.push(s);
+growCoords(i + 1);
+setCoord(i, s);
+appendSample(i);
+}
+// === charts: append every new tick to labels, dropsVideo/dropsTs and the per-link series ===
+appendChartTicks(incoming);
+// Only the new slice reaches the chart datasets; the downsampled history is kept
+const bRB = chartBuckets(chartRB.canvas), bOWD = chartBuckets(chartOWD.canvas);
+const bLOSS = chartBuckets(chartLOSS.canvas), bDROP = chartBuckets(chartDROP.canvas);
+for (const ds of chartRB.data.datasets)   pushTail(ds, seriesByName.get(ds.label).rb,   firstNew, bRB);
+for (const ds of chartOWD.data.datasets)  pushTail(ds, seriesByName.get(ds.label).owd,  firstNew, bOWD);
+for (const ds of chartLOSS.data.datasets) pushTail(ds, seriesByName.get(ds.label).loss, firstNew, bLOSS);
+pushTail(chartDROP.data.datasets[0], dropsVideo, firstNew, bDROP);
+pushTail(chartDROP.data.datasets[1], dropsTs, firstNew, bDROP);
+scheduleRender();
+const chkAll = document.getElementById('chkAllLinks');
+if (chkAll && chkAll.checked) { clearPerLink(); drawPerLink(); }
+scrub.max = Math.max(0, samples.length - 1);
+if (wasAtEnd || (chkFollow && chkFollow.checked)) { scrub.value = scrub.max; renderAt(parseInt(scrub.max,10)); }
+} catch(e){}
+}
+
+
+  // Overall polyline colored by worst quality per tick; mark NEW drops only
+  let segs = [];
+  let prevDropVid = 0, prevDropTs = 0; // cumulative counters observed so far
+  for (let i = 0; i < samples.length; ++i) {
+    const s = samples[i];
+    const ll = llTuple(s);
+    if (!ll) continue;
+
+    // Mark segment red-dashed only if drops INCREASED since previous tick
+    const curVid = (typeof s.drops_video === 'number') ? s.drops_video : 0;
+    const curTs  = (typeof s.drops_ts === 'number') ? s.drops_ts : 0;
+    const newDrop = (curVid > prevDropVid) || (curTs > prevDropTs);
+    segs.push({ ll: ll, q: s._worst, drop: newDrop }); // quality from links only
+    prevDropVid = curVid;
+    prevDropTs  = curTs;
+  }
+  // Draw segments into category buckets, one polyline per run of identical style;
+  // visibility controlled by checkboxes
+  let last = null, run = null;
+  for (let i = 0; i < segs.length; ++i) {
+    const seg = segs[i];
+    if (!last) { last = seg; continue; }
+    const st = segStyle(last.q, seg.drop);
+    if (run && run.key === st.key) {
+      run.pts.push(seg.ll);
+    } else {
+      if (run) run.bucket.addLayer(L.polyline(run.pts, run.opts));
+      run = { key: st.key, bucket: st.bucket, opts: st.opts, pts: [last.ll, seg.ll] };
+    }
+    last = seg;
+  }
+  if (run) {
+    const line = L.polyline(run.pts, run.opts);
+    run.bucket.addLayer(line);
+    liveRun = { key: run.key, line: line };
+  }
+  // Apply initial visibility from legend toggles
+  applyLegendFilters();
+
+  // Per-link optional polylines (thin)
+  // All per-link polylines share one layer group, so clearing the overlay is one call
+  const linkLayers = new Map();
+  const perLinkGroup = L.layerGroup().addTo(map);
+  function drawPerLink() {
+    if (!perLink) {
+      perLink = new Map();
+      for (let i = 0; i < samples.length; ++i) addPerLinkTick(samples[i], llTuple(samples[i]));
+    }
+    for (const [name, obj] of perLink.entries()) {
+      if (linkLayers.has(name)) continue;
+      let prev = null, pts = null, q = null;
+      const llayers = [];
+      const flush = function() {
+        if (pts) llayers.push(L.polyline(pts, { color: colorFor(q), weight: 2, opacity: 0.5, renderer: renderer }).addTo(perLinkGroup));
+      };
+      for (let i = 0; i < obj.segs.length; ++i) {
+        const seg = obj.segs[i];
+        if (!prev) { prev = seg; continue; }
+        if (pts && seg.q === q) pts.push(seg.ll);
+        else { flush(); pts = [prev.ll, seg.ll]; q = seg.q; }
+        prev = seg;
+      }
+      flush();
+      linkLayers.set(name, llayers);
+    }
+  }
+  function clearPerLink() {
+    perLinkGroup.clearLayers();
+    linkLayers.clear();
+  }
+
+  // Fit map
+  if (latlngs.length) {
+    map.fitBounds(L.latLngBounds(latlngs), { padding:[20,20] });
+    L.circleMarker(latlngs[0], { radius:5, color:'#333', fill:true, fillOpacity:1 }).addTo(map).bindTooltip('Start');
+    L.circleMarker(latlngs[latlngs.length-1], { radius:5, color:'#333', fill:true, fillOpacity:1 }).addTo(map).bindTooltip('End');
+  }
+
+  // Timeline & badges
+  const scrub = document.getElementById('scrub');
+  const tsStart = document.getElementById('tsStart');
+  const tsNow = document.getElementById('tsNow');
+  const tsEnd = document.getElementById('tsEnd');
+  const linkBadges = document.getElementById('linkBadges');
+  scrub.max = Math.max(0, samples.length - 1);
+  function _pad2(n){return String(n).padStart(2,'0');}
+  function _tzLabel(d){
+    var tz = d.getTimezoneOffset(), off = -tz;
+    var sign = off>=0?'+':'-', abs = Math.abs(off);
+    return 'UTC'+sign+_pad2(Math.floor(abs/60))+':'+_pad2(abs%60);
+  }
+  function fmtTs(ts){
+    if(!ts) return '';
+    var utc = ts.replace('T',' ').substring(0,19);
+    var sIso = ts.length>=19 ? ts.substring(0,19) : ts;
+    if(sIso.indexOf('T')<0) sIso = sIso.replace(' ','T');
+    var d = new Date(sIso+'Z');
+    if(isNaN(d.getTime())) return utc+' UTC';
+    var local = d.getFullYear()+'-'+_pad2(d.getMonth()+1)+'-'+_pad2(d.getDate())+' '+
+                _pad2(d.getHours())+':'+_pad2(d.getMinutes())+':'+_pad2(d.getSeconds());
+    return '<div>'+utc+' <span class="text-muted">UTC</span></div>'+
+           '<div class="text-muted">'+local+' '+_tzLabel(d)+'</div>';
+  }
+  tsStart.innerHTML = fmtTs(samples[0].ts);
+  tsEnd.innerHTML = fmtTs(samples[samples.length-1].ts);
+  // Badges are built once and reused: a scrub step only updates text, colour and hidden
+  function badgeSpan(cls, css) {
+    const el = document.createElement('span');
+    el.className = cls;
+    el.style.cssText = css;
+    el.hidden = true;
+    return el;
+  }
+  const badgeDropVid = badgeSpan('badge me-1 mb-1', 'background:#ff0000;color:#fff;');
+  const badgeDropTs  = badgeSpan('badge me-1 mb-1', 'background:#ff0000;color:#fff;');
+  const badgeNone = badgeSpan('text-muted', '');
+  badgeNone.textContent = 'No links';
+  linkBadges.replaceChildren(badgeDropVid, badgeDropTs, badgeNone);
+  const badgeNodes = new Map(); // link name -> span, kept in name order in the DOM
+  let badgesShown = [];
+  function linkBadge(name) {
+    let el = badgeNodes.get(name);
+    if (el) return el;
+    el = badgeSpan('badge me-1 mb-1 badge-link', 'color:#000;'); // readable on light green / light blue / orange
+    badgeNodes.set(name, el);
+    // Plain code-unit order, the same as linkNames.sort(); no localeCompare
+    let next = badgeNone, nextName = null;
+    for (const [nm, node] of badgeNodes) {
+      if (nm > name && (nextName === null || nm < nextName)) { next = node; nextName = nm; }
+    }
+    linkBadges.insertBefore(el, next);
+    return el;
+  }
+  function renderAt(i) {
+    const s = samples[i];
+    tsNow.innerHTML = fmtTs(s.ts);
+    // Move the cursor point to the current GPS position (always reflect latest lat/lng; no warnings)
+    var llc = s ? llTuple(s) : null;
+    if (llc) {
+      if (cursorMarker) {
+        cursorMarker.setLatLng(llc); // the style never changes, only the position
+      } else {
+        cursorMarker = L.circleMarker(llc, { radius: 6, color: '#111', weight: 2, fill: true, fillOpacity: 1, renderer: renderer }).addTo(map);
+      }
+    }
+    const links = (s.links||[]);
+    const dropVid = s.drops_video && s.drops_video > 0;
+    const dropTs  = s.drops_ts && s.drops_ts > 0;
+    badgeDropVid.hidden = !dropVid;
+    if (dropVid) badgeDropVid.textContent = 'Dropped Video: ' + s.drops_video;
+    badgeDropTs.hidden = !dropTs;
+    if (dropTs) badgeDropTs.textContent = 'Dropped TS: ' + s.drops_ts;
+    for (const el of badgesShown) el.hidden = true;
+    badgesShown = [];
+    for (let j = 0; j < links.length; ++j) {
+      const l = links[j];
+      if (!l) continue;
+      const el = linkBadge(String(l.name));
+      const rb = (typeof l.rx_bitrate==='number'? l.rx_bitrate : 0);
+      const owd = (l.owdR!=null? l.owdR : '–');
+      const loss = (l.rx_percent_lost!=null? l.rx_percent_lost+'%' : '–');
+      el.style.background = colorFor(l._q); // sync badge color with map segments
+      el.textContent = l.name + ': ' + rb + ' kb/s • OWD ' + owd + ' ms • loss ' + loss;
+      el.hidden = false;
+      badgesShown.push(el);
+    }
+    badgeNone.hidden = dropVid || dropTs || badgesShown.length > 0;
+    updateCursor(i);
+  }
+  // A fast drag fires many input events per frame: render only the latest position
+  let scrubPending = false;
+  scrub.addEventListener('input', function(e){
+    if (scrubPending) return;
+    scrubPending = true;
+    requestAnimationFrame(function(){
+      scrubPending = false;
+      renderAt(parseInt(scrub.value,10)||0);
+    });
+  });
+  renderAt(0);
+  updateCursor(0);
+
+  // Toggle per-link overlays (checkbox removed by default; keep graceful behavior)
+  const chkAllLinks = document.getElementById('chkAllLinks');
+  if (chkAllLinks) {
+    chkAllLinks.addEventListener('change', function() {
+      if (chkAllLinks.checked) drawPerLink(); else clearPerLink();
+    });
+    if (chkAllLinks.checked) { drawPerLink(); } else { clearPerLink(); }
+  } else {
+    // No checkbox present: ensure overlays stay hidden on load
+    clearPerLink();
+  }
+
+  // Legend toggles for Good/Fair/Poor/Drops
+  ['chkGood','chkFair','chkPoor','chkDrops'].forEach(function(id){
+    const el = document.getElementById(id);
+    if (el) el.addEventListener('change', applyLegendFilters);
+  });
+
+
+// Follow live
+const chkFollow = document.getElementById('chkFollowLive');
+let pollTimer = null;
+function setPolling(on){
+  if (pollTimer) { clearInterval(pollTimer); pollTimer = null; }
+  if (on) {
+    pollTimer = setInterval(async function(){
+      // Hidden tabs skip the tick; visibilitychange catches up on return
+      if (document.hidden) return;
+      try {
+        await repoll();
+        if (!pollerRunning && deviceRowId !== null && deviceRowId !== 'null') {
+          fetch('/data?id=' + deviceRowId).catch(()=>{});
+        }
+        if (window.refreshEvents) window.refreshEvents();
+      } catch(e){}
+    }, 4000);
+  }
+}
+if (chkFollow) {
+  chkFollow.addEventListener('change', function(){
+    setPolling(chkFollow.checked && isLive);
+  });
+  setPolling(chkFollow.checked && isLive);
+  document.addEventListener('visibilitychange', function(){
+    if (!document.hidden && pollTimer) repoll();
+  });
+}
+})();